@@ -3,40 +3,71 @@ from flask_login import LoginManager
 import os
 from dotenv import load_dotenv
 
-# LOAD ENV FIRST
-load_dotenv()
-
-# CREATE APP FIRST
-app = Flask(__name__)
-app.secret_key = os.getenv("SECRET_KEY", "supersecretkey")
-
-# IMPORT BLUEPRINTS (AFTER app exists)
-from auth.routes import auth_bp
-from dashboard.routes import dashboard_bp
-from auth.models import User
-from ioc.routes import ioc_bp
-from tickets.routes import tickets_bp
-from feeds.routes import feeds_bp
-from routes.threat_map import threat_map
-
-# LOGIN MANAGER
-login_manager = LoginManager()
-login_manager.login_view = "auth.login"
-login_manager.init_app(app)
-
-@login_manager.user_loader
-def load_user(user_id):
-    return User.get_by_id(user_id)
-
-# REGISTER BLUEPRINTS
-app.register_blueprint(auth_bp, url_prefix="/auth")
-app.register_blueprint(dashboard_bp, url_prefix="/")
-app.register_blueprint(ioc_bp, url_prefix="/ioc")
-app.register_blueprint(tickets_bp, url_prefix="/tickets")
-app.register_blueprint(feeds_bp, url_prefix="/feeds")
-
-# 🔴 IMPORTANT FIX — API ROUTE FOR MAP
-app.register_blueprint(threat_map, url_prefix="/api")
+
+def create_app():
+    """
+    Build the app. Importing this module does no I/O beyond reading
+    .env: storage connects on first use and is checked by /readyz, and
+    background threads start in the worker that serves the first
+    request, so gunicorn --preload can fork safely. Under gunicorn
+    the feed ingestion starts at worker boot (gunicorn.conf.py).
+    """
+    # LOAD ENV FIRST (modules read their settings at import)
+    load_dotenv()
+
+    app = Flask(__name__)
+    app.secret_key = os.getenv("SECRET_KEY", "supersecretkey")
+
+    # IMPORT BLUEPRINTS (AFTER env is loaded)
+    from auth.routes import auth_bp
+    from dashboard.routes import dashboard_bp
+    from auth.models import User
+    from ioc.routes import ioc_bp
+    from tickets.routes import tickets_bp
+    from feeds.routes import feeds_bp
+    from routes.threat_map import threat_map
+    from routes.metrics import metrics_bp
+    from routes.health import health_bp
+    from feeds.scheduler import feed_ingest, start_scheduler
+
+    # LOGIN MANAGER
+    login_manager = LoginManager()
+    login_manager.login_view = "auth.login"
+    login_manager.init_app(app)
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        return User.get_by_id(user_id)
+
+    # REGISTER BLUEPRINTS
+    app.register_blueprint(auth_bp, url_prefix="/auth")
+    app.register_blueprint(dashboard_bp, url_prefix="/")
+    app.register_blueprint(ioc_bp, url_prefix="/ioc")
+    app.register_blueprint(tickets_bp, url_prefix="/tickets")
+    app.register_blueprint(feeds_bp, url_prefix="/feeds")
+
+    # 🔴 IMPORTANT FIX — API ROUTE FOR MAP
+    app.register_blueprint(threat_map, url_prefix="/api")
+
+    # PROMETHEUS SCRAPE ENDPOINT + PER-REQUEST LATENCY
+    app.register_blueprint(metrics_bp)
+
+    # LIVENESS / READINESS PROBES
+    app.register_blueprint(health_bp)
+
+    # BACKGROUND FEED INGESTION (serves /feeds/ and /api/threat-map)
+    # Threads don't survive fork, so start it in the worker, not at import.
+    # gunicorn.conf.py starts it at worker boot; this covers other servers.
+    # Only one process polls the providers (see feeds.scheduler.FeedIngest).
+    @app.before_request
+    def _start_background_jobs():
+        if not feed_ingest.running:
+            start_scheduler()
+
+    return app
+
+
+app = create_app()
 
 # RUN
 if __name__ == "__main__":
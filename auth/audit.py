@@ -0,0 +1,251 @@
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+# Active segment rotates when it grows past this size or when its first
+# entry is older than AUDIT_MAX_AGE_DAYS (0 disables age rotation)
+AUDIT_MAX_BYTES = int(os.getenv("AUDIT_MAX_BYTES", 5 * 1024 * 1024))
+AUDIT_MAX_AGE_DAYS = float(os.getenv("AUDIT_MAX_AGE_DAYS", 7))
+AUDIT_GZIP = os.getenv("AUDIT_GZIP", "1") != "0"
+# Rotated segments beyond this count are deleted (0 keeps them all)
+AUDIT_KEEP_SEGMENTS = int(os.getenv("AUDIT_KEEP_SEGMENTS", 20))
+
+_BLOCK = 64 * 1024
+
+
+def _parse_time(value):
+    """'2024-01-01T12:00:00.123Z' -> naive UTC datetime (or None)."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.rstrip("Z"))
+    except ValueError:
+        return None
+
+
+def _reverse_lines(path):
+    """
+    Yield the lines of a file last-to-first, reading fixed-size blocks
+    from the end so the latest entries cost O(entries read), not O(file).
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        tail = b""
+        while pos > 0:
+            step = min(_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step) + tail
+            lines = chunk.split(b"\n")
+            tail = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line
+        if tail:
+            yield tail
+
+
+class AuditJournal:
+    """
+    Append-only JSON-lines audit journal with size/age rotation.
+
+    The active file is `<path>`; rotated segments are
+    `<path>.<epoch_ms>[.gz]`. Entries are written oldest-first, so the
+    newest ones are read back with a reverse tail.
+    """
+
+    def __init__(self, path, legacy_path=None, max_bytes=AUDIT_MAX_BYTES,
+                 max_age_days=AUDIT_MAX_AGE_DAYS, compress=AUDIT_GZIP,
+                 keep_segments=AUDIT_KEEP_SEGMENTS):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.compress = compress
+        self.keep_segments = keep_segments
+        self._lock = threading.Lock()
+        self._migrated = False
+        self._first_entry = (None, None)  # (inode, epoch of first entry)
+
+    # =========================
+    # WRITES
+    # =========================
+    def append(self, entry, fsync=False):
+        self.append_many([entry], fsync=fsync)
+
+    def append_many(self, entries, fsync=False):
+        """
+        Write a batch of entries with a single write() (and at most one
+        fsync), so a group commit costs one syscall round trip.
+        """
+        data = b"".join(
+            (json.dumps(e, default=str) + "\n").encode("utf-8") for e in entries
+        )
+        if not data:
+            return
+        with self._lock:
+            self._migrate_legacy()
+            self._maybe_rotate()
+            # O_APPEND keeps concurrent writes from different workers
+            # from interleaving
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+                if fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _maybe_rotate(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return
+        too_big = self.max_bytes and st.st_size >= self.max_bytes
+        too_old = False
+        if self.max_age and st.st_size:
+            inode, first = self._first_entry
+            if inode != st.st_ino:
+                first = self._read_first_time()
+                self._first_entry = (st.st_ino, first)
+            too_old = first is not None and time.time() - first >= self.max_age
+        if too_big or too_old:
+            self.rotate()
+
+    def _read_first_time(self):
+        try:
+            with open(self.path, "rb") as f:
+                entry = json.loads(f.readline() or b"{}")
+        except Exception:
+            return None
+        dt = _parse_time(entry.get("time"))
+        return (dt - datetime(1970, 1, 1)).total_seconds() if dt else None
+
+    def rotate(self):
+        """Close out the active segment (caller holds the lock or is alone)."""
+        if not os.path.exists(self.path):
+            return None
+        segment = f"{self.path}.{int(time.time() * 1000)}"
+        try:
+            os.rename(self.path, segment)
+        except OSError:
+            return None  # another worker rotated it first
+        if self.compress:
+            with open(segment, "rb") as src, gzip.open(segment + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(segment)
+            segment += ".gz"
+        self._prune()
+        return segment
+
+    def _prune(self):
+        if not self.keep_segments:
+            return
+        for old in self.segments()[self.keep_segments:]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def _migrate_legacy(self):
+        """
+        One-time import of the old audit_log.json array (newest first).
+        """
+        if self._migrated:
+            return
+        self._migrated = True
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        if os.path.exists(self.path):
+            return
+        try:
+            with open(self.legacy_path, "r") as f:
+                legacy = json.load(f)
+        except Exception:
+            return
+        with open(self.path, "w") as f:
+            for entry in reversed(legacy):
+                f.write(json.dumps(entry, default=str) + "\n")
+        os.replace(self.legacy_path, self.legacy_path + ".migrated")
+
+    # =========================
+    # READS
+    # =========================
+    def segments(self):
+        """Rotated segment paths, newest first."""
+        directory = os.path.dirname(self.path) or "."
+        prefix = os.path.basename(self.path) + "."
+        found = []
+        for name in os.listdir(directory):
+            if not name.startswith(prefix):
+                continue
+            stamp = name[len(prefix):].split(".", 1)[0]
+            if stamp.isdigit():
+                found.append((int(stamp), os.path.join(directory, name)))
+        return [p for _, p in sorted(found, reverse=True)]
+
+    def _segment_lines_reversed(self, segment):
+        if segment.endswith(".gz"):
+            # Rotated segments are bounded by max_bytes, so reading one
+            # fully is cheap
+            with gzip.open(segment, "rb") as f:
+                lines = f.read().split(b"\n")
+            for line in reversed(lines):
+                if line:
+                    yield line
+        else:
+            yield from _reverse_lines(segment)
+
+    def iter_latest(self):
+        """Every entry, newest first, across the active and rotated segments."""
+        with self._lock:
+            self._migrate_legacy()
+        paths = []
+        if os.path.exists(self.path):
+            paths.append(self.path)
+        paths.extend(self.segments())
+        for path in paths:
+            try:
+                for line in self._segment_lines_reversed(path):
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+            except OSError:
+                continue  # rotated or pruned while we were reading
+
+    def latest(self, limit=200):
+        out = []
+        for entry in self.iter_latest():
+            out.append(entry)
+            if len(out) >= limit:
+                break
+        return out
+
+    def query(self, actor=None, action=None, since=None, until=None, limit=200):
+        """
+        Newest-first entries matching every given filter. `action`
+        matches as a case-insensitive substring; since/until are UTC
+        datetimes. The scan stops once entries are older than `since`.
+        """
+        action = action.lower() if action else None
+        out = []
+        for entry in self.iter_latest():
+            when = _parse_time(entry.get("time"))
+            if until and when and when >= until:
+                continue
+            if since and when and when < since:
+                break
+            if actor and entry.get("actor") != actor:
+                continue
+            if action and action not in (entry.get("action") or "").lower():
+                continue
+            out.append(entry)
+            if len(out) >= limit:
+                break
+        return out
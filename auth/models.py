@@ -1,10 +1,15 @@
+import fcntl
 import json
 import os
+import tempfile
+import threading
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 
+from services.writer import should_fsync, write_behind
+
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
-USERS_FILE = os.path.join(BASE_DIR, "users.json")
+USERS_FILE = os.getenv("USERS_FILE", os.path.join(BASE_DIR, "users.json"))
 
 # =========================
 # HARD CODED ADMIN
@@ -15,6 +20,102 @@ STATIC_ADMIN_PASSWORD = "admin123"
 MIN_PASSWORD_LENGTH = 6
 
 
+class _UserDirectory:
+    """
+    In-memory copy of users.json indexed by id and by username.
+    Reloaded only when the file's (mtime, inode, size) stamp changes,
+    so other gunicorn workers' writes are still picked up.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.version = 0
+        self._stamp = None
+        self._by_id = {}
+        self._by_username = {}
+        self._lock = threading.Lock()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    def _index(self, data, stamp):
+        self._by_id = data
+        self._by_username = {
+            u.get("username"): uid for uid, u in data.items()
+        }
+        self._stamp = stamp
+        self.version += 1
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception:
+            return {}
+
+    def _refresh(self):
+        stamp = self._file_stamp()
+        if stamp == self._stamp and self.version:
+            return
+        with self._lock:
+            stamp = self._file_stamp()
+            if stamp == self._stamp and self.version:
+                return
+            self._index(self._read() if stamp is not None else {}, stamp)
+
+    def by_id(self, user_id):
+        self._refresh()
+        return self._by_id.get(user_id)
+
+    def by_username(self, username):
+        self._refresh()
+        uid = self._by_username.get(username)
+        if uid is None:
+            return None, None
+        return uid, self._by_id.get(uid)
+
+    def all(self):
+        self._refresh()
+        return self._by_id
+
+    def update(self, mutate):
+        """
+        Read-modify-write of users.json under an exclusive flock, so
+        concurrent changes from other workers are merged rather than
+        overwritten. `mutate(data)` edits the freshly read dict in place;
+        its return value is returned. The file is replaced atomically
+        (temp file, fsync, rename) before this returns.
+        """
+        directory = os.path.dirname(self.path) or "."
+        with self._lock, open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            data = self._read()
+            result = mutate(data)
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".users-", suffix=".json")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(data, f, indent=4)
+                    f.flush()
+                    if should_fsync():
+                        os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+            except Exception:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+            self._index(data, self._file_stamp())
+        return result
+
+
+_directory = _UserDirectory(USERS_FILE)
+
+
 class User(UserMixin):
     def __init__(self, id, username, password_hash="", role="analyst"):
         self.id = id
@@ -34,18 +135,16 @@ class User(UserMixin):
     # =========================
     @staticmethod
     def load_users():
-        if not os.path.exists(USERS_FILE):
-            return {}
-        try:
-            with open(USERS_FILE, "r") as f:
-                return json.load(f)
-        except Exception:
-            return {}
+        # A copy, so callers can't edit the cached directory by accident
+        return {uid: dict(u) for uid, u in _directory.all().items()}
 
     @staticmethod
-    def save_users(data):
-        with open(USERS_FILE, "w") as f:
-            json.dump(data, f, indent=4)
+    def update_users(mutate):
+        """
+        Apply `mutate(data)` to users.json and persist it before
+        returning (see _UserDirectory.update).
+        """
+        return _directory.update(mutate)
 
     # =========================
     # PASSWORD HELPERS
@@ -56,12 +155,36 @@ class User(UserMixin):
 
     @staticmethod
     def set_password(user_id, new_password):
-        users = User.load_users()
-        if user_id in users:
-            users[user_id]["password"] = User._hash_password(new_password)
-            User.save_users(users)
-            return True
-        return False
+        """Returns the username, or None if there is no such user."""
+        password = User._hash_password(new_password)
+
+        def apply(users):
+            if user_id not in users:
+                return None
+            users[user_id]["password"] = password
+            return users[user_id]["username"]
+
+        return User.update_users(apply)
+
+    @staticmethod
+    def set_role(user_id, role):
+        """Returns the username, or None if there is no such user."""
+        def apply(users):
+            if user_id not in users:
+                return None
+            users[user_id]["role"] = role
+            return users[user_id]["username"]
+
+        return User.update_users(apply)
+
+    @staticmethod
+    def delete(user_id):
+        """Returns the deleted username, or None if there was no such user."""
+        def apply(users):
+            user = users.pop(user_id, None)
+            return user["username"] if user else None
+
+        return User.update_users(apply)
 
     # =========================
     # VALIDATION
@@ -84,7 +207,7 @@ class User(UserMixin):
         if include_admin:
             users.append(User("0", STATIC_ADMIN_USERNAME, "", "admin"))
 
-        data = User.load_users()
+        data = _directory.all()
         for uid, u in data.items():
             users.append(
                 User(
@@ -101,8 +224,6 @@ class User(UserMixin):
     # =========================
     @staticmethod
     def create(username, password, role="analyst"):
-        users = User.load_users()
-
         if not User._valid_username(username):
             return None
 
@@ -115,21 +236,24 @@ class User(UserMixin):
         if role not in ("admin", "analyst"):
             role = "analyst"
 
-        for u in users.values():
-            if u.get("username") == username:
-                return None
+        if _directory.by_username(username)[0] is not None:
+            return None
 
-        existing_ids = [int(uid) for uid in users.keys()] if users else [0]
-        user_id = str(max(existing_ids) + 1)
+        password_hash = User._hash_password(password)
 
-        users[user_id] = {
-            "username": username,
-            "password": User._hash_password(password),
-            "role": role,
-        }
+        def apply(users):
+            # Checked again on the locked, freshly read file: another
+            # worker may have taken the name or the next id meanwhile
+            if any(u.get("username") == username for u in users.values()):
+                return None
+            user_id = str(max((int(uid) for uid in users), default=0) + 1)
+            users[user_id] = {"username": username, "password": password_hash, "role": role}
+            return user_id
 
-        User.save_users(users)
-        return User(user_id, username, users[user_id]["password"], role)
+        user_id = User.update_users(apply)
+        if user_id is None:
+            return None
+        return User(user_id, username, password_hash, role)
 
     # =========================
     # AUTHENTICATION
@@ -140,12 +264,9 @@ class User(UserMixin):
         if username == STATIC_ADMIN_USERNAME and password == STATIC_ADMIN_PASSWORD:
             return User("0", STATIC_ADMIN_USERNAME, "", "admin")
 
-        users = User.load_users()
-        for uid, u in users.items():
-            if u.get("username") == username and check_password_hash(
-                u.get("password", ""), password
-            ):
-                return User(uid, username, u["password"], u.get("role", "analyst"))
+        uid, u = _directory.by_username(username)
+        if u and check_password_hash(u.get("password", ""), password):
+            return User(uid, username, u["password"], u.get("role", "analyst"))
 
         return None
 
@@ -157,9 +278,8 @@ class User(UserMixin):
         if str(user_id) == "0":
             return User("0", STATIC_ADMIN_USERNAME, "", "admin")
 
-        users = User.load_users()
-        if user_id in users:
-            u = users[user_id]
+        u = _directory.by_id(user_id)
+        if u is not None:
             return User(
                 user_id,
                 u.get("username"),
@@ -169,36 +289,34 @@ class User(UserMixin):
         return None
 import datetime
 
-AUDIT_FILE = os.path.join(BASE_DIR, "audit_log.json")
+from auth.audit import AuditJournal
 
+AUDIT_FILE = os.getenv("AUDIT_FILE", os.path.join(BASE_DIR, "audit_log.jsonl"))
+# Pre-journal format, imported into the journal on first use
+LEGACY_AUDIT_FILE = os.path.join(BASE_DIR, "audit_log.json")
 
-class AuditLog:
-    @staticmethod
-    def _load():
-        if not os.path.exists(AUDIT_FILE):
-            return []
-        try:
-            with open(AUDIT_FILE, "r") as f:
-                return json.load(f)
-        except Exception:
-            return []
+_journal = AuditJournal(AUDIT_FILE, legacy_path=LEGACY_AUDIT_FILE)
+write_behind.register(
+    "audit", lambda entries: _journal.append_many(entries, fsync=should_fsync())
+)
 
-    @staticmethod
-    def _save(data):
-        with open(AUDIT_FILE, "w") as f:
-            json.dump(data, f, indent=4)
 
+class AuditLog:
     @staticmethod
     def log(actor, action, target=None):
-        logs = AuditLog._load()
-        logs.insert(0, {
+        write_behind.submit("audit", {
             "time": datetime.datetime.utcnow().isoformat() + "Z",
             "actor": actor,
             "action": action,
             "target": target
         })
-        AuditLog._save(logs)
 
     @staticmethod
     def list_logs(limit=200):
-        return AuditLog._load()[:limit]
+        write_behind.flush()
+        return _journal.latest(limit)
+
+    @staticmethod
+    def query(actor=None, action=None, since=None, until=None, limit=200):
+        write_behind.flush()
+        return _journal.query(actor=actor, action=action, since=since, until=until, limit=limit)
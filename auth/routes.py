@@ -1,6 +1,7 @@
+from datetime import datetime, timedelta
+
 from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash
 
 from auth.models import User, AuditLog
 
@@ -70,11 +71,7 @@ def change_own_password():
             flash("New password must be at least 6 characters", "danger")
             return redirect(url_for("auth.change_own_password"))
 
-        data = User.load_users()
-        if current_user.id in data:
-            data[current_user.id]["password"] = generate_password_hash(new_pw)
-            User.save_users(data)
-
+        if User.set_password(current_user.id, new_pw):
             AuditLog.log(
                 actor=current_user.username,
                 action="Changed own password",
@@ -135,16 +132,13 @@ def update_user_role(user_id):
         return redirect(url_for("auth.admin_users"))
 
     new_role = request.form.get("role")
-    data = User.load_users()
-
-    if user_id in data and new_role in ("admin", "analyst"):
-        data[user_id]["role"] = new_role
-        User.save_users(data)
+    username = User.set_role(user_id, new_role) if new_role in ("admin", "analyst") else None
 
+    if username:
         AuditLog.log(
             actor=current_user.username,
             action=f"Changed role to {new_role}",
-            target=data[user_id]["username"]
+            target=username
         )
 
         flash("User role updated successfully", "success")
@@ -170,15 +164,12 @@ def reset_user_password(user_id):
         flash("Password must be at least 6 characters", "danger")
         return redirect(url_for("auth.admin_users"))
 
-    data = User.load_users()
-    if user_id in data:
-        data[user_id]["password"] = generate_password_hash(new_password)
-        User.save_users(data)
-
+    username = User.set_password(user_id, new_password)
+    if username:
         AuditLog.log(
             actor=current_user.username,
             action="Reset password",
-            target=data[user_id]["username"]
+            target=username
         )
 
         flash("Password reset successfully", "success")
@@ -199,12 +190,8 @@ def delete_user(user_id):
         flash("Operation not allowed", "danger")
         return redirect(url_for("auth.admin_users"))
 
-    data = User.load_users()
-    if user_id in data:
-        username = data[user_id]["username"]
-        del data[user_id]
-        User.save_users(data)
-
+    username = User.delete(user_id)
+    if username:
         AuditLog.log(
             actor=current_user.username,
             action="Deleted user",
@@ -225,5 +212,28 @@ def audit_logs():
     if not current_user.is_admin:
         abort(403)
 
-    logs = AuditLog.list_logs()
-    return render_template("audit_logs.html", logs=logs)
+    actor = request.args.get("actor", "").strip() or None
+    action = request.args.get("action", "").strip() or None
+    since = _parse_date(request.args.get("since"))
+    until = _parse_date(request.args.get("until"))
+    if until:
+        until += timedelta(days=1)  # the form's "until" day is inclusive
+
+    if actor or action or since or until:
+        logs = AuditLog.query(actor=actor, action=action, since=since, until=until)
+    else:
+        logs = AuditLog.list_logs()
+    return render_template(
+        "audit_logs.html",
+        logs=logs,
+        filters={"actor": actor, "action": action,
+                 "since": request.args.get("since"), "until": request.args.get("until")},
+    )
+
+
+def _parse_date(value):
+    """'YYYY-MM-DD' from the filter form -> datetime, or None."""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d") if value else None
+    except ValueError:
+        return None
@@ -0,0 +1,233 @@
+# bench/fake_upstream.py
+"""
+Local stand-in for the VirusTotal, OTX, AbuseIPDB and Shodan APIs.
+
+Every response is derived from the request path, so runs are
+reproducible; latency, error rate and 429 behaviour are configurable.
+Point the app at it with the *_BASE_URL variables from env().
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+VT_TYPES = {"ip_addresses": "ip_address", "domains": "domain", "files": "file", "urls": "url"}
+COUNTRIES = ("US", "DE", "NL", "RU", "CN", "BR", "IN", "GB", "FR", "SG")
+
+
+def _digest(value):
+    return int(hashlib.sha1(value.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _fake_ip(n):
+    return f"{(n >> 24) % 223 + 1}.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}"
+
+
+def vt_object(kind, value):
+    h = _digest(value)
+    malicious = h % 7 if h % 3 == 0 else 0
+    attributes = {
+        "last_analysis_stats": {
+            "harmless": 60 + h % 20,
+            "malicious": malicious,
+            "suspicious": h % 2 if not malicious else 0,
+            "undetected": 10 + h % 5,
+        },
+        "last_analysis_date": 1700000000 + h % 10000000,
+        "reputation": -(h % 50) if malicious else h % 10,
+    }
+    if kind == "ip_addresses":
+        attributes.update(country=COUNTRIES[h % len(COUNTRIES)], as_owner=f"AS{h % 65000}")
+    return {"data": {"id": value, "type": VT_TYPES.get(kind, kind), "attributes": attributes}}
+
+
+def otx_pulses(base_url, page=1, limit=20, total=60, indicators=5, modified_since="",
+               epoch=0.0):
+    """
+    One page of /pulses/subscribed: `total` pulses across all pages,
+    minus those not modified after `modified_since`. Pulse i was
+    modified (total - i) seconds before `epoch`, so with the server's
+    start time a first pull gets every pulse and later pulls none.
+    """
+    pulses = [
+        (i, datetime.utcfromtimestamp(int(epoch) - (total - i)).strftime("%Y-%m-%dT%H:%M:%S.000000"))
+        for i in range(total)
+    ]
+    pulses = [(i, modified) for i, modified in pulses if modified > modified_since]
+    first = (page - 1) * limit
+    results = [
+        {
+            "name": f"Benchmark pulse {i}",
+            "modified": modified,
+            "indicators": [
+                {"type": "IPv4", "indicator": _fake_ip(_digest(f"otx{i}-{j}"))}
+                for j in range(indicators)
+            ],
+        }
+        for i, modified in pulses[first:first + limit]
+    ]
+    more = first + limit < len(pulses)
+    return {
+        "count": len(pulses),
+        "results": results,
+        "next": (
+            f"{base_url}/api/v1/pulses/subscribed?page={page + 1}&limit={limit}"
+            f"&modified_since={modified_since}"
+        ) if more else None,
+    }
+
+
+def abuseipdb_blacklist(limit=100):
+    return {
+        "data": [
+            {
+                "ipAddress": _fake_ip(_digest(f"abuse{i}")),
+                "abuseConfidenceScore": 85 + i % 16,
+                "countryCode": COUNTRIES[i % len(COUNTRIES)],
+                "isp": f"ISP {i % 17}",
+            }
+            for i in range(limit)
+        ]
+    }
+
+
+def shodan_matches(count=20):
+    return {
+        "matches": [
+            {"ip_str": _fake_ip(_digest(f"shodan{i}")), "port": 3389, "org": f"Org {i % 9}"}
+            for i in range(count)
+        ]
+    }
+
+
+class FakeUpstream:
+    def __init__(self, latency_ms=50.0, jitter_ms=10.0, error_rate=0.0,
+                 rate_limit_rate=0.0, retry_after=1, seed=1, host="127.0.0.1", port=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.requests = 0
+        self.by_status = {}
+        # Fixed per instance so OTX pulse dates don't move during a run
+        self.started = time.time()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """Environment overrides pointing the app at this server."""
+        return {
+            "VT_BASE_URL": f"{self.url}/api/v3",
+            "OTX_BASE_URL": self.url,
+            "ABUSEIPDB_BASE_URL": self.url,
+            "SHODAN_BASE_URL": self.url,
+            "VT_API_KEY": "bench",
+            "OTX_API_KEY": "bench",
+            "ABUSEIPDB_API_KEY": "bench",
+            "SHODAN_API_KEY": "bench",
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _roll(self):
+        with self._rng_lock:
+            delay = max(0.0, self._rng.gauss(self.latency_ms, self.jitter_ms)) / 1000.0
+            return delay, self._rng.random(), self._rng.random()
+
+    def _route(self, path, query):
+        parts = path.strip("/").split("/")
+        if parts[:2] == ["api", "v3"] and len(parts) == 4:
+            return 200, vt_object(parts[2], parts[3])
+        if path == "/api/v1/pulses/subscribed":
+            return 200, otx_pulses(
+                self.url,
+                page=int(query.get("page", ["1"])[0]),
+                limit=int(query.get("limit", ["20"])[0]),
+                modified_since=query.get("modified_since", [""])[0],
+                epoch=self.started,
+            )
+        if path == "/api/v2/blacklist":
+            return 200, abuseipdb_blacklist(int(query.get("limit", ["100"])[0]))
+        if path == "/shodan/host/search":
+            return 200, shodan_matches()
+        return 404, {"error": {"code": "NotFoundError"}}
+
+    def _handler_class(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                delay, error_roll, limit_roll = upstream._roll()
+                time.sleep(delay)
+                headers = {}
+                if limit_roll < upstream.rate_limit_rate:
+                    status, body = 429, {"error": {"code": "QuotaExceededError"}}
+                    headers["Retry-After"] = str(upstream.retry_after)
+                elif error_roll < upstream.error_rate:
+                    status, body = 503, {"error": {"code": "TransientError"}}
+                else:
+                    parsed = urlparse(self.path)
+                    status, body = upstream._route(parsed.path, parse_qs(parsed.query))
+
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(payload)
+
+                with upstream._rng_lock:
+                    upstream.requests += 1
+                    upstream.by_status[status] = upstream.by_status.get(status, 0) + 1
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the fake upstream API server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeUpstream(args.latency_ms, args.jitter_ms, args.error_rate,
+                          args.rate_limit_rate, port=args.port).start()
+    print("Fake upstream on", server.url)
+    for k, v in server.env().items():
+        print(f"export {k}={v}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
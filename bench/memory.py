@@ -0,0 +1,135 @@
+# bench/memory.py
+"""
+Memory per lookup: the old in-process representation (one dict per
+lookup holding the whole parse_vt_response() output, as LOOKUPS did)
+versus ioc.columns.HistoryColumns, and dict globe points versus
+ioc.services.MapPoint tuples.
+
+    python -m bench.memory --lookups 200000 --out bench/results/memory.json
+"""
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+from datetime import datetime
+
+from bench.fake_upstream import COUNTRIES, _digest, _fake_ip
+
+
+def synthetic_parsed(i):
+    """A parse_vt_response()-shaped dict for an IP lookup."""
+    h = _digest(f"mem{i}")
+    malicious = h % 7 if h % 3 == 0 else 0
+    return {
+        "ioc_type": "ip",
+        "value": _fake_ip(h),
+        "harmless": 60 + h % 20,
+        "malicious": malicious,
+        "suspicious": h % 2 if not malicious else 0,
+        "undetected": 10 + h % 5,
+        "last_analysis_date": datetime.utcfromtimestamp(1700000000 + h % 10000000).strftime(
+            "%Y-%m-%d %H:%M:%S UTC"
+        ),
+        "reputation": -(h % 50) if malicious else h % 10,
+        "country": COUNTRIES[h % len(COUNTRIES)],
+        "as_owner": f"AS{h % 65000} Example Networks",
+        "categories": {"Forcepoint ThreatSeeker": "unknown", "Sophos": "spyware and malware"},
+        "tags": ["scanner", "tor"] if malicious else [],
+        "type_description": None,
+        "meaningful_name": None,
+        "geo_country": COUNTRIES[h % len(COUNTRIES)],
+        "geo_city": None,
+        "geo_lat": 10.0 + h % 50,
+        "geo_lon": 20.0 + h % 100,
+        "geo_asn": f"AS{h % 65000}",
+    }
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    obj = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return obj, size
+
+
+def column_row(i):
+    """HistoryStore.column_rows() tuple for synthetic lookup i."""
+    p = synthetic_parsed(i)
+    verdict = "malicious" if p["malicious"] else "suspicious" if p["suspicious"] else "harmless"
+    return (i + 1, "ip", p["value"], verdict, p["malicious"], p["suspicious"], p["harmless"],
+            p["undetected"], p["geo_country"], 1700000000 + i, p["reputation"],
+            p["last_analysis_date"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure memory per lookup.")
+    parser.add_argument("--lookups", type=int, default=100000)
+    parser.add_argument("--out")
+    args = parser.parse_args(argv)
+    n = args.lookups
+
+    from ioc.services import map_point
+    from ioc.columns import HistoryColumns
+
+    def old_history():
+        return [
+            {"ioc_type": "ip", "value": p["value"], "parsed": p,
+             "created_at": datetime.utcfromtimestamp(1700000000 + i)}
+            for i, p in ((i, synthetic_parsed(i)) for i in range(n))
+        ]
+
+    def new_history():
+        cols = HistoryColumns()
+        cols.extend(column_row(i) for i in range(n))
+        return cols
+
+    def old_points():
+        points = {}
+        for i in range(n):
+            p = synthetic_parsed(i)
+            points[p["value"]] = {"ip": p["value"], "country": p["geo_country"],
+                                  "risk": "malicious" if p["malicious"] else "harmless",
+                                  "lat": p["geo_lat"], "lon": p["geo_lon"], "source": "lookup"}
+        return points
+
+    def new_points():
+        points = {}
+        for i in range(n):
+            p = synthetic_parsed(i)
+            points[p["value"]] = map_point(p["value"], p["geo_country"], None,
+                                           "malicious" if p["malicious"] else "harmless",
+                                           p["geo_lat"], p["geo_lon"], "lookup")
+        return points
+
+    results = {}
+    for name, old, new in (("history", old_history, new_history),
+                           ("globe_points", old_points, new_points)):
+        old_obj, old_bytes = measure(old)
+        del old_obj
+        new_obj, new_bytes = measure(new)
+        count = len(new_obj)
+        del new_obj
+        results[name] = {
+            "items": count,
+            "before_bytes_per_item": round(old_bytes / count, 1),
+            "after_bytes_per_item": round(new_bytes / count, 1),
+            "reduction": round(1 - new_bytes / old_bytes, 3) if old_bytes else 0.0,
+        }
+        r = results[name]
+        print(f"{name:<13} {r['before_bytes_per_item']:>8.1f} B -> {r['after_bytes_per_item']:>6.1f} B"
+              f" per item ({r['reduction']:.0%} less, {count} items)")
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print("Saved", args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
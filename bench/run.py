@@ -0,0 +1,363 @@
+# bench/run.py
+"""
+Latency/throughput benchmark for the main pages against a local fake
+upstream (bench/fake_upstream.py), so numbers don't depend on the real
+providers, API keys or quota.
+
+    python -m bench.run --out bench/results/baseline.json
+    python -m bench.run --mode gunicorn --workers 4 --compare bench/results/baseline.json
+
+--mode client drives the app in-process through Flask's test client
+(no network between client and app). --mode gunicorn starts a real
+gunicorn with N gthread workers and drives it over HTTP. Each scenario
+runs on its own, so every endpoint gets clean p50/p95/p99 numbers.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from bench.fake_upstream import FakeUpstream
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ADMIN_USER = "admin"
+ADMIN_PASSWORD = "admin123"
+
+
+def _lookup_form(i, distinct):
+    # A bounded pool of values so the verdict cache warms up the way it
+    # does in production (repeat lookups of the same indicators)
+    n = i % distinct
+    return {"ioc_type": "ip", "value": f"198.51.{n // 256 % 256}.{n % 256}"}
+
+
+# name -> (method, path, form factory or None)
+SCENARIOS = {
+    "ioc_lookup": ("POST", "/ioc/lookup", _lookup_form),
+    "feeds": ("GET", "/feeds/", None),
+    "threat_map": ("GET", "/api/threat-map", None),
+    "dashboard": ("GET", "/", None),
+    "tickets": ("GET", "/tickets/", None),
+}
+
+
+# =========================
+# ENVIRONMENT
+# =========================
+def bench_env(upstream, workdir, args):
+    env = dict(upstream.env())
+    env.update({
+        "HISTORY_DB": os.path.join(workdir, "ioc_history.db"),
+        "TICKETS_DB": os.path.join(workdir, "tickets.db"),
+        "TICKETS_FILE": os.path.join(workdir, "tickets.json"),
+        "USERS_FILE": os.path.join(workdir, "users.json"),
+        "AUDIT_FILE": os.path.join(workdir, "audit_log.jsonl"),
+        "OTX_STATE_FILE": os.path.join(workdir, "otx_state.json"),
+        "ABUSEIPDB_STATE_FILE": os.path.join(workdir, "abuseipdb_blacklist.json"),
+        "FEEDS_LEADER_LOCK": os.path.join(workdir, "feeds_leader.lock"),
+        "FEEDS_SNAPSHOT_FILE": os.path.join(workdir, "feeds_snapshot.json"),
+        "RATE_LIMIT_DB": os.path.join(workdir, "ratelimit.db"),
+        "GEOIP_DB": os.path.join(workdir, "geoip.csv"),
+        "SECRET_KEY": "bench",
+        # The app's own VT limiter would otherwise dominate the numbers
+        "VT_RATE_PER_MINUTE": str(10 ** 6),
+        "VT_RATE_PER_DAY": str(10 ** 9),
+        "FEEDS_SCHEDULER": "1" if args.scheduler else "0",
+    })
+    return env
+
+
+def seed_tickets(count):
+    from tickets.repository import get_ticket_repository
+
+    repo = get_ticket_repository()
+    severities = ("low", "medium", "high", "critical")
+    for i in range(count):
+        repo.create(
+            f"Benchmark ticket {i}",
+            f"Suspicious activity from 203.0.113.{i % 256} (credential harvesting)",
+            severities[i % len(severities)],
+            f"203.0.113.{i % 256}",
+            ADMIN_USER,
+        )
+
+
+# =========================
+# CLIENTS
+# =========================
+class _TestClientDriver:
+    def __init__(self, app):
+        self.app = app
+
+    def session(self):
+        client = self.app.test_client()
+        client.post("/auth/login", data={"username": ADMIN_USER, "password": ADMIN_PASSWORD})
+        return client
+
+    @staticmethod
+    def call(client, method, path, data):
+        resp = client.open(path, method=method, data=data)
+        resp.get_data()
+        return resp.status_code
+
+
+class _HTTPDriver:
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def session(self):
+        import requests
+
+        s = requests.Session()
+        s.post(
+            self.base_url + "/auth/login",
+            data={"username": ADMIN_USER, "password": ADMIN_PASSWORD},
+            allow_redirects=False,
+        )
+        return s
+
+    def call(self, session, method, path, data):
+        resp = session.request(method, self.base_url + path, data=data, allow_redirects=False)
+        return resp.status_code
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(env, workers, threads):
+    port = _free_port()
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn",
+            "--workers", str(workers),
+            "--worker-class", "gthread",
+            "--threads", str(threads),
+            "--bind", f"127.0.0.1:{port}",
+            "--log-level", "warning",
+            "app:app",
+        ],
+        cwd=ROOT,
+        env=dict(os.environ, **env),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    import requests
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {proc.returncode}")
+        try:
+            requests.get(base_url + "/auth/login", timeout=1)
+            return proc, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("gunicorn did not come up within 60s")
+
+
+# =========================
+# MEASUREMENT
+# =========================
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "requests": count,
+        "errors": errors,
+        "p50_ms": round(percentile(ordered, 50), 3),
+        "p95_ms": round(percentile(ordered, 95), 3),
+        "p99_ms": round(percentile(ordered, 99), 3),
+        "mean_ms": round(sum(ordered) / count, 3) if count else 0.0,
+        "max_ms": round(ordered[-1], 3) if count else 0.0,
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def run_scenario(driver, scenario, total, concurrency, warmup, distinct):
+    method, path, form = SCENARIOS[scenario]
+    counter = iter(range(warmup + total))
+    counter_lock = threading.Lock()
+    latencies = []
+    errors = [0]
+    results_lock = threading.Lock()
+
+    def worker():
+        session = driver.session()
+        while True:
+            with counter_lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            data = form(i, distinct) if form else None
+            start = time.perf_counter()
+            try:
+                status = driver.call(session, method, path, data)
+            except Exception:
+                status = 599
+            ms = (time.perf_counter() - start) * 1000
+            if i < warmup:
+                continue
+            with results_lock:
+                latencies.append(ms)
+                if status >= 300:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(latencies, errors[0], time.perf_counter() - start)
+
+
+# =========================
+# BASELINES
+# =========================
+def _git_rev():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline, tolerance):
+    """
+    Print a per-scenario diff and return the regressions: p95 up, or
+    throughput down, by more than `tolerance` (a fraction).
+    """
+    regressions = []
+    print(f"\n{'scenario':<12} {'p95 base':>10} {'p95 now':>10} {'rps base':>10} {'rps now':>10}")
+    for name, now in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        print(f"{name:<12} {base['p95_ms']:>10.1f} {now['p95_ms']:>10.1f}"
+              f" {base['throughput_rps']:>10.1f} {now['throughput_rps']:>10.1f}")
+        if base["p95_ms"] and now["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']}ms -> {now['p95_ms']}ms")
+        if base["throughput_rps"] and now["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {base['throughput_rps']} -> {now['throughput_rps']} rps"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=("client", "gunicorn"), default="client")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--distinct", type=int, default=50, help="distinct IOC values looked up")
+    parser.add_argument("--tickets", type=int, default=500, help="tickets seeded before the run")
+    parser.add_argument("--scheduler", action="store_true",
+                        help="serve feeds from the background scheduler")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    upstream = FakeUpstream(args.latency_ms, args.jitter_ms, args.error_rate,
+                            args.rate_limit_rate, seed=args.seed).start()
+    workdir = tempfile.mkdtemp(prefix="cti-bench-")
+    env = bench_env(upstream, workdir, args)
+    os.environ.update(env)
+    sys.path.insert(0, ROOT)
+
+    seed_tickets(args.tickets)
+
+    proc = None
+    try:
+        if args.mode == "gunicorn":
+            proc, base_url = start_gunicorn(env, args.workers, args.threads)
+            driver = _HTTPDriver(base_url)
+        else:
+            from app import app
+
+            driver = _TestClientDriver(app)
+
+        results = {}
+        for name in scenarios:
+            results[name] = run_scenario(
+                driver, name, args.requests, args.concurrency, args.warmup, args.distinct
+            )
+            r = results[name]
+            print(f"{name:<12} p50={r['p50_ms']:.1f}ms p95={r['p95_ms']:.1f}ms"
+                  f" p99={r['p99_ms']:.1f}ms {r['throughput_rps']:.1f} req/s"
+                  f" errors={r['errors']}")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+        upstream.stop()
+
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+            "upstream_requests": upstream.requests,
+            "upstream_by_status": {str(k): v for k, v in upstream.by_status.items()},
+        },
+        "results": results,
+    }
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print("Saved", args.out)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(" -", line)
+            return 1
+        print("\nNo regressions beyond", f"{args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
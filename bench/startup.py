@@ -0,0 +1,121 @@
+# bench/startup.py
+"""
+Startup-time benchmark: how long a fresh interpreter takes to import
+the app (create_app included) and to answer its first request.
+
+    python -m bench.startup --runs 10 --out bench/results/startup.json
+
+Each run is a separate process so nothing is warm. With gunicorn
+installed, --gunicorn also times boot until the first /healthz 200.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.run import ROOT, _free_port, _git_rev, percentile
+
+_PROBE = r"""
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+resp = app.app.test_client().get("/healthz")
+t2 = time.perf_counter()
+assert resp.status_code == 200, resp.status_code
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "first_request_ms": (t2 - t1) * 1000}))
+"""
+
+
+def _env(workdir):
+    env = dict(os.environ)
+    env.update({
+        "HISTORY_DB": os.path.join(workdir, "ioc_history.db"),
+        "TICKETS_DB": os.path.join(workdir, "tickets.db"),
+        "USERS_FILE": os.path.join(workdir, "users.json"),
+        "AUDIT_FILE": os.path.join(workdir, "audit_log.jsonl"),
+        "OTX_STATE_FILE": os.path.join(workdir, "otx_state.json"),
+        "ABUSEIPDB_STATE_FILE": os.path.join(workdir, "abuseipdb_blacklist.json"),
+        "FEEDS_SCHEDULER": "0",
+    })
+    return env
+
+
+def time_import(env):
+    out = subprocess.check_output([sys.executable, "-c", _PROBE], cwd=ROOT, env=env)
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+
+def time_gunicorn(env, workers):
+    import requests
+
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--preload", "--workers", str(workers),
+         "--worker-class", "gthread", "--bind", f"127.0.0.1:{port}",
+         "--log-level", "warning", "app:app"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        while time.perf_counter() - start < 60:
+            if proc.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with {proc.returncode}")
+            try:
+                if requests.get(f"http://127.0.0.1:{port}/healthz", timeout=1).status_code == 200:
+                    return (time.perf_counter() - start) * 1000
+            except requests.RequestException:
+                pass
+            time.sleep(0.01)
+        raise RuntimeError("gunicorn did not come up within 60s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def _summary(values):
+    ordered = sorted(values)
+    return {
+        "runs": len(ordered),
+        "p50_ms": round(percentile(ordered, 50), 2),
+        "p95_ms": round(percentile(ordered, 95), 2),
+        "max_ms": round(ordered[-1], 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold app startup.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--gunicorn", action="store_true")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--out")
+    args = parser.parse_args(argv)
+
+    env = _env(tempfile.mkdtemp(prefix="cti-startup-"))
+    samples = [time_import(env) for _ in range(args.runs)]
+    results = {
+        "import": _summary([s["import_ms"] for s in samples]),
+        "first_request": _summary([s["first_request_ms"] for s in samples]),
+    }
+    if args.gunicorn:
+        results["gunicorn_boot"] = _summary(
+            [time_gunicorn(env, args.workers) for _ in range(args.runs)]
+        )
+
+    for name, r in results.items():
+        print(f"{name:<14} p50={r['p50_ms']:.1f}ms p95={r['p95_ms']:.1f}ms max={r['max_ms']:.1f}ms")
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump({"meta": {"git_rev": _git_rev(), "config": vars(args)}, "results": results},
+                      f, indent=2)
+        print("Saved", args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,7 @@
 # config.py
 import os
+import threading
 from dotenv import load_dotenv
-from pymongo import MongoClient
 
 BASE_DIR = os.path.dirname(__file__)
 env_path = os.path.join(BASE_DIR, ".env")
@@ -10,28 +10,49 @@ load_dotenv(dotenv_path=env_path)
 MONGO_URI = os.getenv("MONGO_URI")  # Atlas only
 VT_API_KEY = os.getenv("VT_API_KEY")
 
-if not MONGO_URI:
-    raise ValueError("MONGO_URI is not set in .env")
-if not VT_API_KEY:
-    raise ValueError("VT_API_KEY is not set in .env")
-
-db = None
-DB_OK = False
-
-print("Using Mongo URI:", MONGO_URI)
-
-try:
-    client = MongoClient(
-        MONGO_URI,
-        tls=True,
-        tlsAllowInvalidCertificates=True,  # dev only
-        serverSelectionTimeoutMS=10000
-    )
-    client.admin.command("ping")   # test
-    print("✅ Connected to MongoDB Atlas successfully.")
-    db = client["cti_dashboard"]
-    DB_OK = True
-except Exception as e:
-    print("❌ MongoDB connection failed (Atlas):")
-    print(e)
-    raise   # stop app if Atlas doesn’t work (cloud-only mode)
+# Nothing connects at import time: the client is built on first use of
+# `config.db` (pymongo itself only connects on the first operation), and
+# connectivity is checked by ping() from the /readyz endpoint instead.
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", 10000))
+
+_client = None
+_db = None
+_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                if not MONGO_URI:
+                    raise ValueError("MONGO_URI is not set in .env")
+                from pymongo import MongoClient
+
+                _client = MongoClient(
+                    MONGO_URI,
+                    tls=True,
+                    tlsAllowInvalidCertificates=True,  # dev only
+                    serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+                    connect=False,  # fork-safe under gunicorn --preload
+                )
+    return _client
+
+
+def get_db():
+    global _db
+    if _db is None:
+        _db = get_client()["cti_dashboard"]
+    return _db
+
+
+def ping():
+    """Round-trip to Atlas; raises on failure (bounded by MONGO_TIMEOUT_MS)."""
+    get_client().admin.command("ping")
+
+
+def __getattr__(name):
+    # `config.db` keeps working for existing callers, lazily
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module 'config' has no attribute {name!r}")
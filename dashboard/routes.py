@@ -1,7 +1,17 @@
-from flask import Blueprint, render_template
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, jsonify, render_template, request
 from flask_login import login_required, current_user
 
-from ioc.services import get_stats, get_recent_lookups, get_globe_points
+from ioc.history import ROLLUP_GRANULARITIES, verdict_of
+from ioc.columns import TYPE_CODES
+from ioc.services import (
+    get_country_histogram,
+    get_recent_lookups,
+    get_stats,
+    get_top_risk,
+    get_trend,
+)
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
@@ -11,11 +21,105 @@ dashboard_bp = Blueprint("dashboard", __name__)
 def home():
     stats = get_stats()
     recent = get_recent_lookups(limit=5)
-    globe_points = get_globe_points()
+    top_risk = get_top_risk(k=10, days=7)
     return render_template(
         "dashboard.html",
         stats=stats,
         user=current_user,
         recent=recent,
-        globe_points=globe_points
+        top_risk=top_risk
     )
+
+
+@dashboard_bp.route("/api/stats")
+@login_required
+def stats_api():
+    """
+    Compact KPI payload for live dashboard refresh.
+    The lifetime lookup count doubles as the version: it changes on
+    every recorded lookup, so clients polling with If-None-Match get a
+    304 without the recent-lookups query when nothing is new.
+    """
+    stats = get_stats()
+    version = stats["total_iocs"]
+    etag = f"stats-{version}"
+
+    if etag in request.if_none_match:
+        resp = current_app.response_class(status=304)
+    else:
+        recent = get_recent_lookups(limit=5)
+        resp = jsonify(
+            {
+                "version": version,
+                "stats": stats,
+                "recent": [
+                    {
+                        "ioc_type": x["ioc_type"],
+                        "value": x["value"],
+                        "verdict": verdict_of(x["parsed"]),
+                        "created_at": x["created_at"].strftime("%Y-%m-%d %H:%M:%S UTC"),
+                    }
+                    for x in recent
+                ],
+            }
+        )
+
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+
+@dashboard_bp.route("/api/top-risk")
+@login_required
+def top_risk_api():
+    """
+    Riskiest indicators, e.g. /api/top-risk?k=50&days=7&type=ip
+    """
+    try:
+        k = min(max(int(request.args.get("k", 50)), 1), 1000)
+        days = int(request.args.get("days", 0)) or None
+    except ValueError:
+        return jsonify({"error": "k and days must be integers"}), 400
+    ioc_type = request.args.get("type") or None
+    if ioc_type is not None and ioc_type not in TYPE_CODES:
+        return jsonify({"error": f"type must be one of {', '.join(TYPE_CODES)}"}), 400
+
+    ranked = get_top_risk(k=k, days=days, ioc_type=ioc_type)
+    for item in ranked:
+        item["created_at"] = item["created_at"].strftime("%Y-%m-%d %H:%M:%S UTC")
+    return jsonify({"k": k, "days": days, "type": ioc_type, "items": ranked})
+
+
+@dashboard_bp.route("/api/trend")
+@login_required
+def trend_api():
+    """
+    Lookup counts per time bucket from the rollups kept on every append,
+    e.g. /api/trend?granularity=hour&hours=24
+    """
+    granularity = request.args.get("granularity", "hour")
+    if granularity not in ROLLUP_GRANULARITIES:
+        return jsonify({"error": f"granularity must be one of {', '.join(ROLLUP_GRANULARITIES)}"}), 400
+    try:
+        hours = min(max(int(request.args.get("hours", 24)), 1), 24 * 90)
+    except ValueError:
+        return jsonify({"error": "hours must be an integer"}), 400
+    since = datetime.utcnow() - timedelta(hours=hours)
+    buckets = get_trend(granularity, since)
+    for b in buckets:
+        b["bucket"] = b["bucket"].strftime("%Y-%m-%d %H:%M:%S UTC")
+    return jsonify({"granularity": granularity, "hours": hours, "buckets": buckets})
+
+
+@dashboard_bp.route("/api/country-histogram")
+@login_required
+def country_histogram_api():
+    """
+    IP lookups per country and verdict, most looked-up countries first.
+    """
+    countries = [
+        dict(verdicts, country=country, total=sum(verdicts.values()))
+        for country, verdicts in get_country_histogram().items()
+    ]
+    countries.sort(key=lambda c: c["total"], reverse=True)
+    return jsonify({"countries": countries})
@@ -0,0 +1,203 @@
+import heapq
+import ipaddress
+import os
+import threading
+from array import array
+from bisect import bisect_left
+
+from feeds.store import StateFile
+from ioc.columns import Dictionary
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+ABUSEIPDB_STATE_FILE = os.getenv(
+    "ABUSEIPDB_STATE_FILE", os.path.join(BASE_DIR, "abuseipdb_blacklist.json")
+)
+# Added/removed IPs kept from the last sync for display; counts are exact
+BLACKLIST_DIFF_KEEP = int(os.getenv("BLACKLIST_DIFF_KEEP", 100))
+
+
+def _ip_str(version, n):
+    return str(ipaddress.IPv4Address(n) if version == 4 else ipaddress.IPv6Address(n))
+
+
+class Blacklist:
+    """
+    Immutable blacklist snapshot: IPv4 addresses as a sorted uint32
+    array (IPv6 as a sorted list of ints), with parallel arrays for the
+    abuse score (uint8) and dictionary-encoded country (uint16).
+    Membership is a binary search; an IPv4 entry costs 7 bytes.
+    """
+
+    __slots__ = ("synced_at", "_v4", "_v6", "_scores", "_countries", "_country_dict")
+
+    def __init__(self, entries=(), synced_at=0):
+        """entries: iterable of (ip, abuse score, country code)."""
+        rows = {}
+        for ip, score, country in entries:
+            try:
+                addr = ipaddress.ip_address(ip)
+            except (TypeError, ValueError):
+                continue
+            rows[(addr.version, int(addr))] = (score, country)
+
+        self.synced_at = synced_at
+        self._v4 = array("I")
+        self._v6 = []
+        self._scores = array("B")
+        self._countries = array("H")
+        self._country_dict = Dictionary()
+        # v4 rows sort first, so row i of the v6 list is i + len(_v4)
+        for (version, n), (score, country) in sorted(rows.items()):
+            (self._v4 if version == 4 else self._v6).append(n)
+            self._scores.append(min(max(int(score or 0), 0), 100))
+            self._countries.append(self._country_dict.code(country.upper()) if country else 0)
+
+    def __len__(self):
+        return len(self._scores)
+
+    def _index(self, ip):
+        try:
+            addr = ipaddress.ip_address(ip)
+        except (TypeError, ValueError):
+            return None
+        if addr.version == 6 and addr.ipv4_mapped:
+            addr = addr.ipv4_mapped
+        keys, offset = (self._v4, 0) if addr.version == 4 else (self._v6, len(self._v4))
+        n = int(addr)
+        i = bisect_left(keys, n)
+        if i < len(keys) and keys[i] == n:
+            return offset + i
+        return None
+
+    def __contains__(self, ip):
+        return self._index(ip) is not None
+
+    def _row(self, i):
+        if i < len(self._v4):
+            ip = _ip_str(4, self._v4[i])
+        else:
+            ip = _ip_str(6, self._v6[i - len(self._v4)])
+        return ip, self._scores[i], self._country_dict.values[self._countries[i]]
+
+    def get(self, ip):
+        """{"ip", "score", "country"} if `ip` is listed, else None."""
+        i = self._index(ip)
+        if i is None:
+            return None
+        ip, score, country = self._row(i)
+        return {"ip": ip, "score": score, "country": country}
+
+    def entries(self):
+        """(ip, score, country) in address order."""
+        for i in range(len(self)):
+            yield self._row(i)
+
+    def top(self, n, min_score=0):
+        """The n highest-scoring entries as (ip, score, country)."""
+        scores = self._scores
+        best = heapq.nlargest(
+            n, (i for i in range(len(scores)) if scores[i] >= min_score), key=scores.__getitem__
+        )
+        return [self._row(i) for i in best]
+
+    def keys(self):
+        """Sorted (version, int) keys, for diff()."""
+        for n in self._v4:
+            yield 4, n
+        for n in self._v6:
+            yield 6, n
+
+
+def diff(old, new):
+    """
+    (added, removed) IP strings between two Blacklists, in one merge
+    walk over their sorted keys.
+    """
+    added, removed = [], []
+    old_keys, new_keys = old.keys(), new.keys()
+    a, b = next(old_keys, None), next(new_keys, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a < b):
+            removed.append(a)
+            a = next(old_keys, None)
+        elif a is None or b < a:
+            added.append(b)
+            b = next(new_keys, None)
+        else:
+            a, b = next(old_keys, None), next(new_keys, None)
+    return [_ip_str(*k) for k in added], [_ip_str(*k) for k in removed]
+
+
+class BlacklistStore:
+    """
+    The last synced blacklist, persisted to a state file so restarts
+    and other workers serve it without calling AbuseIPDB. Readers get
+    an immutable Blacklist; replace() swaps in a new one and records
+    what changed.
+    """
+
+    def __init__(self, path=ABUSEIPDB_STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._blacklist = None
+        self._mtime = None
+        self.last_diff = {}
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def current(self):
+        """
+        The blacklist, reloaded from disk when another process synced
+        since we last read it. Never touches the network.
+        """
+        mtime = self._file_mtime()
+        if self._blacklist is None or mtime != self._mtime:
+            with self._lock:
+                if self._blacklist is None or mtime != self._mtime:
+                    state = StateFile(self.path)
+                    self._blacklist = Blacklist(state.get("entries") or (), state.get("synced_at", 0))
+                    self.last_diff = state.get("diff") or {}
+                    self._mtime = mtime
+        return self._blacklist
+
+    def replace(self, new):
+        """Persist `new` as the current blacklist; returns the diff summary."""
+        old = self.current()
+        added, removed = diff(old, new)
+        summary = {
+            "synced_at": new.synced_at,
+            "size": len(new),
+            "added_count": len(added),
+            "removed_count": len(removed),
+            "added": added[:BLACKLIST_DIFF_KEEP],
+            "removed": removed[:BLACKLIST_DIFF_KEEP],
+        }
+        with self._lock:
+            StateFile(self.path).update(
+                synced_at=new.synced_at,
+                entries=[list(e) for e in new.entries()],
+                diff=summary,
+            )
+            self._blacklist = new
+            self.last_diff = summary
+            self._mtime = self._file_mtime()
+        return summary
+
+    def lookup(self, ip):
+        """AbuseIPDB blacklist entry for `ip`, or None."""
+        return self.current().get(ip)
+
+
+abuseipdb_blacklist = BlacklistStore()
+
+
+def _reset_after_fork():
+    abuseipdb_blacklist._lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,134 @@
+import threading
+import time
+from datetime import datetime
+
+from feeds.scheduler import feed_store
+from feeds.services import FEED_PROVIDERS
+from ioc.columns import get_history_columns
+from ioc.normalize import detect
+from tickets.models import open_tickets_by_ioc
+
+# Feed severities, lowest first; a merged record keeps the highest
+SEVERITY_RANK = {"low": 1, "medium": 2, "high": 3, "critical": 4}
+
+
+def indicator_key(item):
+    """
+    (ioc_type, canonical value) for a feed item. Shodan's "ip:port"
+    indicators key on the IP so they meet AbuseIPDB's bare IPs. Items
+    that aren't an IP, domain, URL or hash (CVEs, emails...) key on
+    their raw type and value and are never merged.
+    """
+    raw = (item.get("indicator") or "").strip()
+    found = detect(raw)
+    if found is None:
+        host, sep, port = raw.rpartition(":")
+        if sep and port.isdigit():
+            found = detect(host)
+    return found or ((item.get("type") or "").lower(), raw)
+
+
+def _fmt(epoch):
+    return datetime.utcfromtimestamp(epoch).strftime("%Y-%m-%d %H:%M:%S UTC")
+
+
+def correlate(items, seen=None, now=None):
+    """
+    Merge feed items into one record per canonical indicator:
+    {indicator, type, sources, severity, descriptions, first_seen,
+    last_seen}. `seen` maps a key to its (first, last) epoch; keys
+    without an entry are stamped with `now`. Highest severity first,
+    then the most sources.
+    """
+    return _merge(((indicator_key(item), item) for item in items), seen, now)
+
+
+def _merge(keyed, seen=None, now=None):
+    now = time.time() if now is None else now
+    seen = seen or {}
+    records = {}
+    for key, item in keyed:
+        rec = records.get(key)
+        if rec is None:
+            first, last = seen.get(key, (now, now))
+            rec = records[key] = {
+                "indicator": key[1],
+                "type": key[0],
+                "sources": [],
+                "severity": item.get("severity"),
+                "descriptions": [],
+                "first_seen": _fmt(first),
+                "last_seen": _fmt(last),
+            }
+        source = item.get("source")
+        if source not in rec["sources"]:
+            rec["sources"].append(source)
+        if SEVERITY_RANK.get(item.get("severity"), 0) > SEVERITY_RANK.get(rec["severity"], 0):
+            rec["severity"] = item["severity"]
+        description = (source, item.get("description"))
+        if description[1] and description not in rec["descriptions"]:
+            rec["descriptions"].append(description)
+    return sorted(
+        records.values(),
+        key=lambda r: (SEVERITY_RANK.get(r["severity"], 0), len(r["sources"])),
+        reverse=True,
+    )
+
+
+class FeedCorrelator:
+    """
+    Correlated view of the feed table, rebuilt on every SnapshotStore
+    publish. Remembers when each indicator was first and last seen in
+    any feed for as long as some feed still carries it. Items are keyed
+    once, when their provider's snapshot arrives.
+    """
+
+    def __init__(self, sources):
+        self.sources = list(sources)
+        self._keyed = {}  # source -> [(key, item), ...]
+        self._seen = {}  # key -> (first epoch, last epoch)
+        self._records = ()
+        self._lock = threading.Lock()
+
+    def on_feed_snapshot(self, snap):
+        if snap.name not in self.sources:
+            return  # not part of the feed table (e.g. ThreatMap)
+        keyed = [(indicator_key(item), item) for item in snap.items]
+        with self._lock:
+            self._keyed[snap.name] = keyed
+            seen = self._seen
+            for key, _ in keyed:
+                first, _ = seen.get(key, (snap.fetched_at, None))
+                seen[key] = (first, snap.fetched_at)
+
+            ordered = [pair for name in self.sources for pair in self._keyed.get(name, ())]
+            current = {key for key, _ in ordered}
+            self._seen = {k: v for k, v in seen.items() if k in current}
+            self._records = tuple(_merge(ordered, self._seen))
+
+    def records(self):
+        return self._records
+
+
+def annotate(records):
+    """
+    Copies of `records` with what we already know about each indicator:
+    "lookup" (verdict and time of its latest IOC lookup, or None) and
+    "tickets" (ids of its open tickets). One dict probe per record
+    against the history snapshot plus a single batched ticket query.
+    """
+    cols = get_history_columns()
+    tickets = open_tickets_by_ioc([r["indicator"] for r in records])
+    annotated = []
+    for rec in records:
+        i = cols.find(rec["indicator"])
+        lookup = None
+        if i is not None and i < len(cols.countries):
+            lookup = {"verdict": cols.verdict(i), "looked_up_at": _fmt(cols.created[i])}
+        annotated.append(dict(rec, lookup=lookup, tickets=tickets.get(rec["indicator"], [])))
+    return annotated
+
+
+# Same sources and order as the /feeds/ table
+feed_correlator = FeedCorrelator(FEED_PROVIDERS)
+feed_store.add_listener(feed_correlator.on_feed_snapshot)
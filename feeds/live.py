@@ -0,0 +1,150 @@
+import os
+import queue
+import threading
+
+from feeds.scheduler import feed_store
+from ioc.history import verdict_of
+from ioc.services import LOOKUP_LISTENERS, get_globe_points, map_point
+from services.geoip import locate
+
+# Per-client buffer; a client that falls this far behind is dropped
+# and reconnects (EventSource does that on its own) to get a fresh snapshot.
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", 100))
+
+
+def points_json(points):
+    """MapPoints as JSON-ready dicts, built only for the response."""
+    return [p._asdict() for p in points]
+
+
+class Broadcaster:
+    """
+    Fan-out of events to any number of subscriber queues.
+    """
+
+    def __init__(self, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.maxsize)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # Too slow: cut it off, the stream will end and reconnect
+                self.unsubscribe(q)
+                try:
+                    q.put_nowait(None)
+                except queue.Full:
+                    pass
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+class ThreatMapLive:
+    """
+    Current threat-map set (AbuseIPDB feed points plus looked-up IPs),
+    keyed by IP. Every change is diffed against the previous set and
+    broadcast as {"added": [...], "removed": [ip, ...]}, so one upstream
+    refresh serves every connected client.
+    """
+
+    def __init__(self):
+        self.broadcaster = Broadcaster()
+        self._feed = {}
+        self._lookups = None  # loaded from history on first use
+        self._merged = {}
+        self._lock = threading.Lock()
+
+    def _ensure_lookups(self):
+        if self._lookups is None:
+            self._lookups = {p.ip: p for p in get_globe_points() if p.ip}
+
+    def _rebuild(self):
+        merged = dict(self._feed)
+        merged.update(self._lookups or {})
+        old = self._merged
+        self._merged = merged
+
+        added = [t for ip, t in merged.items() if old.get(ip) != t]
+        removed = [ip for ip in old if ip not in merged]
+        return added, removed
+
+    def points(self):
+        """The whole set as MapPoints (the stream's first event)."""
+        with self._lock:
+            if self._lookups is None:
+                # First client: load the lookups into the set. The caller
+                # gets them in this snapshot; nobody else needs a delta.
+                self._ensure_lookups()
+                self._rebuild()
+            return list(self._merged.values())
+
+    def feed_points(self):
+        """Only the feed's MapPoints, without anyone's lookups."""
+        return list(self._feed.values())
+
+    def _publish(self, added, removed):
+        if added or removed:
+            self.broadcaster.publish({"added": added, "removed": removed})
+
+    def on_feed_snapshot(self, snap):
+        if snap.name == "ThreatMap":
+            self.set_feed(snap.items)
+
+    def set_feed(self, items):
+        """Replace the feed points with fetch_threat_map() items."""
+        feed = {
+            t["ip"]: map_point(t["ip"], t.get("country"), t.get("city"), t.get("risk") or "malicious",
+                               t["lat"], t["lon"], "AbuseIPDB")
+            for t in items
+            if t.get("ip") and t.get("lat") is not None and t.get("lon") is not None
+        }
+        with self._lock:
+            self._ensure_lookups()
+            self._feed = feed
+            added, removed = self._rebuild()
+        self._publish(added, removed)
+
+    def on_lookups(self, entries):
+        points = {}
+        for e in entries:
+            if e["ioc_type"] != "ip":
+                continue
+            p = e.get("parsed") or {}
+            ip = p.get("value") or e["value"]
+            lat, lon = p.get("geo_lat"), p.get("geo_lon")
+            country = (p.get("geo_country") or p.get("country") or "").upper()
+            if lat is None or lon is None:
+                lat, lon, _, country = locate(ip, country)
+            if lat is None or lon is None:
+                continue
+            risk = verdict_of(p)
+            points[ip] = map_point(ip, country, p.get("geo_city"),
+                                   "harmless" if risk == "unknown" else risk, lat, lon, "lookup")
+        if not points:
+            return
+        with self._lock:
+            self._ensure_lookups()
+            self._lookups.update(points)
+            added, removed = self._rebuild()
+        self._publish(added, removed)
+
+
+threat_map_live = ThreatMapLive()
+feed_store.add_listener(threat_map_live.on_feed_snapshot)
+LOOKUP_LISTENERS.append(threat_map_live.on_lookups)
@@ -1,7 +1,9 @@
 from flask import Blueprint, render_template
 from flask_login import login_required
 
-from feeds.services import aggregate_feeds
+from feeds.correlate import annotate, correlate, feed_correlator
+from feeds.services import aggregate_feeds_with_status
+from feeds.scheduler import feed_ingest, feed_store
 
 feeds_bp = Blueprint("feeds", __name__)
 
@@ -9,5 +11,13 @@ feeds_bp = Blueprint("feeds", __name__)
 @feeds_bp.route("/")
 @login_required
 def feeds_home():
-    feeds = aggregate_feeds()
-    return render_template("feeds.html", feeds=feeds)
+    if feed_ingest.running:
+        records, feed_status = feed_correlator.records(), feed_store.status()
+    else:
+        items, feed_status = aggregate_feeds_with_status()
+        records = correlate(items)
+    # Ingestion is on but nothing has been fetched yet
+    warming_up = feed_ingest.running and feed_store.is_empty()
+    return render_template(
+        "feeds.html", feeds=annotate(records), feed_status=feed_status, warming_up=warming_up
+    )
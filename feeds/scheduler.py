@@ -0,0 +1,244 @@
+import fcntl
+import os
+import threading
+import time
+from concurrent.futures import wait
+
+from feeds.services import (
+    FEED_PROVIDERS,
+    FEEDS_DEADLINE,
+    ABUSEIPDB_API_KEY,
+    _executor,
+    _fetch_threat_map,
+    run_provider,
+)
+from feeds.store import SnapshotStore, StateFile
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+# Poll interval per provider (seconds). The AbuseIPDB jobs read the
+# locally synced blacklist; the download itself is further limited by
+# ABUSEIPDB_SYNC_INTERVAL since the endpoint allows few calls a day.
+FEED_INTERVALS = {
+    "OTX": int(os.getenv("FEED_INTERVAL_OTX", 300)),
+    "AbuseIPDB": int(os.getenv("FEED_INTERVAL_ABUSEIPDB", 3600)),
+    "Shodan": int(os.getenv("FEED_INTERVAL_SHODAN", 900)),
+    "ThreatMap": int(os.getenv("FEED_INTERVAL_THREAT_MAP", 3600)),
+}
+
+# Only the worker holding this lock polls the providers; it writes every
+# snapshot to FEEDS_SNAPSHOT_FILE and the other workers republish from
+# there, checking every FEEDS_FOLLOW_INTERVAL seconds (and taking over
+# the lock if the leader has gone away).
+FEEDS_LEADER_LOCK = os.getenv("FEEDS_LEADER_LOCK", os.path.join(BASE_DIR, "feeds_leader.lock"))
+FEEDS_SNAPSHOT_FILE = os.getenv("FEEDS_SNAPSHOT_FILE", os.path.join(BASE_DIR, "feeds_snapshot.json"))
+FEEDS_FOLLOW_INTERVAL = float(os.getenv("FEEDS_FOLLOW_INTERVAL", 5))
+
+# Items for the /feeds/ table, in display order
+feed_store = SnapshotStore(order=list(FEED_PROVIDERS))
+
+
+def _default_jobs():
+    jobs = {}
+    for name, (get_key, fetcher, limit) in FEED_PROVIDERS.items():
+        jobs[name] = (get_key, fetcher, limit, FEED_INTERVALS[name])
+    jobs["ThreatMap"] = (
+        lambda: ABUSEIPDB_API_KEY,
+        _fetch_threat_map,
+        20,
+        FEED_INTERVALS["ThreatMap"],
+    )
+    return jobs
+
+
+class FeedScheduler:
+    """
+    Polls each provider on its own interval from one background thread
+    and publishes the results into a SnapshotStore. Fetches run on the
+    shared feeds thread pool; a job never overlaps with itself.
+    """
+
+    def __init__(self, store, jobs):
+        self.store = store
+        self.jobs = jobs
+        self._next_run = {}
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, initial_sync=False):
+        """
+        Start polling. With `initial_sync`, first run every job once and
+        wait for them (up to FEEDS_DEADLINE) so the store isn't empty.
+        """
+        with self._lock:
+            if self.running:
+                return
+            self._stopped.clear()
+            now = time.monotonic()
+            self._next_run = {name: now for name in self.jobs}
+            if initial_sync:
+                self._in_flight.update(self.jobs)
+                self._next_run = {name: now + job[3] for name, job in self.jobs.items()}
+        if initial_sync:
+            wait([_executor.submit(self._run_job, name) for name in self.jobs],
+                 timeout=FEEDS_DEADLINE)
+        with self._lock:
+            self._thread = threading.Thread(
+                target=self._loop, name="feed-scheduler", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def run_once(self, name):
+        """Fetch one provider synchronously and publish it."""
+        get_key, fetcher, limit, _ = self.jobs[name]
+        items, status = run_provider(get_key, fetcher, limit)
+        previous = self.store.get(name)
+        if status["status"] == "error" and previous is not None:
+            # Keep serving the last good data; only the status changes
+            items = previous.items
+        return self.store.publish(name, items, status)
+
+    def _run_job(self, name):
+        try:
+            self.run_once(name)
+        finally:
+            with self._lock:
+                self._in_flight.discard(name)
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            now = time.monotonic()
+            for name, due in list(self._next_run.items()):
+                if due > now:
+                    continue
+                self._next_run[name] = now + self.jobs[name][3]
+                with self._lock:
+                    if name in self._in_flight:
+                        continue
+                    self._in_flight.add(name)
+                _executor.submit(self._run_job, name)
+
+            sleep_for = min(self._next_run.values()) - time.monotonic()
+            self._wakeup.wait(timeout=max(sleep_for, 0.05))
+            self._wakeup.clear()
+
+
+class FeedIngest:
+    """
+    Runs the FeedScheduler in one process only: whichever worker takes
+    the leader flock polls the providers and saves every snapshot; the
+    others follow the saved snapshots, so upstream traffic doesn't grow
+    with the worker count. A follower that finds the lock free (the
+    leader exited) becomes the leader.
+    """
+
+    def __init__(self, scheduler, store, lock_path=FEEDS_LEADER_LOCK,
+                 snapshot_path=FEEDS_SNAPSHOT_FILE):
+        self.scheduler = scheduler
+        self.store = store
+        self.lock_path = lock_path
+        self.snapshot_path = snapshot_path
+        self.role = None  # "leader" | "follower"
+        self._lock_file = None
+        self._saved = None
+        self._mtime = None
+        self._thread = None
+        self._lock = threading.Lock()
+        store.add_listener(self._save)
+
+    @property
+    def running(self):
+        if self.role == "leader":
+            return self.scheduler.running
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, initial_sync=False):
+        with self._lock:
+            if self.running:
+                return
+            # Serve whatever the last leader saved while we warm up
+            self._follow_once()
+            if self._try_lead():
+                self.role = "leader"
+                self.scheduler.start(initial_sync=initial_sync)
+                return
+            self.role = "follower"
+            self._thread = threading.Thread(target=self._follow, name="feed-follower", daemon=True)
+            self._thread.start()
+
+    def _try_lead(self):
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        # Held until this process exits
+        self._lock_file = lock_file
+        self._saved = StateFile(self.snapshot_path)
+        return True
+
+    def _save(self, snap):
+        if self.role != "leader" or self._saved is None:
+            return
+        self._saved.update(**{snap.name: {
+            "items": list(snap.items), "status": snap.status, "fetched_at": snap.fetched_at,
+        }})
+
+    def _follow_once(self):
+        try:
+            mtime = os.stat(self.snapshot_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self._mtime = mtime
+            self.store.load(StateFile(self.snapshot_path).state)
+
+    def _follow(self):
+        while True:
+            time.sleep(FEEDS_FOLLOW_INTERVAL)
+            try:
+                self._follow_once()
+                if self._try_lead():
+                    self.role = "leader"
+                    self.scheduler.start()
+                    return
+            except Exception as e:
+                print("Feed follower error:", e)
+
+    def _after_fork(self):
+        # The lock, file handle and threads belong to the parent
+        self.role = None
+        self._lock_file = None
+        self._saved = None
+        self._mtime = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+
+scheduler = FeedScheduler(feed_store, _default_jobs())
+feed_ingest = FeedIngest(scheduler, feed_store)
+os.register_at_fork(after_in_child=feed_ingest._after_fork)
+
+
+def start_scheduler(initial_sync=False):
+    """
+    Start background feed ingestion for this process: the scheduler in
+    the leader worker, snapshot following in the others. Disabled with
+    FEEDS_SCHEDULER=0.
+    """
+    if os.getenv("FEEDS_SCHEDULER", "1") == "0":
+        return None
+    feed_ingest.start(initial_sync=initial_sync)
+    return feed_ingest
@@ -1,47 +1,320 @@
+import fcntl
+import heapq
 import os
-import requests
-from dotenv import load_dotenv
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from itertools import chain
 
-load_dotenv()
+from feeds.blacklist import ABUSEIPDB_STATE_FILE, Blacklist, abuseipdb_blacklist
+from feeds.store import StateFile
+from services.http_client import QUOTA_RETRY_STATUSES, register_provider
+from services.metrics import upstream_errors
+from services.geoip import locate
 
 OTX_API_KEY = os.getenv("OTX_API_KEY")
 ABUSEIPDB_API_KEY = os.getenv("ABUSEIPDB_API_KEY")
 SHODAN_API_KEY = os.getenv("SHODAN_API_KEY")
 
+# Overridable so the benchmark harness can point at a local stand-in
+OTX_BASE_URL = os.getenv("OTX_BASE_URL", "https://otx.alienvault.com")
+ABUSEIPDB_BASE_URL = os.getenv("ABUSEIPDB_BASE_URL", "https://api.abuseipdb.com")
+SHODAN_BASE_URL = os.getenv("SHODAN_BASE_URL", "https://api.shodan.io")
 
-def fetch_otx_pulses(limit=5):
+otx_client = register_provider(
+    "otx", headers={"X-OTX-API-KEY": OTX_API_KEY or ""}, timeout=20
+)
+abuseipdb_client = register_provider(
+    "abuseipdb",
+    headers={"Key": ABUSEIPDB_API_KEY or "", "Accept": "application/json"},
+    timeout=20,
+    retry_statuses=QUOTA_RETRY_STATUSES,
+)
+shodan_client = register_provider("shodan", timeout=20)
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+# OTX pulls are incremental: pulses modified since the watermark in
+# OTX_STATE_FILE, OTX_PAGE_SIZE per request. The first pull looks back
+# OTX_INITIAL_DAYS.
+OTX_STATE_FILE = os.getenv("OTX_STATE_FILE", os.path.join(BASE_DIR, "otx_state.json"))
+OTX_PAGE_SIZE = int(os.getenv("OTX_PAGE_SIZE", 20))
+OTX_INITIAL_DAYS = int(os.getenv("OTX_INITIAL_DAYS", 7))
+# Indicators kept for the /feeds/ table
+OTX_FEED_KEEP = int(os.getenv("OTX_FEED_KEEP", 100))
+
+# The AbuseIPDB blacklist is downloaded whole at most this often and
+# served locally in between (feed table, threat map, IOC lookups)
+ABUSEIPDB_SYNC_INTERVAL = int(os.getenv("ABUSEIPDB_SYNC_INTERVAL", 6 * 3600))
+# After a failed sync wait this long, doubling per consecutive failure up
+# to ABUSEIPDB_SYNC_INTERVAL, before trying again. Attempts are recorded
+# in a small file of their own: rewriting the blacklist file would make
+# every worker reload it.
+ABUSEIPDB_SYNC_BACKOFF = int(os.getenv("ABUSEIPDB_SYNC_BACKOFF", 300))
+ABUSEIPDB_SYNC_STATE_FILE = os.getenv(
+    "ABUSEIPDB_SYNC_STATE_FILE", os.path.splitext(ABUSEIPDB_STATE_FILE)[0] + ".sync.json"
+)
+ABUSEIPDB_BLACKLIST_LIMIT = int(os.getenv("ABUSEIPDB_BLACKLIST_LIMIT", 10000))
+ABUSEIPDB_CONFIDENCE_MIN = int(os.getenv("ABUSEIPDB_CONFIDENCE_MIN", 75))
+THREAT_MAP_MIN_SCORE = int(os.getenv("THREAT_MAP_MIN_SCORE", 85))
+
+# Overall budget for one aggregate_feeds() call (seconds)
+FEEDS_DEADLINE = float(os.getenv("FEEDS_DEADLINE", 8))
+
+# Shared pool so providers run side by side instead of one after another
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("FEEDS_MAX_WORKERS", 8)),
+    thread_name_prefix="feeds",
+)
+
+
+class FeedError(Exception):
+    """Raised by the _fetch_* helpers when a provider returns an error."""
+
+
+def iter_otx_pages(state, checkpoint=None):
     """
-    AlienVault OTX - basic example pulling subscribed pulses.
-    Needs OTX_API_KEY.
+    Walk /pulses/subscribed one page at a time, yielding each page's
+    pulses. Only one page (OTX_PAGE_SIZE pulses) is held at a time.
+
+    `state` (a StateFile) carries the `modified_since` watermark and,
+    while a pull is in progress, the `next` page URL, saved after every
+    page is consumed; a restarted pull resumes from that page. When the
+    last page is done the watermark moves up to the newest pulse seen.
+    `checkpoint()`, if given, returns more state to save with each page.
     """
-    if not OTX_API_KEY:
-        return []
+    url = state.get("next")
+    params = None
+    if not url:
+        since = state.get("modified_since") or (
+            datetime.utcnow() - timedelta(days=OTX_INITIAL_DAYS)
+        ).strftime("%Y-%m-%dT%H:%M:%S")
+        url = f"{OTX_BASE_URL}/api/v1/pulses/subscribed"
+        params = {"limit": OTX_PAGE_SIZE, "modified_since": since}
 
-    url = "https://otx.alienvault.com/api/v1/pulses/subscribed"
-    headers = {"X-OTX-API-KEY": OTX_API_KEY}
-    try:
-        resp = requests.get(url, headers=headers, timeout=20)
+    newest = state.get("newest") or ""
+    while url:
+        resp = otx_client.get(url, params=params)
         if resp.status_code != 200:
-            print("OTX error:", resp.status_code, resp.text)
-            return []
+            raise FeedError(f"OTX error: {resp.status_code} {resp.text}")
         data = resp.json()
-        items = []
-        pulses = data.get("results", [])[:limit]
+        pulses = data.get("results") or []
+        url, params = data.get("next"), None
+
+        yield pulses
+
         for p in pulses:
-            indicators = p.get("indicators", [])
-            if not indicators:
-                continue
-            ind = indicators[0]
-            items.append(
-                {
-                    "source": "OTX",
-                    "type": ind.get("type"),
-                    "indicator": ind.get("indicator"),
-                    "severity": "high",
-                    "description": p.get("name"),
-                }
+            newest = max(newest, p.get("modified") or "")
+        state.update(next=url, newest=newest, **(checkpoint() if checkpoint else {}))
+
+    state.update(modified_since=newest or state.get("modified_since"), next=None, newest=None)
+
+
+def _otx_items(pulses):
+    for p in pulses:
+        for ind in p.get("indicators") or ():
+            yield {
+                "source": "OTX",
+                "type": ind.get("type"),
+                "indicator": ind.get("indicator"),
+                "severity": "high",
+                "description": p.get("name"),
+                "modified": p.get("modified"),
+            }
+
+
+def iter_otx_indicators(state):
+    """
+    Every indicator of every pulse modified since the watermark, as
+    feed items, streamed page by page (see iter_otx_pages).
+    """
+    for pulses in iter_otx_pages(state):
+        yield from _otx_items(pulses)
+
+
+_otx_lock = threading.Lock()
+# Newest indicators shown in the /feeds/ table, carried across
+# incremental pulls; the rest are streamed and not kept. Saved as
+# "recent" in OTX_STATE_FILE with the cursor, so a restarted or
+# another worker shows the same table without re-reading old pulses.
+_otx_recent = deque()
+
+
+def _fetch_otx(limit):
+    global _otx_recent
+    # One pull at a time since pulls share the cursor; callers arriving
+    # during a pull get the indicators collected so far, or wait for the
+    # pull when there is nothing to show yet
+    if not _otx_lock.acquire(blocking=False):
+        if _otx_recent:
+            return list(_otx_recent)
+        with _otx_lock:
+            return list(_otx_recent)
+    try:
+        # Re-read every pull: another worker may have moved the cursor
+        state = StateFile(OTX_STATE_FILE)
+        _otx_recent = deque(state.get("recent") or (), maxlen=limit)
+        for pulses in iter_otx_pages(state, checkpoint=lambda: {"recent": list(_otx_recent)}):
+            # OTX pages come newest-first; keep the newest by `modified`
+            # whatever order pulses and pages arrive in
+            _otx_recent = deque(
+                heapq.nlargest(limit, chain(_otx_recent, _otx_items(pulses)),
+                               key=lambda item: item.get("modified") or ""),
+                maxlen=limit,
             )
-        return items
+        return list(_otx_recent)
+    finally:
+        _otx_lock.release()
+
+
+_blacklist_sync_lock = threading.Lock()
+
+
+def _blacklist_sync_due(state):
+    now = time.time()
+    if now - abuseipdb_blacklist.current().synced_at < ABUSEIPDB_SYNC_INTERVAL:
+        return False
+    failures = state.get("failures", 0)
+    if not failures:
+        return True
+    backoff = min(ABUSEIPDB_SYNC_INTERVAL, ABUSEIPDB_SYNC_BACKOFF * 2 ** (failures - 1))
+    return now - state.get("last_attempt", 0) >= backoff
+
+
+def sync_abuseipdb_blacklist(force=False):
+    """
+    Download the full AbuseIPDB blacklist into abuseipdb_blacklist, at
+    most once per ABUSEIPDB_SYNC_INTERVAL across restarts and workers
+    (the endpoint allows a handful of calls a day), backing off after
+    failures. Returns the diff summary, or None when no sync was due
+    or another thread or process is already syncing; callers then
+    serve the blacklist they have, or wait for that sync when they
+    have none yet.
+    """
+    if not force and not _blacklist_sync_due(StateFile(ABUSEIPDB_SYNC_STATE_FILE)):
+        return None
+    wait = not len(abuseipdb_blacklist.current())
+    if not _blacklist_sync_lock.acquire(blocking=wait):
+        return None
+    try:
+        # One process syncs at a time; the lock goes with the file handle
+        with open(ABUSEIPDB_SYNC_STATE_FILE + ".lock", "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+            except BlockingIOError:
+                return None
+            # Re-read under the lock: another worker may have just synced
+            state = StateFile(ABUSEIPDB_SYNC_STATE_FILE)
+            if not force and not _blacklist_sync_due(state):
+                return None
+            state.update(last_attempt=time.time())
+            try:
+                summary = _download_abuseipdb_blacklist()
+            except Exception as e:
+                state.update(failures=state.get("failures", 0) + 1, last_error=str(e)[:500])
+                raise
+            state.update(failures=0, last_error=None)
+            return summary
+    finally:
+        _blacklist_sync_lock.release()
+
+
+def _download_abuseipdb_blacklist():
+    resp = abuseipdb_client.get(
+        f"{ABUSEIPDB_BASE_URL}/api/v2/blacklist",
+        params={"confidenceMinimum": ABUSEIPDB_CONFIDENCE_MIN, "limit": ABUSEIPDB_BLACKLIST_LIMIT},
+    )
+    if resp.status_code != 200:
+        raise FeedError(f"AbuseIPDB error: {resp.status_code} {resp.text}")
+    new = Blacklist(
+        (
+            (d.get("ipAddress"), d.get("abuseConfidenceScore"), d.get("countryCode"))
+            for d in resp.json().get("data", [])
+        ),
+        synced_at=time.time(),
+    )
+    summary = abuseipdb_blacklist.replace(new)
+    print(
+        f"AbuseIPDB blacklist synced: {summary['size']} IPs,"
+        f" +{summary['added_count']} -{summary['removed_count']}"
+    )
+    return summary
+
+
+def _fetch_abuseipdb(limit):
+    sync_abuseipdb_blacklist()
+    items = []
+    for ip, score, country in abuseipdb_blacklist.current().top(limit):
+        items.append(
+            {
+                "source": "AbuseIPDB",
+                "type": "IP",
+                "indicator": ip,
+                "severity": "high",
+                "description": f"Abuse score: {score} / Country: {country or 'N/A'}",
+            }
+        )
+    return items
+
+
+def _fetch_shodan(limit):
+    url = f"{SHODAN_BASE_URL}/shodan/host/search"
+    resp = shodan_client.get(url, params={"key": SHODAN_API_KEY, "query": "port:3389"})
+    if resp.status_code != 200:
+        raise FeedError(f"Shodan error: {resp.status_code} {resp.text}")
+    data = resp.json()
+    matches = data.get("matches", [])[:limit]
+    items = []
+    for m in matches:
+        ip = m.get("ip_str")
+        port = m.get("port")
+        org = m.get("org")
+        items.append(
+            {
+                "source": "Shodan",
+                "type": "IP",
+                "indicator": f"{ip}:{port}",
+                "severity": "medium",
+                "description": f"Exposed service detected. Org: {org}",
+            }
+        )
+    return items
+
+
+def _fetch_threat_map(limit):
+    """
+    High-confidence entries of the synced AbuseIPDB blacklist, placed
+    on the map with the offline GeoIP index.
+    """
+    sync_abuseipdb_blacklist()
+    threats = []
+    for ip, score, country in abuseipdb_blacklist.current().top(limit, min_score=THREAT_MAP_MIN_SCORE):
+        lat, lon, city, country = locate(ip, country)
+        threats.append(
+            {
+                "ip": ip,
+                "country": country,
+                "city": city,
+                "risk": "malicious",
+                "lat": lat,
+                "lon": lon,
+            }
+        )
+    return threats
+
+
+def fetch_otx_pulses(limit=OTX_FEED_KEEP):
+    """
+    AlienVault OTX - indicators from subscribed pulses, pulled
+    incrementally. Returns the newest `limit`.
+    Needs OTX_API_KEY.
+    """
+    if not OTX_API_KEY:
+        return []
+    try:
+        return _fetch_otx(limit)
     except Exception as e:
         print("OTX exception:", e)
         return []
@@ -49,33 +322,13 @@ def fetch_otx_pulses(limit=5):
 
 def fetch_abuseipdb_blacklist(limit=10):
     """
-    AbuseIPDB blacklist.
+    Highest-scoring entries of the synced AbuseIPDB blacklist.
     Needs ABUSEIPDB_API_KEY.
     """
     if not ABUSEIPDB_API_KEY:
         return []
-
-    url = "https://api.abuseipdb.com/api/v2/blacklist"
-    headers = {"Key": ABUSEIPDB_API_KEY, "Accept": "application/json"}
     try:
-        resp = requests.get(url, headers=headers, timeout=20)
-        if resp.status_code != 200:
-            print("AbuseIPDB error:", resp.status_code, resp.text)
-            return []
-        data = resp.json()
-        ips = data.get("data", [])[:limit]
-        items = []
-        for ip in ips:
-            items.append(
-                {
-                    "source": "AbuseIPDB",
-                    "type": "IP",
-                    "indicator": ip.get("ipAddress"),
-                    "severity": "high",
-                    "description": f"Abuse score: {ip.get('abuseConfidenceScore')} / ISP: {ip.get('isp')}",
-                }
-            )
-        return items
+        return _fetch_abuseipdb(limit)
     except Exception as e:
         print("AbuseIPDB exception:", e)
         return []
@@ -88,43 +341,124 @@ def fetch_shodan_sample(limit=5):
     """
     if not SHODAN_API_KEY:
         return []
-
-    query = "port:3389"
-    url = f"https://api.shodan.io/shodan/host/search?key={SHODAN_API_KEY}&query={query}"
     try:
-        resp = requests.get(url, timeout=20)
-        if resp.status_code != 200:
-            print("Shodan error:", resp.status_code, resp.text)
-            return []
-        data = resp.json()
-        matches = data.get("matches", [])[:limit]
-        items = []
-        for m in matches:
-            ip = m.get("ip_str")
-            port = m.get("port")
-            org = m.get("org")
-            items.append(
-                {
-                    "source": "Shodan",
-                    "type": "IP",
-                    "indicator": f"{ip}:{port}",
-                    "severity": "medium",
-                    "description": f"Exposed service detected. Org: {org}",
-                }
-            )
-        return items
+        return _fetch_shodan(limit)
     except Exception as e:
         print("Shodan exception:", e)
         return []
 
 
-def aggregate_feeds():
+def fetch_threat_map(limit=20):
+    """
+    Threat-map points from the synced AbuseIPDB blacklist.
+    Needs ABUSEIPDB_API_KEY.
+    """
+    if not ABUSEIPDB_API_KEY:
+        return []
+    try:
+        return _fetch_threat_map(limit)
+    except Exception as e:
+        print("AbuseIPDB threat map exception:", e)
+        return []
+
+
+# name -> (api key, fetcher, limit)
+FEED_PROVIDERS = {
+    "OTX": (lambda: OTX_API_KEY, _fetch_otx, OTX_FEED_KEEP),
+    "AbuseIPDB": (lambda: ABUSEIPDB_API_KEY, _fetch_abuseipdb, 10),
+    "Shodan": (lambda: SHODAN_API_KEY, _fetch_shodan, 5),
+}
+
+
+def run_provider(get_key, fetcher, limit):
+    """
+    Run one provider synchronously and return (items, status) in the
+    same shape aggregate_feeds_with_status() reports.
+    """
+    if not get_key():
+        return [], {"status": "disabled", "latency_ms": 0, "count": 0}
+    items, error, elapsed = _timed(fetcher, limit)
+    if error is not None:
+        print("Feed exception:", error)
+        return [], {
+            "status": "error",
+            "latency_ms": int(elapsed * 1000),
+            "count": 0,
+            "error": str(error),
+        }
+    return items, {
+        "status": "ok",
+        "latency_ms": int(elapsed * 1000),
+        "count": len(items),
+    }
+
+
+def _timed(fetcher, limit):
+    start = time.monotonic()
+    try:
+        return fetcher(limit), None, time.monotonic() - start
+    except Exception as e:
+        return [], e, time.monotonic() - start
+
+
+def aggregate_feeds_with_status(deadline=FEEDS_DEADLINE):
+    """
+    Run every enabled provider concurrently and wait at most `deadline`
+    seconds. Returns (items, status) where status maps provider name to
+    {"status": ok|error|timeout|disabled, "latency_ms", "count"[, "error"]}.
+    Providers that miss the deadline are reported as timeouts and their
+    late results are dropped.
+    """
+    start = time.monotonic()
+    futures = {}
+    status = {}
+
+    for name, (get_key, fetcher, limit) in FEED_PROVIDERS.items():
+        if not get_key():
+            status[name] = {"status": "disabled", "latency_ms": 0, "count": 0}
+            continue
+        futures[name] = _executor.submit(_timed, fetcher, limit)
+
+    wait(futures.values(), timeout=deadline)
+
+    all_items = []
+    for name, fut in futures.items():
+        if not fut.done():
+            fut.cancel()
+            status[name] = {
+                "status": "timeout",
+                "latency_ms": int((time.monotonic() - start) * 1000),
+                "count": 0,
+            }
+            upstream_errors.inc(provider=name.lower(), reason="deadline")
+            print(f"{name} feed timed out after {deadline}s")
+            continue
+
+        items, error, elapsed = fut.result()
+        if error is not None:
+            print(f"{name} exception:", error)
+            status[name] = {
+                "status": "error",
+                "latency_ms": int(elapsed * 1000),
+                "count": 0,
+                "error": str(error),
+            }
+            continue
+
+        all_items.extend(items)
+        status[name] = {
+            "status": "ok",
+            "latency_ms": int(elapsed * 1000),
+            "count": len(items),
+        }
+
+    return all_items, status
+
+
+def aggregate_feeds(deadline=FEEDS_DEADLINE):
     """
     Combine all enabled feeds into a single list.
     If an API key is missing, that feed is simply skipped.
     """
-    all_items = []
-    all_items.extend(fetch_otx_pulses(limit=5))
-    all_items.extend(fetch_abuseipdb_blacklist(limit=10))
-    all_items.extend(fetch_shodan_sample(limit=5))
-    return all_items
+    items, _ = aggregate_feeds_with_status(deadline)
+    return items
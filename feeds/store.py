@@ -0,0 +1,163 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from services.writer import should_fsync
+
+
+class Snapshot:
+    """
+    Immutable result of one provider fetch.
+    """
+
+    __slots__ = ("name", "version", "items", "status", "fetched_at")
+
+    def __init__(self, name, version, items, status, fetched_at):
+        self.name = name
+        self.version = version
+        self.items = items
+        self.status = status
+        self.fetched_at = fetched_at
+
+
+class SnapshotStore:
+    """
+    In-process, copy-on-write store of the latest feed data.
+
+    Writers build a new mapping and swap the reference under a lock;
+    readers just grab the current reference, so they never block and
+    never see a half-updated view. The combined feed list is
+    precomputed on publish so serving it is O(1).
+    """
+
+    def __init__(self, order=None):
+        self._order = list(order or [])
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._combined = ()
+        self._listeners = []
+        self.version = 0
+
+    def add_listener(self, fn):
+        """fn(snapshot) is called after every publish, outside the lock."""
+        self._listeners.append(fn)
+
+    def publish(self, name, items, status, fetched_at=None):
+        """
+        Swap in a new snapshot for `name`. `fetched_at` (epoch) is given
+        when republishing data fetched elsewhere, e.g. by another worker.
+        """
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with self._lock:
+            self.version += 1
+            snap = Snapshot(
+                name,
+                self.version,
+                tuple(items),
+                dict(status, fetched_at=datetime.utcfromtimestamp(fetched_at).strftime(
+                    "%Y-%m-%d %H:%M:%S UTC")),
+                fetched_at,
+            )
+            snapshots = dict(self._snapshots)
+            snapshots[name] = snap
+
+            combined = []
+            for key in self._order:
+                if key in snapshots:
+                    combined.extend(snapshots[key].items)
+
+            # Publish the new view in two reference swaps
+            self._combined = tuple(combined)
+            self._snapshots = snapshots
+
+        for fn in self._listeners:
+            try:
+                fn(snap)
+            except Exception as e:
+                print("Snapshot listener error:", e)
+        return snap
+
+    def get(self, name):
+        return self._snapshots.get(name)
+
+    def items(self, name):
+        snap = self._snapshots.get(name)
+        return snap.items if snap else ()
+
+    def combined_items(self):
+        return self._combined
+
+    def status(self):
+        snapshots = self._snapshots
+        return {
+            key: snapshots[key].status
+            for key in self._order
+            if key in snapshots
+        }
+
+    def is_empty(self):
+        return not self._snapshots
+
+    def dump(self):
+        """{name: {items, status, fetched_at}}, JSON-serializable."""
+        return {
+            name: {"items": list(snap.items), "status": snap.status, "fetched_at": snap.fetched_at}
+            for name, snap in self._snapshots.items()
+        }
+
+    def load(self, data):
+        """
+        Republish the snapshots in a dump() that are newer than ours.
+        Returns how many were taken.
+        """
+        taken = 0
+        for name, snap in (data or {}).items():
+            current = self._snapshots.get(name)
+            if current is not None and current.fetched_at >= snap["fetched_at"]:
+                continue
+            self.publish(name, snap["items"], snap["status"], fetched_at=snap["fetched_at"])
+            taken += 1
+        return taken
+
+
+class StateFile:
+    """
+    Small JSON document persisted next to the app (ingestion cursors,
+    sync watermarks) so a restart resumes where the last run stopped.
+    Writes are atomic: temp file, fsync per WRITE_FSYNC, rename.
+    """
+
+    def __init__(self, path, defaults=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.state = dict(defaults or {})
+        try:
+            with open(path, "r") as f:
+                self.state.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"State file {path} unreadable, starting over:", e)
+
+    def get(self, key, default=None):
+        return self.state.get(key, default)
+
+    def update(self, **changes):
+        directory = os.path.dirname(self.path) or "."
+        with self._lock:
+            self.state.update(changes)
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".state-", suffix=".json")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(self.state, f, indent=2)
+                    f.flush()
+                    if should_fsync():
+                        os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+            except Exception:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
@@ -0,0 +1,10 @@
+# gunicorn.conf.py - picked up automatically from the working directory
+
+
+def post_worker_init(worker):
+    # Feed ingestion threads must start in the worker, not the --preload
+    # master. One worker wins the leader lock and does a first fetch
+    # before serving; the rest follow its snapshots.
+    from feeds.scheduler import start_scheduler
+
+    start_scheduler(initial_sync=True)
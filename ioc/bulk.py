@@ -0,0 +1,131 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from feeds.blacklist import abuseipdb_blacklist
+from ioc.normalize import detect
+from ioc.parsers import parse_vt_response
+from ioc.services import lookup_ioc, record_lookups, vt_quota
+from services.cache import verdict_cache
+
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", 500))
+# VT allows only a few calls a minute, so a handful of workers is enough
+# to keep the rate limiter saturated without tying up threads.
+BULK_MAX_WORKERS = int(os.getenv("BULK_MAX_WORKERS", 4))
+
+_SPLIT_RE = re.compile(r"[\s,;]+")
+
+
+def detect_ioc_type(value: str):
+    """
+    Guess the IOC type of a single (possibly defanged) value, or None
+    if it isn't one.
+    """
+    found = detect(value)
+    return found[0] if found else None
+
+
+def parse_bulk_input(values):
+    """
+    Accepts a list of values or pasted text. Returns (items, rejected)
+    where items is a de-duplicated list of (ioc_type, canonical value)
+    in input order and rejected lists the tokens that aren't IOCs.
+    """
+    if isinstance(values, str):
+        values = _SPLIT_RE.split(values)
+
+    items = []
+    rejected = []
+    seen = set()
+    for raw in values:
+        value = (raw or "").strip().strip("\"'<>()")
+        if not value:
+            continue
+        found = detect(value)
+        if found is None:
+            rejected.append(value)
+            continue
+        if found in seen:
+            continue
+        seen.add(found)
+        items.append(found)
+    return items, rejected
+
+
+def _result(ioc_type, value, vt_json, cached, blacklist):
+    # AbuseIPDB blacklist entry from the local copy, for IPs
+    listed = blacklist.get(value) if ioc_type == "ip" else None
+    if vt_json is None:
+        # Cached 404s and fresh 404s both end up here
+        status = "not_found" if cached else "error"
+        return {"ioc_type": ioc_type, "value": value, "status": status,
+                "cached": cached, "parsed": None, "blacklist": listed}
+    return {
+        "ioc_type": ioc_type,
+        "value": value,
+        "status": "ok",
+        "cached": cached,
+        "parsed": parse_vt_response(vt_json, ioc_type),
+        "blacklist": listed,
+    }
+
+
+def run_bulk_lookup(items):
+    """
+    Generator yielding one result dict per item as it completes.
+    Cache hits are yielded first; only misses go upstream, fanned out
+    over a small pool so the VT rate limiter paces them. Successful
+    results are recorded in one record_lookups() batch at the end.
+    """
+    items = items[:BULK_MAX_ITEMS]
+    to_record = []
+    try:
+        yield from _run(items, to_record, abuseipdb_blacklist.current())
+    finally:
+        if to_record:
+            record_lookups(to_record)
+
+
+def _run(items, to_record, blacklist):
+    misses = []
+    for ioc_type, value in items:
+        hit, vt_json = verdict_cache.get(ioc_type, value)
+        if not hit:
+            misses.append((ioc_type, value))
+            continue
+        res = _result(ioc_type, value, vt_json, cached=True, blacklist=blacklist)
+        if res["parsed"]:
+            to_record.append((ioc_type, value, res["parsed"]))
+        yield res
+
+    if not misses:
+        return
+
+    pool = ThreadPoolExecutor(max_workers=BULK_MAX_WORKERS, thread_name_prefix="bulk")
+    try:
+        futures = {
+            pool.submit(lookup_ioc, ioc_type, value): (ioc_type, value)
+            for ioc_type, value in misses
+        }
+        for fut in as_completed(futures):
+            ioc_type, value = futures[fut]
+            try:
+                vt_json = fut.result()
+            except Exception as e:
+                print("Bulk lookup error:", value, e)
+                vt_json = None
+            res = _result(ioc_type, value, vt_json, cached=False, blacklist=blacklist)
+            if vt_json is None:
+                hit, _ = verdict_cache.peek(ioc_type, value)
+                if hit:
+                    res["status"] = "not_found"
+                else:
+                    quota = vt_quota()
+                    if quota["minute"] == 0 or quota["day"] == 0:
+                        res["status"] = "rate_limited"
+            if res["parsed"]:
+                to_record.append((ioc_type, value, res["parsed"]))
+            yield res
+    finally:
+        # Don't keep spending quota if the client went away
+        pool.shutdown(wait=False, cancel_futures=True)
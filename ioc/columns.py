@@ -0,0 +1,244 @@
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+
+from ioc.history import get_history_store
+
+TYPE_CODES = ("ip", "domain", "url", "hash")
+VERDICT_CODES = ("unknown", "harmless", "suspicious", "malicious")
+
+_TYPE_INDEX = {t: i for i, t in enumerate(TYPE_CODES)}
+_VERDICT_INDEX = {v: i for i, v in enumerate(VERDICT_CODES)}
+_U16_MAX = 0xFFFF
+_I32_MIN, _I32_MAX = -(2 ** 31), 2 ** 31 - 1
+
+# Full rebuild interval for the per-worker snapshot (picks up retention
+# purges); in between, only rows appended since the last refresh are read
+HISTORY_COLUMNS_REBUILD = int(os.getenv("HISTORY_COLUMNS_REBUILD", 3600))
+# parse_vt_response() outputs kept after details() fetched them
+DETAILS_CACHE_SIZE = int(os.getenv("HISTORY_DETAILS_CACHE", 256))
+
+
+class Dictionary:
+    """
+    Dictionary encoding: each distinct string is stored once (interned)
+    and rows keep a small integer code. Code 0 is None.
+    """
+
+    __slots__ = ("values", "_codes")
+
+    def __init__(self):
+        self.values = [None]
+        self._codes = {None: 0}
+
+    def code(self, value):
+        c = self._codes.get(value)
+        if c is None:
+            value = sys.intern(value)
+            c = len(self.values)
+            self.values.append(value)
+            self._codes[value] = c
+        return c
+
+    def __len__(self):
+        return len(self.values)
+
+
+def _u16(n):
+    return min(max(int(n or 0), 0), _U16_MAX)
+
+
+def _i32(n):
+    return min(max(int(n or 0), _I32_MIN), _I32_MAX)
+
+
+def _analysis_epoch(value):
+    """parse_vt_response()'s '%Y-%m-%d %H:%M:%S UTC' (or raw epoch) -> int, 0 if unknown."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if not value:
+        return 0
+    try:
+        dt = datetime.strptime(value, "%Y-%m-%d %H:%M:%S UTC")
+    except ValueError:
+        return 0
+    return int((dt - datetime(1970, 1, 1)).total_seconds())
+
+
+class HistoryColumns:
+    """
+    Array-backed, one-column-per-field copy of the lookup history.
+
+    A row costs ~25 bytes of fixed-width columns plus its value string,
+    instead of a dict holding the whole parse_vt_response() output.
+    IOC types and verdicts are 1-byte codes, detection counts uint16,
+    timestamps int32 epochs and countries dictionary-encoded uint16.
+    The large optional fields (categories, tags, names...) stay in the
+    history store and are fetched per row by details() when needed.
+    """
+
+    __slots__ = (
+        "cursors", "values", "types", "verdicts", "malicious", "suspicious",
+        "harmless", "undetected", "reputation", "created", "analysed",
+        "countries", "country_dict", "latest", "_loader", "_details", "_details_size",
+    )
+
+    def __init__(self, loader=None, details_cache=DETAILS_CACHE_SIZE):
+        self.cursors = array("q")  # store row ids; a list for non-int ids (Mongo)
+        self.values = []
+        self.types = array("B")
+        self.verdicts = array("B")
+        self.malicious = array("H")
+        self.suspicious = array("H")
+        self.harmless = array("H")
+        self.undetected = array("H")
+        self.reputation = array("i")
+        self.created = array("i")
+        self.analysed = array("i")  # last_analysis_date epoch, 0 = unknown
+        self.countries = array("H")
+        self.country_dict = Dictionary()
+        # Canonical value -> index of its newest row. Canonical IPs,
+        # domains, URLs and hashes never collide, so the value alone is
+        # the key.
+        self.latest = {}
+        self._loader = loader  # fn(cursors) -> {cursor: parsed}
+        self._details = OrderedDict()
+        self._details_size = details_cache
+
+    # =========================
+    # BUILD
+    # =========================
+    def append_row(self, row):
+        """One tuple in the HistoryStore.column_rows() shape."""
+        (cursor, ioc_type, value, verdict, malicious, suspicious, harmless,
+         undetected, country, created_at, reputation, last_analysis) = row
+        if isinstance(self.cursors, array) and not isinstance(cursor, int):
+            self.cursors = list(self.cursors)
+        self.cursors.append(cursor)
+        self.latest[value] = len(self.values)
+        self.values.append(value)
+        self.types.append(_TYPE_INDEX.get(ioc_type, 0))
+        self.verdicts.append(_VERDICT_INDEX.get(verdict, 0))
+        self.malicious.append(_u16(malicious))
+        self.suspicious.append(_u16(suspicious))
+        self.harmless.append(_u16(harmless))
+        self.undetected.append(_u16(undetected))
+        self.reputation.append(_i32(reputation))
+        self.created.append(_i32(created_at))
+        self.analysed.append(_i32(_analysis_epoch(last_analysis)))
+        self.countries.append(self.country_dict.code(country.upper()) if country else 0)
+
+    def extend(self, rows):
+        for row in rows:
+            self.append_row(row)
+
+    def load(self, store, batch=5000):
+        """Read every row appended to `store` since the last load."""
+        after = self.cursors[-1] if len(self.cursors) else None
+        while True:
+            rows = store.column_rows(after=after, limit=batch)
+            if not rows:
+                return self
+            self.extend(rows)
+            after = rows[-1][0]
+
+    @classmethod
+    def from_store(cls, store):
+        return cls(loader=store.parsed_for).load(store)
+
+    # =========================
+    # READ
+    # =========================
+    def __len__(self):
+        return len(self.values)
+
+    def ioc_type(self, i):
+        return TYPE_CODES[self.types[i]]
+
+    def verdict(self, i):
+        return VERDICT_CODES[self.verdicts[i]]
+
+    def country(self, i):
+        return self.country_dict.values[self.countries[i]]
+
+    def row(self, i):
+        """The hot fields of row i as a small dict."""
+        return {
+            "ioc_type": self.ioc_type(i),
+            "value": self.values[i],
+            "verdict": self.verdict(i),
+            "malicious": self.malicious[i],
+            "suspicious": self.suspicious[i],
+            "harmless": self.harmless[i],
+            "undetected": self.undetected[i],
+            "reputation": self.reputation[i],
+            "country": self.country(i),
+            "created_at": datetime.utcfromtimestamp(self.created[i]),
+        }
+
+    def find(self, value):
+        """Index of the newest row for a canonical value, or None. O(1)."""
+        return self.latest.get(value)
+
+    def details(self, i):
+        """Full parse_vt_response() output for row i, loaded lazily."""
+        cursor = self.cursors[i]
+        if cursor in self._details:
+            self._details.move_to_end(cursor)
+            return self._details[cursor]
+        if self._loader is None:
+            return None
+        parsed = self._loader([cursor]).get(cursor)
+        self._details[cursor] = parsed
+        if len(self._details) > self._details_size:
+            self._details.popitem(last=False)
+        return parsed
+
+    def nbytes(self):
+        """Approximate memory held by the columns (value strings included)."""
+        total = sys.getsizeof(self.values) + sum(sys.getsizeof(v) for v in self.values)
+        for name in ("types", "verdicts", "malicious", "suspicious", "harmless",
+                     "undetected", "reputation", "created", "analysed", "countries"):
+            col = getattr(self, name)
+            total += col.buffer_info()[1] * col.itemsize
+        if isinstance(self.cursors, array):
+            total += self.cursors.buffer_info()[1] * self.cursors.itemsize
+        else:
+            total += sys.getsizeof(self.cursors) + sum(sys.getsizeof(c) for c in self.cursors)
+        return total
+
+
+_columns = None
+_columns_built = 0.0
+_columns_lock = threading.Lock()
+
+
+def get_history_columns():
+    """
+    Per-worker columnar snapshot of the history store, brought up to
+    date incrementally on each call and rebuilt every
+    HISTORY_COLUMNS_REBUILD seconds.
+    """
+    global _columns, _columns_built
+    with _columns_lock:
+        store = get_history_store()
+        now = time.monotonic()
+        if _columns is None or now - _columns_built > HISTORY_COLUMNS_REBUILD:
+            _columns = HistoryColumns.from_store(store)
+            _columns_built = now
+        else:
+            _columns.load(store)
+        return _columns
+
+
+def _reset_after_fork():
+    global _columns, _columns_lock
+    _columns = None
+    _columns_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
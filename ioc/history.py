@@ -0,0 +1,613 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from services.writer import sqlite_synchronous
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+# "sqlite" (default, file shared by all gunicorn workers) or "mongo"
+HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "sqlite")
+HISTORY_DB = os.getenv("HISTORY_DB", os.path.join(BASE_DIR, "ioc_history.db"))
+# Lookups older than this are purged; 0 keeps everything
+HISTORY_RETENTION_DAYS = int(os.getenv("HISTORY_RETENTION_DAYS", 90))
+# Run the retention purge every N appended rows
+PURGE_EVERY = 500
+
+
+def verdict_of(parsed):
+    if not parsed:
+        return "unknown"
+    if (parsed.get("malicious") or 0) > 0:
+        return "malicious"
+    if (parsed.get("suspicious") or 0) > 0:
+        return "suspicious"
+    return "harmless"
+
+
+# Rollup bucket sizes (seconds) for the trend charts
+ROLLUP_GRANULARITIES = {"minute": 60, "hour": 3600, "day": 86400}
+
+
+def _stat_flags(parsed):
+    """
+    (malicious, harmless, suspicious) 0/1 flags with get_stats() semantics.
+    """
+    if not parsed:
+        return 0, 0, 0
+    malicious = (parsed.get("malicious") or 0) > 0
+    suspicious = (parsed.get("suspicious") or 0) > 0
+    return int(malicious), int(not malicious), int(suspicious)
+
+
+def _aggregate(rows):
+    """
+    Fold a batch of normalized rows into the deltas every aggregate
+    needs, so each append touches the aggregates once per key instead
+    of once per row.
+    """
+    totals = [0, 0, 0, 0]  # total, malicious, harmless, suspicious
+    countries = {}          # (country, severity) -> n
+    rollups = {}            # (granularity, bucket) -> [total, mal, harm, susp]
+    points = {}             # ip -> (country, severity, city, ts)
+    for r in rows:
+        mal, harm, susp = _stat_flags(r["parsed"])
+        totals[0] += 1
+        totals[1] += mal
+        totals[2] += harm
+        totals[3] += susp
+        for name, size in ROLLUP_GRANULARITIES.items():
+            key = (name, int(r["ts"] // size * size))
+            agg = rollups.setdefault(key, [0, 0, 0, 0])
+            agg[0] += 1
+            agg[1] += mal
+            agg[2] += harm
+            agg[3] += susp
+        if r["ioc_type"] == "ip" and r["country"]:
+            key = (r["country"], r["verdict"])
+            countries[key] = countries.get(key, 0) + 1
+            parsed = r["parsed"] or {}
+            points[parsed.get("value") or r["value"]] = (
+                r["country"], r["verdict"], parsed.get("geo_city"), r["ts"],
+            )
+    return totals, countries, rollups, points
+
+
+def _normalize_entry(e):
+    parsed = e.get("parsed")
+    p = parsed or {}
+    created_at = e.get("created_at") or datetime.utcnow()
+    return {
+        "ioc_type": e["ioc_type"],
+        "value": e["value"],
+        "parsed": parsed,
+        "verdict": verdict_of(parsed),
+        "malicious": p.get("malicious") or 0,
+        "suspicious": p.get("suspicious") or 0,
+        "harmless": p.get("harmless") or 0,
+        "undetected": p.get("undetected") or 0,
+        "country": (p.get("geo_country") or p.get("country") or "").upper() or None,
+        "created_at": created_at,
+        "ts": _to_epoch(created_at),
+    }
+
+
+class SQLiteHistoryStore:
+    """
+    Append-optimized IOC lookup history in SQLite (WAL mode).
+    Rows keep the hot fields as columns so the indexed queries below
+    never need to decode the JSON blob. Dashboard aggregates (counters,
+    per-country severity histogram, time rollups, latest point per IP)
+    are updated in the same transaction as the insert, so reading them
+    costs the same no matter how much history there is.
+    """
+
+    def __init__(self, path=HISTORY_DB, retention_days=HISTORY_RETENTION_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._since_purge = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(f"PRAGMA synchronous={sqlite_synchronous()}")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS lookups (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ioc_type TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    verdict TEXT NOT NULL,
+                    malicious INTEGER NOT NULL DEFAULT 0,
+                    suspicious INTEGER NOT NULL DEFAULT 0,
+                    harmless INTEGER NOT NULL DEFAULT 0,
+                    undetected INTEGER NOT NULL DEFAULT 0,
+                    country TEXT,
+                    parsed TEXT,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_lookups_created_at ON lookups (created_at);
+                CREATE INDEX IF NOT EXISTS idx_lookups_type_value ON lookups (ioc_type, value, created_at);
+                CREATE INDEX IF NOT EXISTS idx_lookups_verdict ON lookups (verdict, created_at);
+
+                CREATE TABLE IF NOT EXISTS lookup_counters (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    total INTEGER NOT NULL,
+                    malicious INTEGER NOT NULL,
+                    harmless INTEGER NOT NULL,
+                    suspicious INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS country_severity (
+                    country TEXT NOT NULL,
+                    severity TEXT NOT NULL,
+                    n INTEGER NOT NULL,
+                    PRIMARY KEY (country, severity)
+                );
+                CREATE TABLE IF NOT EXISTS lookup_rollups (
+                    granularity TEXT NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    total INTEGER NOT NULL,
+                    malicious INTEGER NOT NULL,
+                    harmless INTEGER NOT NULL,
+                    suspicious INTEGER NOT NULL,
+                    PRIMARY KEY (granularity, bucket)
+                );
+                CREATE TABLE IF NOT EXISTS ip_points (
+                    value TEXT PRIMARY KEY,
+                    country TEXT NOT NULL,
+                    severity TEXT NOT NULL,
+                    city TEXT,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_ip_points_updated ON ip_points (updated_at);
+                """
+            )
+            has_counters = self._conn.execute(
+                "SELECT 1 FROM lookup_counters WHERE id = 1"
+            ).fetchone()
+        if not has_counters:
+            self._backfill_aggregates()
+        self.purge()
+
+    def _backfill_aggregates(self):
+        """
+        One-time scan for databases created before the aggregate tables.
+        """
+        with self._lock, self._conn:
+            for table in ("country_severity", "lookup_rollups", "ip_points"):
+                self._conn.execute(f"DELETE FROM {table}")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO lookup_counters VALUES (1, 0, 0, 0, 0)"
+            )
+            cur = self._conn.execute("SELECT * FROM lookups ORDER BY id")
+            while True:
+                batch = cur.fetchmany(1000)
+                if not batch:
+                    break
+                rows = []
+                for row in batch:
+                    parsed = json.loads(row["parsed"]) if row["parsed"] else None
+                    rows.append({
+                        "ioc_type": row["ioc_type"], "value": row["value"],
+                        "parsed": parsed, "verdict": row["verdict"],
+                        "country": row["country"], "ts": row["created_at"],
+                    })
+                self._apply_aggregates(rows)
+
+    # =========================
+    # WRITES
+    # =========================
+    def append(self, entries):
+        """
+        entries: iterable of dicts with ioc_type, value, parsed, created_at.
+        """
+        rows = [_normalize_entry(e) for e in entries]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO lookups (ioc_type, value, verdict, malicious, suspicious,"
+                " harmless, undetected, country, parsed, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (r["ioc_type"], r["value"], r["verdict"], r["malicious"],
+                     r["suspicious"], r["harmless"], r["undetected"], r["country"],
+                     json.dumps(r["parsed"], default=str), r["ts"])
+                    for r in rows
+                ],
+            )
+            self._apply_aggregates(rows)
+            self._since_purge += len(rows)
+            purge_due = self._since_purge >= PURGE_EVERY
+        if purge_due:
+            self.purge()
+
+    def _apply_aggregates(self, rows):
+        totals, countries, rollups, points = _aggregate(rows)
+        self._conn.execute(
+            "UPDATE lookup_counters SET total = total + ?, malicious = malicious + ?,"
+            " harmless = harmless + ?, suspicious = suspicious + ? WHERE id = 1",
+            totals,
+        )
+        self._conn.executemany(
+            "INSERT INTO country_severity (country, severity, n) VALUES (?, ?, ?)"
+            " ON CONFLICT (country, severity) DO UPDATE SET n = n + excluded.n",
+            [(c, sev, n) for (c, sev), n in countries.items()],
+        )
+        self._conn.executemany(
+            "INSERT INTO lookup_rollups VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (granularity, bucket) DO UPDATE SET"
+            " total = total + excluded.total, malicious = malicious + excluded.malicious,"
+            " harmless = harmless + excluded.harmless, suspicious = suspicious + excluded.suspicious",
+            [(g, b, *agg) for (g, b), agg in rollups.items()],
+        )
+        self._conn.executemany(
+            "INSERT INTO ip_points VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (value) DO UPDATE SET country = excluded.country,"
+            " severity = excluded.severity, city = excluded.city,"
+            " updated_at = excluded.updated_at",
+            [(ip, *pt) for ip, pt in points.items()],
+        )
+
+    def purge(self):
+        """Apply the retention policy. Returns the number of rows removed."""
+        if not self.retention_days:
+            return 0
+        cutoff = time.time() - self.retention_days * 86400
+        with self._lock, self._conn:
+            self._since_purge = 0
+            cur = self._conn.execute("DELETE FROM lookups WHERE created_at < ?", (cutoff,))
+            # Counters and the country histogram are lifetime totals; the
+            # time-bucketed rollups and the map points (IPs not looked up
+            # within the window) follow the retention window.
+            self._conn.execute("DELETE FROM lookup_rollups WHERE bucket < ?", (cutoff,))
+            self._conn.execute("DELETE FROM ip_points WHERE updated_at < ?", (cutoff,))
+            return cur.rowcount
+
+    # =========================
+    # QUERIES
+    # =========================
+    def _query(self, sql, params=()):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_row_to_entry(r) for r in rows]
+
+    def recent(self, limit=5):
+        return self._query(
+            "SELECT * FROM lookups ORDER BY created_at DESC, id DESC LIMIT ?", (limit,)
+        )
+
+    def by_value(self, ioc_type, value, limit=50):
+        return self._query(
+            "SELECT * FROM lookups WHERE ioc_type = ? AND value = ?"
+            " ORDER BY created_at DESC LIMIT ?",
+            (ioc_type, value, limit),
+        )
+
+    def time_range(self, start, end=None, verdict=None, limit=1000):
+        sql = "SELECT * FROM lookups WHERE created_at >= ? AND created_at < ?"
+        params = [_to_epoch(start), _to_epoch(end or datetime.utcnow() + timedelta(seconds=1))]
+        if verdict:
+            sql = ("SELECT * FROM lookups WHERE verdict = ? AND created_at >= ?"
+                   " AND created_at < ?")
+            params.insert(0, verdict)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        return self._query(sql, params)
+
+    def by_type(self, ioc_type):
+        return self._query(
+            "SELECT * FROM lookups WHERE ioc_type = ? ORDER BY created_at", (ioc_type,)
+        )
+
+    def counts(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT total, malicious, harmless, suspicious FROM lookup_counters WHERE id = 1"
+            ).fetchone()
+        return {
+            "total_iocs": row[0],
+            "malicious": row[1],
+            "harmless": row[2],
+            "suspicious": row[3],
+        }
+
+    def country_histogram(self):
+        """{country: {severity: n}} over all IP lookups."""
+        with self._lock:
+            rows = self._conn.execute("SELECT country, severity, n FROM country_severity").fetchall()
+        hist = {}
+        for country, severity, n in rows:
+            hist.setdefault(country, {})[severity] = n
+        return hist
+
+    def ip_points(self):
+        """Latest (country, severity, city) per looked-up IP."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT value, country, severity, city FROM ip_points ORDER BY updated_at"
+            ).fetchall()
+        return [tuple(r) for r in rows]
+
+    def rollups(self, granularity="hour", since=None):
+        """[(bucket_start_epoch, total, malicious, harmless, suspicious)]"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT bucket, total, malicious, harmless, suspicious FROM lookup_rollups"
+                " WHERE granularity = ? AND bucket >= ? ORDER BY bucket",
+                (granularity, _to_epoch(since) if since is not None else 0),
+            ).fetchall()
+        return [tuple(r) for r in rows]
+
+    def column_rows(self, after=None, limit=5000):
+        """
+        Hot fields only, oldest first, for ioc.columns.HistoryColumns:
+        (cursor, ioc_type, value, verdict, malicious, suspicious, harmless,
+        undetected, country, created_at, reputation, last_analysis_date).
+        Pass the last row's cursor as `after` to continue.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, ioc_type, value, verdict, malicious, suspicious, harmless,"
+                " undetected, country, created_at, json_extract(parsed, '$.reputation'),"
+                " json_extract(parsed, '$.last_analysis_date')"
+                " FROM lookups WHERE id > ? ORDER BY id LIMIT ?",
+                (after or 0, limit),
+            ).fetchall()
+        return [tuple(r) for r in rows]
+
+    def parsed_for(self, cursors):
+        """{cursor: parsed} for rows returned by column_rows()."""
+        cursors = list(cursors)
+        if not cursors:
+            return {}
+        marks = ",".join("?" * len(cursors))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, parsed FROM lookups WHERE id IN ({marks})", cursors
+            ).fetchall()
+        return {r[0]: json.loads(r[1]) if r[1] else None for r in rows}
+
+    def ping(self):
+        with self._lock:
+            self._conn.execute("SELECT 1").fetchone()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class MongoHistoryStore:
+    """
+    Same API backed by the `ioc_history` collection of the Atlas
+    database from config.py. Retention uses a TTL index.
+    """
+
+    def __init__(self, db=None, retention_days=HISTORY_RETENTION_DAYS):
+        if db is None:
+            import config  # connects on first use only
+            db = config.db
+        self.col = db["ioc_history"]
+        self.aggregates = db["ioc_history_aggregates"]
+        self.retention_days = retention_days
+        self.col.create_index("created_at",
+                              **({"expireAfterSeconds": retention_days * 86400}
+                                 if retention_days else {}))
+        self.col.create_index([("ioc_type", 1), ("value", 1), ("created_at", -1)])
+        self.col.create_index([("verdict", 1), ("created_at", -1)])
+        self.aggregates.create_index([("kind", 1), ("bucket", 1)])
+        self.aggregates.create_index([("kind", 1), ("updated_at", 1)])
+        self._since_purge = 0
+
+    def append(self, entries):
+        from pymongo import UpdateOne
+
+        rows = [_normalize_entry(e) for e in entries]
+        if not rows:
+            return
+        self.col.insert_many(
+            [
+                {
+                    "ioc_type": r["ioc_type"],
+                    "value": r["value"],
+                    "verdict": r["verdict"],
+                    "malicious": r["malicious"],
+                    "suspicious": r["suspicious"],
+                    "country": r["country"],
+                    "parsed": r["parsed"],
+                    "created_at": r["created_at"],
+                }
+                for r in rows
+            ],
+            ordered=False,
+        )
+
+        totals, countries, rollups, points = _aggregate(rows)
+        ops = [
+            UpdateOne(
+                {"_id": "counters"},
+                {"$inc": {"total": totals[0], "malicious": totals[1],
+                          "harmless": totals[2], "suspicious": totals[3]}},
+                upsert=True,
+            )
+        ]
+        for (country, severity), n in countries.items():
+            ops.append(UpdateOne({"_id": f"country:{country}:{severity}"},
+                                 {"$inc": {"n": n},
+                                  "$set": {"kind": "country", "country": country,
+                                           "severity": severity}},
+                                 upsert=True))
+        for (gran, bucket), agg in rollups.items():
+            ops.append(UpdateOne({"_id": f"rollup:{gran}:{bucket}"},
+                                 {"$inc": {"total": agg[0], "malicious": agg[1],
+                                           "harmless": agg[2], "suspicious": agg[3]},
+                                  "$set": {"kind": "rollup", "granularity": gran,
+                                           "bucket": bucket}},
+                                 upsert=True))
+        for ip, (country, severity, city, ts) in points.items():
+            ops.append(UpdateOne({"_id": f"ip:{ip}"},
+                                 {"$set": {"kind": "ip", "value": ip, "country": country,
+                                           "severity": severity, "city": city,
+                                           "updated_at": ts}},
+                                 upsert=True))
+        self.aggregates.bulk_write(ops, ordered=False)
+
+        self._since_purge += len(rows)
+        if self._since_purge >= PURGE_EVERY:
+            self.purge()
+
+    def purge(self):
+        """
+        The TTL index expires lookups server-side; trim the rollups and
+        map points to the same window here. Returns 0 (lookups removed).
+        """
+        self._since_purge = 0
+        if not self.retention_days:
+            return 0
+        cutoff = time.time() - self.retention_days * 86400
+        self.aggregates.delete_many({"kind": "rollup", "bucket": {"$lt": cutoff}})
+        self.aggregates.delete_many({"kind": "ip", "updated_at": {"$lt": cutoff}})
+        return 0
+
+    def _find(self, query, limit, sort=-1):
+        cursor = self.col.find(query, {"_id": 0}).sort("created_at", sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        return [
+            {"ioc_type": d["ioc_type"], "value": d["value"],
+             "parsed": d.get("parsed"), "created_at": d["created_at"]}
+            for d in cursor
+        ]
+
+    def recent(self, limit=5):
+        return self._find({}, limit)
+
+    def by_value(self, ioc_type, value, limit=50):
+        return self._find({"ioc_type": ioc_type, "value": value}, limit)
+
+    def time_range(self, start, end=None, verdict=None, limit=1000):
+        query = {"created_at": {"$gte": start, "$lt": end or datetime.utcnow() + timedelta(seconds=1)}}
+        if verdict:
+            query["verdict"] = verdict
+        return self._find(query, limit)
+
+    def by_type(self, ioc_type):
+        return self._find({"ioc_type": ioc_type}, 0, sort=1)
+
+    def counts(self):
+        doc = self.aggregates.find_one({"_id": "counters"}) or {}
+        return {
+            "total_iocs": doc.get("total", 0),
+            "malicious": doc.get("malicious", 0),
+            "harmless": doc.get("harmless", 0),
+            "suspicious": doc.get("suspicious", 0),
+        }
+
+    def country_histogram(self):
+        hist = {}
+        for d in self.aggregates.find({"kind": "country"}):
+            hist.setdefault(d["country"], {})[d["severity"]] = d["n"]
+        return hist
+
+    def ip_points(self):
+        return [
+            (d["value"], d["country"], d["severity"], d.get("city"))
+            for d in self.aggregates.find({"kind": "ip"}).sort("updated_at", 1)
+        ]
+
+    def rollups(self, granularity="hour", since=None):
+        query = {"kind": "rollup", "granularity": granularity}
+        if since is not None:
+            query["bucket"] = {"$gte": _to_epoch(since)}
+        return [
+            (d["bucket"], d["total"], d["malicious"], d["harmless"], d["suspicious"])
+            for d in self.aggregates.find(query).sort("bucket", 1)
+        ]
+
+    def column_rows(self, after=None, limit=5000):
+        query = {"_id": {"$gt": after}} if after is not None else {}
+        projection = {
+            "ioc_type": 1, "value": 1, "verdict": 1, "malicious": 1, "suspicious": 1,
+            "country": 1, "created_at": 1, "parsed.harmless": 1, "parsed.undetected": 1,
+            "parsed.reputation": 1, "parsed.last_analysis_date": 1,
+        }
+        rows = []
+        for d in self.col.find(query, projection).sort("_id", 1).limit(limit):
+            p = d.get("parsed") or {}
+            rows.append((
+                d["_id"], d["ioc_type"], d["value"], d.get("verdict"),
+                d.get("malicious") or 0, d.get("suspicious") or 0,
+                p.get("harmless") or 0, p.get("undetected") or 0,
+                d.get("country"), _to_epoch(d["created_at"]),
+                p.get("reputation"), p.get("last_analysis_date"),
+            ))
+        return rows
+
+    def parsed_for(self, cursors):
+        return {
+            d["_id"]: d.get("parsed")
+            for d in self.col.find({"_id": {"$in": list(cursors)}}, {"parsed": 1})
+        }
+
+    def ping(self):
+        self.col.database.command("ping")
+
+    def close(self):
+        pass
+
+
+def _to_epoch(dt):
+    if isinstance(dt, (int, float)):
+        return float(dt)
+    # Naive datetimes in this app are UTC (datetime.utcnow())
+    return (dt - datetime(1970, 1, 1)).total_seconds()
+
+
+def _row_to_entry(row):
+    return {
+        "ioc_type": row["ioc_type"],
+        "value": row["value"],
+        "parsed": json.loads(row["parsed"]) if row["parsed"] else None,
+        "created_at": datetime.utcfromtimestamp(row["created_at"]),
+    }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_history_store():
+    """
+    Process-wide history store, opened on first use.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if HISTORY_BACKEND == "mongo":
+                    _store = MongoHistoryStore()
+                else:
+                    _store = SQLiteHistoryStore()
+    return _store
+
+
+def set_history_store(store):
+    """Swap the backend, e.g. SQLiteHistoryStore(":memory:") in tests."""
+    global _store
+    _store = store
+
+
+def _reset_after_fork():
+    # A SQLite connection must not be shared across fork (gunicorn
+    # --preload); each worker reopens its own on first use
+    global _store, _store_lock
+    _store = None
+    _store_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,193 @@
+import ipaddress
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+# Hex digest length -> algorithm
+HASH_LENGTHS = {32: "md5", 40: "sha1", 64: "sha256"}
+
+URL_SCHEMES = ("http", "https", "ftp")
+_DEFAULT_PORTS = {"http": 80, "https": 443, "ftp": 21}
+
+_HEX_RE = re.compile(r"^[0-9a-f]+$")
+_LABEL_RE = re.compile(r"^(?!-)[a-z0-9-]{1,63}(?<!-)$")
+_TLD_RE = re.compile(r"^(?:[a-z]{2,63}|xn--[a-z0-9-]{1,59})$")
+
+# File extensions that are not also TLDs: "svchost.exe" or "report.pdf"
+# in pasted text is a filename, not a domain. Extensions that are real
+# TLDs (.zip, .mov, .py, .sh, .pl, .ps, .md, .dot, .bz) are left out, so
+# those still detect as domains.
+FILE_EXTENSIONS = frozenset((
+    "exe", "dll", "sys", "scr", "bat", "cmd", "vbs", "vbe", "js", "jse", "wsf",
+    "wsh", "hta", "lnk", "msi", "msp", "cpl", "ocx", "pif", "jar", "apk", "elf", "dmg",
+    "pdf", "doc", "docx", "docm", "dotm", "xls", "xlsx", "xlsm", "xlsb", "ppt",
+    "pptx", "pptm", "rtf", "odt", "ods", "txt", "log", "csv", "tsv", "json", "xml",
+    "yaml", "yml", "ini", "cfg", "conf", "htm", "html", "php", "asp", "aspx", "jsp",
+    "png", "jpg", "jpeg", "gif", "bmp", "ico", "svg", "tif", "tiff", "rar", "gz",
+    "tgz", "tar", "xz", "iso", "img", "vhd", "vhdx", "bin", "dat", "tmp", "bak",
+    "dylib", "rb", "pyc", "eml", "msg", "reg", "inf", "db", "sqlite",
+))
+
+# Defanging conventions seen in reports and feeds, applied in order
+_REFANG = (
+    (re.compile(r"^h[xX]{2}p(s?)", re.IGNORECASE), r"http\1"),
+    (re.compile(r"^f[xX]p", re.IGNORECASE), "ftp"),
+    (re.compile(r"\[:\]//|\[://\]"), "://"),
+    (re.compile(r"\[\.\]|\(\.\)|\{\.\}|\[dot\]|\(dot\)|\{dot\}", re.IGNORECASE), "."),
+    (re.compile(r"\\\."), "."),
+    (re.compile(r"\[:\]"), ":"),
+    (re.compile(r"\[@\]|\[at\]|\(at\)", re.IGNORECASE), "@"),
+)
+
+
+class InvalidIOC(ValueError):
+    """Raised when a value is not a valid indicator of the given type."""
+
+
+def refang(value):
+    """'hxxp://evil[.]com' -> 'http://evil.com'. Also trims quotes/brackets."""
+    value = (value or "").strip().strip("\"'<>")
+    for pattern, repl in _REFANG:
+        value = pattern.sub(repl, value)
+    return value
+
+
+def normalize_ip(value):
+    value = value.strip("[]")
+    try:
+        addr = ipaddress.ip_address(value)
+    except ValueError:
+        raise InvalidIOC(f"Invalid IP address: {value}")
+    # ::ffff:1.2.3.4 and 1.2.3.4 are the same host
+    if addr.version == 6 and addr.ipv4_mapped:
+        addr = addr.ipv4_mapped
+    return str(addr)
+
+
+def normalize_domain(value):
+    value = value.rstrip(".").lower()
+    try:
+        value = value.encode("idna").decode("ascii")
+    except UnicodeError:
+        raise InvalidIOC(f"Invalid domain: {value}")
+    labels = value.split(".")
+    if (
+        len(value) > 253
+        or len(labels) < 2
+        or not all(_LABEL_RE.match(label) for label in labels)
+        or not _TLD_RE.match(labels[-1])
+    ):
+        raise InvalidIOC(f"Invalid domain: {value}")
+    return value
+
+
+def normalize_hash(value):
+    value = value.lower()
+    if len(value) not in HASH_LENGTHS or not _HEX_RE.match(value):
+        raise InvalidIOC(f"Invalid hash (expected MD5, SHA1 or SHA256 hex): {value}")
+    return value
+
+
+def hash_algorithm(value):
+    """'md5' | 'sha1' | 'sha256' for a valid hex digest, else None."""
+    return HASH_LENGTHS.get(len(value or "")) if value and _HEX_RE.match(value.lower()) else None
+
+
+def normalize_url(value):
+    """
+    Lowercase scheme and host, IDNA-encode the host, drop the default
+    port and the fragment, and give an empty path a '/'. Path and query
+    stay as-is: they are case sensitive.
+    """
+    if "://" not in value:
+        raise InvalidIOC(f"Invalid URL (missing scheme): {value}")
+    try:
+        parts = urlsplit(value)
+        port = parts.port
+    except ValueError:
+        raise InvalidIOC(f"Invalid URL: {value}")
+    scheme = parts.scheme.lower()
+    if scheme not in URL_SCHEMES or not parts.hostname:
+        raise InvalidIOC(f"Invalid URL: {value}")
+
+    host = parts.hostname
+    try:
+        host = normalize_ip(host)
+        if ":" in host:
+            host = f"[{host}]"
+    except InvalidIOC:
+        host = normalize_domain(host)
+
+    netloc = host
+    if port is not None and port != _DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        netloc = f"{userinfo}@{netloc}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+NORMALIZERS = {
+    "ip": normalize_ip,
+    "domain": normalize_domain,
+    "url": normalize_url,
+    "hash": normalize_hash,
+}
+
+
+def normalize(ioc_type, value):
+    """
+    Refang and canonicalize `value` as `ioc_type`. Returns the canonical
+    value or raises InvalidIOC, so nothing invalid reaches VT.
+    """
+    normalizer = NORMALIZERS.get(ioc_type)
+    if normalizer is None:
+        raise InvalidIOC(f"Unsupported IOC type: {ioc_type}")
+    value = refang(value)
+    if not value:
+        raise InvalidIOC("Please enter a value.")
+    return normalizer(value)
+
+
+def detect(value):
+    """
+    Guess the type of a raw (possibly defanged) value.
+    Returns (ioc_type, canonical value), or None if it isn't an IOC.
+    Names ending in a FILE_EXTENSIONS suffix are not taken as domains.
+    """
+    value = refang(value)
+    if not value:
+        return None
+    if "://" in value:
+        candidates = ("url",)
+    elif _HEX_RE.match(value.lower()) and len(value) in HASH_LENGTHS:
+        candidates = ("hash",)
+    elif value.rpartition(".")[2].lower() in FILE_EXTENSIONS:
+        # A filename; only an explicit normalize(..., "domain") takes it
+        candidates = ("ip",)
+    else:
+        candidates = ("ip", "domain")
+    for ioc_type in candidates:
+        try:
+            return ioc_type, NORMALIZERS[ioc_type](value)
+        except InvalidIOC:
+            continue
+    return None
+
+
+def canonical_key(ioc_type, value):
+    """
+    (ioc_type, canonical value): the key shared by the verdict cache,
+    history and tickets. Values that don't validate fall back to a
+    trimmed (and, except for URLs, lowercased) form.
+    """
+    try:
+        return ioc_type, normalize(ioc_type, value)
+    except InvalidIOC:
+        value = (value or "").strip()
+        return ioc_type, value if ioc_type == "url" else value.lower()
+
+
+def canonical_value(value):
+    """Canonical form of a value of unknown type (e.g. a ticket's IOC)."""
+    found = detect(value)
+    return found[1] if found else (value or "").strip()
@@ -1,5 +1,8 @@
 from datetime import datetime
 
+from ioc.normalize import hash_algorithm
+from services.geoip import lookup_ip as geo_lookup
+
 
 def parse_vt_response(vt_json: dict, ioc_type: str):
     """
@@ -48,4 +51,15 @@ def parse_vt_response(vt_json: dict, ioc_type: str):
         "meaningful_name": attributes.get("meaningful_name"),
     }
 
+    # Offline geolocation for IPs (no network call)
+    if ioc_type == "ip":
+        geo = geo_lookup(parsed["value"]) or {}
+        parsed["geo_country"] = geo.get("country") or parsed["country"]
+        parsed["geo_city"] = geo.get("city")
+        parsed["geo_lat"] = geo.get("lat")
+        parsed["geo_lon"] = geo.get("lon")
+        parsed["geo_asn"] = geo.get("asn")
+    elif ioc_type == "hash":
+        parsed["hash_algorithm"] = hash_algorithm(parsed["value"])
+
     return parsed
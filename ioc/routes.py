@@ -1,14 +1,20 @@
-from flask import Blueprint, render_template, request
+import json
+
+from flask import Blueprint, Response, jsonify, render_template, request, stream_with_context
 from flask_login import login_required
 
+from feeds.blacklist import abuseipdb_blacklist
 from ioc.services import (
     lookup_ip,
     lookup_domain,
     lookup_url,
     lookup_hash,
     record_lookup,
+    vt_quota,
 )
+from ioc.normalize import InvalidIOC, normalize
 from ioc.parsers import parse_vt_response
+from ioc.bulk import BULK_MAX_ITEMS, parse_bulk_input, run_bulk_lookup
 
 ioc_bp = Blueprint("ioc", __name__)
 
@@ -18,6 +24,7 @@ ioc_bp = Blueprint("ioc", __name__)
 def lookup():
     parsed = None
     error = None
+    blacklisted = None
     selected_type = "ip"
     value = ""
 
@@ -30,7 +37,16 @@ def lookup():
         elif selected_type not in ("ip", "domain", "url", "hash"):
             error = "Unsupported IOC type."
         else:
+            try:
+                # Refang + canonicalize; invalid input never costs VT quota
+                value = normalize(selected_type, value)
+            except InvalidIOC as e:
+                error = str(e)
+
+        if error is None:
             if selected_type == "ip":
+                # Local copy of the AbuseIPDB blacklist, no network call
+                blacklisted = abuseipdb_blacklist.lookup(value)
                 vt_json = lookup_ip(value)
             elif selected_type == "domain":
                 vt_json = lookup_domain(value)
@@ -40,7 +56,11 @@ def lookup():
                 vt_json = lookup_hash(value)
 
             if vt_json is None:
-                error = "Error contacting VirusTotal API. Check your VT_API_KEY and network."
+                quota = vt_quota()
+                if quota["minute"] == 0 or quota["day"] == 0:
+                    error = "VirusTotal rate limit reached. Please try again in a minute."
+                else:
+                    error = "Error contacting VirusTotal API. Check your VT_API_KEY and network."
             else:
                 parsed = parse_vt_response(vt_json, selected_type)
                 record_lookup(selected_type, value, parsed)
@@ -49,6 +69,59 @@ def lookup():
         "lookup.html",
         error=error,
         parsed=parsed,
+        blacklisted=blacklisted,
+        blacklist_synced=abuseipdb_blacklist.current().synced_at > 0,
         selected_type=selected_type,
         value=value,
+        quota=vt_quota(),
+    )
+
+
+@ioc_bp.route("/bulk", methods=["GET"])
+@login_required
+def bulk_lookup():
+    return render_template("bulk_lookup.html", max_items=BULK_MAX_ITEMS, quota=vt_quota())
+
+
+@ioc_bp.route("/api/bulk", methods=["POST"])
+@login_required
+def bulk_lookup_api():
+    """
+    Accepts JSON {"values": [...]} / {"text": "..."} or a form/plain-text
+    body and streams one JSON object per line (NDJSON) as lookups finish.
+    The first line is a summary of what was accepted.
+    """
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        raw = payload.get("values")
+        if raw is None:
+            raw = payload.get("text") or ""
+            if not isinstance(raw, str):
+                return jsonify({"error": '"text" must be a string.'}), 400
+    elif isinstance(payload, list):
+        raw = payload
+    else:
+        raw = request.form.get("text") or request.get_data(as_text=True)
+    if not isinstance(raw, str) and not (
+        isinstance(raw, list) and all(isinstance(v, str) for v in raw)
+    ):
+        return jsonify({"error": '"values" must be a list of strings.'}), 400
+
+    items, rejected = parse_bulk_input(raw)
+    if not items:
+        return jsonify({"error": "No valid IOCs found.", "rejected": rejected}), 400
+
+    def generate():
+        yield json.dumps({
+            "accepted": min(len(items), BULK_MAX_ITEMS),
+            "truncated": max(len(items) - BULK_MAX_ITEMS, 0),
+            "rejected": rejected,
+        }) + "\n"
+        for res in run_bulk_lookup(items):
+            yield json.dumps(res, default=str) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"},
     )
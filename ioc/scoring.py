@@ -0,0 +1,172 @@
+import heapq
+import os
+import threading
+import time
+from array import array
+
+from ioc.columns import TYPE_CODES
+
+try:
+    import numpy as np
+except ImportError:  # optional: the pure-Python path gives the same scores
+    np = None
+
+# Weighted detections (malicious + 0.5 * suspicious) at which the
+# detection term saturates
+RISK_SATURATION = float(os.getenv("RISK_SATURATION", 10))
+# Age decay from last_analysis_date (created_at when unknown): the score
+# halves every RISK_HALF_LIFE_DAYS, never dropping below RISK_AGE_FLOOR
+RISK_HALF_LIFE_DAYS = float(os.getenv("RISK_HALF_LIFE_DAYS", 30))
+RISK_AGE_FLOOR = float(os.getenv("RISK_AGE_FLOOR", 0.25))
+
+# Weights of the detection, detection-ratio and reputation terms
+W_DETECTIONS, W_RATIO, W_REPUTATION = 0.60, 0.25, 0.15
+
+# (lower bound, band), highest first; scores are 0-100
+SEVERITY_BANDS = ((70, "critical"), (40, "high"), (15, "medium"), (0.05, "low"))
+
+_DAY = 86400.0
+
+
+def severity(score):
+    for bound, band in SEVERITY_BANDS:
+        if score >= bound:
+            return band
+    return "none"
+
+
+def _score(malicious, suspicious, harmless, undetected, reputation, analysed, now):
+    weighted = malicious + 0.5 * suspicious
+    total = malicious + suspicious + harmless + undetected
+    raw = (
+        W_DETECTIONS * min(1.0, weighted / RISK_SATURATION)
+        + W_RATIO * (weighted / total if total else 0.0)
+        + W_REPUTATION * min(1.0, max(0.0, -reputation / 100.0))
+    )
+    age_days = max(0.0, now - analysed) / _DAY if analysed else 0.0
+    decay = RISK_AGE_FLOOR + (1 - RISK_AGE_FLOOR) * 0.5 ** (age_days / RISK_HALF_LIFE_DAYS)
+    return round(100 * raw * decay, 1)
+
+
+# =========================
+# BATCHED
+# =========================
+def _score_numpy(cols, n, now):
+    def col(name, dtype="f8"):
+        # tobytes() copies: a live buffer view would stop the snapshot
+        # from growing while a refresh appends to it
+        c = getattr(cols, name)
+        return np.frombuffer(c.tobytes(), dtype=c.typecode)[:n].astype(dtype)
+
+    mal, susp = col("malicious"), col("suspicious")
+    weighted = mal + 0.5 * susp
+    total = mal + susp + col("harmless") + col("undetected")
+    ratio = np.divide(weighted, total, out=np.zeros(n), where=total > 0)
+    raw = (
+        W_DETECTIONS * np.minimum(1.0, weighted / RISK_SATURATION)
+        + W_RATIO * ratio
+        + W_REPUTATION * np.clip(-col("reputation") / 100.0, 0.0, 1.0)
+    )
+    analysed = col("analysed")
+    analysed = np.where(analysed > 0, analysed, col("created"))
+    age_days = np.where(analysed > 0, np.maximum(0.0, now - analysed) / _DAY, 0.0)
+    decay = RISK_AGE_FLOOR + (1 - RISK_AGE_FLOOR) * 0.5 ** (age_days / RISK_HALF_LIFE_DAYS)
+    return np.round(100 * raw * decay, 1).astype("f4")
+
+
+def _score_python(cols, n, now):
+    return array("f", map(
+        _score,
+        cols.malicious[:n], cols.suspicious[:n], cols.harmless[:n],
+        cols.undetected[:n], cols.reputation[:n],
+        (a or c for a, c in zip(cols.analysed[:n], cols.created[:n])),
+        [now] * n,
+    ))
+
+
+def score_columns(cols, now=None):
+    """
+    Risk score of every row of a HistoryColumns snapshot in one pass:
+    vectorized with NumPy when it is installed, a single array loop
+    otherwise. Returns a float32 array aligned with the rows.
+    """
+    now = time.time() if now is None else now
+    # The last column appended to; rows past it are mid-append
+    n = len(cols.countries)
+    if np is not None:
+        return _score_numpy(cols, n, now)
+    return _score_python(cols, n, now)
+
+
+# Age decay moves slowly, so one scoring pass per snapshot size is reused
+# for this long
+RISK_CACHE_SECONDS = int(os.getenv("RISK_CACHE_SECONDS", 60))
+
+_cached = None  # (cols, rows, computed_at, scores)
+_cache_lock = threading.Lock()
+
+
+def scores_for(cols):
+    """score_columns(cols), cached until new rows land or it goes stale."""
+    global _cached
+    now = time.time()
+    with _cache_lock:
+        cached = _cached
+        if (
+            cached is None
+            or cached[0] is not cols
+            or cached[1] != len(cols.countries)
+            or now - cached[2] > RISK_CACHE_SECONDS
+        ):
+            cached = (cols, len(cols.countries), now, score_columns(cols, now))
+            _cached = cached
+    return cached[3]
+
+
+def top_k(cols, k=50, since=None, ioc_type=None):
+    """
+    The k riskiest distinct indicators (latest lookup of each), best
+    first, as [(score, row index)]. `since` is an epoch lower bound on
+    the lookup time, `ioc_type` restricts to one type.
+
+    A partial sort: argpartition with NumPy, a k-sized heap otherwise.
+    """
+    scores = scores_for(cols)
+    n = len(scores)
+    # list() copies in one step, safe against a concurrent refresh
+    latest = list(cols.latest.values())
+    type_code = TYPE_CODES.index(ioc_type) if ioc_type in TYPE_CODES else None
+
+    if np is not None:
+        idx = np.array(latest, dtype="i8")
+        idx = idx[idx < n]
+        if since is not None:
+            created = np.frombuffer(cols.created.tobytes(), dtype="i4")
+            idx = idx[created[idx] >= since]
+        if type_code is not None:
+            types = np.frombuffer(cols.types.tobytes(), dtype="u1")
+            idx = idx[types[idx] == type_code]
+        if len(idx) > k:
+            idx = idx[np.argpartition(-scores[idx], k - 1)[:k]]
+        idx = idx[np.argsort(-scores[idx], kind="stable")]
+        return [(round(float(scores[i]), 1), int(i)) for i in idx]
+
+    candidates = (
+        i for i in latest
+        if i < n
+        and (since is None or cols.created[i] >= since)
+        and (type_code is None or cols.types[i] == type_code)
+    )
+    return [(round(scores[i], 1), i) for i in heapq.nlargest(k, candidates, key=scores.__getitem__)]
+
+
+def risk_for(cols, value):
+    """(score, severity) of a canonical value's latest lookup, or None. O(1)."""
+    i = cols.find(value)
+    if i is None:
+        return None
+    scores = scores_for(cols)
+    if i >= len(scores):
+        return None
+    score = round(float(scores[i]), 1)
+    return score, severity(score)
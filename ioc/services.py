@@ -1,59 +1,75 @@
 import os
 import base64
+import sys
+import time
+from collections import namedtuple
 from datetime import datetime
 
-import requests
-from dotenv import load_dotenv
-
+from ioc.normalize import canonical_key
 from ioc.parsers import parse_vt_response
-
-load_dotenv()
+from ioc.columns import get_history_columns
+from ioc.history import get_history_store
+from ioc.scoring import risk_for, severity, top_k
+from services.cache import normalize_key, verdict_cache
+from services.http_client import QUOTA_RETRY_STATUSES, register_provider
+from services.ratelimit import get_limiter, vt_single_flight
+from services.geoip import locate
+from services.metrics import upstream_errors
+from services.writer import write_behind
+
+# .env is loaded by create_app(); a missing key disables lookups
+# instead of failing the import (see /readyz)
 VT_API_KEY = os.getenv("VT_API_KEY")
-BASE_URL = "https://www.virustotal.com/api/v3"
-
-if not VT_API_KEY:
-    raise ValueError("VT_API_KEY is not set in .env")
+BASE_URL = os.getenv("VT_BASE_URL", "https://www.virustotal.com/api/v3")
 
 HEADERS = {
-    "x-apikey": VT_API_KEY
+    "x-apikey": VT_API_KEY or ""
 }
 
-# In-memory IOC history
-LOOKUPS = []  # each: {ioc_type, value, parsed, created_at}
-
-# Simple country → approximate lat/lon mapping so globe always works
-COUNTRY_COORDS = {
-    "IN": (20.5937, 78.9629),
-    "US": (37.0902, -95.7129),
-    "GB": (55.3781, -3.4360),
-    "DE": (51.1657, 10.4515),
-    "FR": (46.2276, 2.2137),
-    "JP": (36.2048, 138.2529),
-    "CN": (35.8617, 104.1954),
-    "BR": (-14.2350, -51.9253),
-    "RU": (61.5240, 105.3188),
-    "AU": (-25.2744, 133.7751),
-    "CA": (56.1304, -106.3468),
-    "SG": (1.3521, 103.8198),
-    "NL": (52.1326, 5.2913),
-    "ES": (40.4637, -3.7492),
-    "IT": (41.8719, 12.5674),
-    "ZA": (-30.5595, 22.9375),
-}
+vt_client = register_provider(
+    "virustotal", headers=HEADERS, timeout=20, retry_statuses=QUOTA_RETRY_STATUSES
+)
+vt_limiter = get_limiter(VT_API_KEY)
+
+# Callbacks fn(entries) run after lookups are recorded (live map etc.)
+LOOKUP_LISTENERS = []
 
 
-def _country_to_coords(code: str):
-    if not code:
-        return None, None
-    code = code.upper()
-    return COUNTRY_COORDS.get(code, (None, None))
+def _write_history(batches):
+    # Group commit: every queued record_lookup(s) call in one transaction
+    get_history_store().append([e for entries in batches for e in entries])
 
 
-def vt_get(url: str):
+write_behind.register("history", _write_history)
+
+# IOC history lives in ioc.history (SQLite file or MongoDB), shared by
+# all workers. Entries: {ioc_type, value, parsed, created_at}
+
+def _vt_fetch(url: str, ioc_type: str = None, value: str = None):
+    use_cache = ioc_type is not None and value is not None
+    if not VT_API_KEY:
+        print("VT_API_KEY is not set, request not sent:", url)
+        return None
+    if not vt_limiter.acquire():
+        upstream_errors.inc(provider="virustotal", reason="rate_limited")
+        print("VirusTotal rate limit reached, request not sent:", url)
+        return None
+
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=20)
+        resp = vt_client.get(url)
         if resp.status_code == 200:
-            return resp.json()
+            data = resp.json()
+            if use_cache:
+                verdict_cache.put(ioc_type, value, data)
+            return data
+        elif resp.status_code == 404:
+            if use_cache:
+                verdict_cache.put_negative(ioc_type, value)
+            return None
+        elif resp.status_code == 429:
+            vt_limiter.drain()
+            print("VirusTotal quota exceeded (429):", url)
+            return None
         else:
             print("VirusTotal error:", resp.status_code, resp.text)
             return None
@@ -62,19 +78,46 @@ def vt_get(url: str):
         return None
 
 
+def vt_get(url: str, ioc_type: str = None, value: str = None):
+    """
+    GET a VT endpoint. When ioc_type/value are given the shared
+    verdict cache is consulted first and filled on success or 404,
+    and concurrent lookups of the same indicator share one call.
+    Every upstream call takes a token from the per-key rate limiter.
+    """
+    if ioc_type is None or value is None:
+        return _vt_fetch(url)
+
+    hit, cached = verdict_cache.get(ioc_type, value)
+    if hit:
+        return cached
+
+    return vt_single_flight.do(
+        normalize_key(ioc_type, value),
+        lambda: _vt_fetch(url, ioc_type, value),
+    )
+
+
+def vt_quota():
+    """
+    Remaining VirusTotal budget for this API key (minute/day).
+    """
+    return vt_limiter.remaining()
+
+
 def lookup_ip(ip: str):
     url = f"{BASE_URL}/ip_addresses/{ip}"
-    return vt_get(url)
+    return vt_get(url, "ip", ip)
 
 
 def lookup_domain(domain: str):
     url = f"{BASE_URL}/domains/{domain}"
-    return vt_get(url)
+    return vt_get(url, "domain", domain)
 
 
 def lookup_hash(file_hash: str):
     url = f"{BASE_URL}/files/{file_hash}"
-    return vt_get(url)
+    return vt_get(url, "hash", file_hash)
 
 
 def lookup_url(raw_url: str):
@@ -83,76 +126,162 @@ def lookup_url(raw_url: str):
     """
     url_id = base64.urlsafe_b64encode(raw_url.encode("utf-8")).decode("utf-8").strip("=")
     url = f"{BASE_URL}/urls/{url_id}"
-    return vt_get(url)
+    return vt_get(url, "url", raw_url)
+
+
+LOOKUP_FUNCS = {
+    "ip": lookup_ip,
+    "domain": lookup_domain,
+    "url": lookup_url,
+    "hash": lookup_hash,
+}
+
+
+def lookup_ioc(ioc_type: str, value: str):
+    return LOOKUP_FUNCS[ioc_type](value)
+
+
+def _notify_lookup_listeners(entries):
+    for fn in LOOKUP_LISTENERS:
+        try:
+            fn(entries)
+        except Exception as e:
+            print("Lookup listener error:", e)
 
 
 def record_lookup(ioc_type: str, value: str, parsed: dict):
     """
-    Store lookup result in memory. We keep it simple: parsed already
-    contains country for IPs, which we later convert to geo coords.
+    Store lookup result in the history store. We keep it simple: parsed
+    already contains country for IPs, which we later convert to geo coords.
     """
-    LOOKUPS.append(
+    entries = [
         {
             "ioc_type": ioc_type,
             "value": value,
             "parsed": parsed,
             "created_at": datetime.utcnow(),
         }
-    )
+    ]
+    write_behind.submit("history", entries)
+    _notify_lookup_listeners(entries)
+
+
+def record_lookups(entries):
+    """
+    Batch variant of record_lookup for (ioc_type, value, parsed) tuples.
+    """
+    now = datetime.utcnow()
+    entries = [
+        {
+            "ioc_type": ioc_type,
+            "value": value,
+            "parsed": parsed,
+            "created_at": now,
+        }
+        for ioc_type, value, parsed in entries
+    ]
+    write_behind.submit("history", entries)
+    _notify_lookup_listeners(entries)
 
 
 def get_recent_lookups(limit: int = 5):
-    return sorted(LOOKUPS, key=lambda x: x["created_at"], reverse=True)[:limit]
+    return get_history_store().recent(limit)
+
+
+def get_lookup_history(ioc_type: str, value: str, limit: int = 50):
+    return get_history_store().by_value(*canonical_key(ioc_type, value), limit)
+
+
+def get_lookups_between(start, end=None, verdict=None, limit: int = 1000):
+    return get_history_store().time_range(start, end, verdict=verdict, limit=limit)
 
 
 def get_stats():
-    total = len(LOOKUPS)
-    malicious = sum(1 for x in LOOKUPS if x["parsed"] and x["parsed"]["malicious"] > 0)
-    harmless = sum(1 for x in LOOKUPS if x["parsed"] and x["parsed"]["malicious"] == 0)
-    suspicious = sum(1 for x in LOOKUPS if x["parsed"] and x["parsed"]["suspicious"] > 0)
-    return {
-        "total_iocs": total,
-        "malicious": malicious,
-        "harmless": harmless,
-        "suspicious": suspicious,
-    }
+    return get_history_store().counts()
 
 
-def get_globe_points():
+def get_country_histogram():
     """
-    Build data for the 3D globe from IOC lookups.
-    For IPs we use VT's country code to place a point on the map.
-    Each point: {lat, lng, severity, value, country, city}
+    {country: {severity: count}} over every IP lookup.
     """
-    points = []
-    for x in LOOKUPS:
-        p = x.get("parsed") or {}
-        ioc_type = x.get("ioc_type")
+    return get_history_store().country_histogram()
 
-        # Only IPs go on the globe for now
-        if ioc_type != "ip":
-            continue
 
-        country_code = (p.get("geo_country") or p.get("country") or "").upper()
-        lat, lon = _country_to_coords(country_code)
+def get_trend(granularity: str = "hour", since=None):
+    """
+    Time-bucketed lookup counts for trend charts.
+    granularity: minute | hour | day
+    """
+    return [
+        {
+            "bucket": datetime.utcfromtimestamp(bucket),
+            "total": total,
+            "malicious": malicious,
+            "harmless": harmless,
+            "suspicious": suspicious,
+        }
+        for bucket, total, malicious, harmless, suspicious
+        in get_history_store().rollups(granularity, since)
+    ]
+
+
+# One globe point. A tuple with interned strings is a fraction of the
+# size of the equivalent dict; dicts are only built for the JSON output.
+MapPoint = namedtuple("MapPoint", "ip country city risk lat lon source")
+
+
+def map_point(ip, country, city, risk, lat, lon, source):
+    return MapPoint(
+        ip,
+        sys.intern(country) if country else None,
+        sys.intern(city) if city else None,
+        sys.intern(risk),
+        lat,
+        lon,
+        source,
+    )
+
+
+def get_globe_points():
+    """
+    Globe points (MapPoint) for looked-up IPs, placed with the offline
+    GeoIP index, falling back to VT's country code.
+    The latest point per IP is maintained by the history store on
+    every append, so this never walks the lookup history.
+    """
+    points = []
+    for value, country_code, severity, city in get_history_store().ip_points():
+        lat, lon, geo_city, country_code = locate(value, country_code)
         if lat is None or lon is None:
             continue
 
-        severity = "harmless"
-        if p.get("malicious", 0) > 0:
-            severity = "malicious"
-        elif p.get("suspicious", 0) > 0:
-            severity = "suspicious"
-
-        points.append(
-            {
-                "lat": lat,
-                "lng": lon,
-                "severity": severity,
-                "value": p.get("value"),
-                "country": country_code,
-                "city": p.get("geo_city"),
-            }
-        )
+        if severity == "unknown":
+            severity = "harmless"
+
+        points.append(map_point(value, country_code, city or geo_city, severity, lat, lon, "lookup"))
 
     return points
+
+
+def get_top_risk(k: int = 50, days: int = None, ioc_type: str = None):
+    """
+    The k riskiest indicators, each at its latest lookup, ranked by
+    ioc.scoring over the columnar history snapshot.
+    `days` limits to indicators looked up in the last N days.
+    """
+    cols = get_history_columns()
+    since = time.time() - days * 86400 if days else None
+    ranked = []
+    for score, i in top_k(cols, k, since=since, ioc_type=ioc_type):
+        item = cols.row(i)
+        item["risk"] = score
+        item["severity"] = severity(score)
+        ranked.append(item)
+    return ranked
+
+
+def get_risk(value: str):
+    """(score, severity) for a canonical IOC value's latest lookup, or None."""
+    if not value:
+        return None
+    return risk_for(get_history_columns(), value)
@@ -0,0 +1,60 @@
+import time
+
+from flask import Blueprint, jsonify
+
+from feeds.scheduler import feed_ingest
+from ioc.history import HISTORY_BACKEND, get_history_store
+from ioc.services import VT_API_KEY
+from tickets.repository import TICKETS_BACKEND, get_ticket_repository
+
+health_bp = Blueprint("health", __name__)
+
+
+def _check(fn):
+    start = time.perf_counter()
+    try:
+        detail = fn()
+        result = {"ok": True}
+        if detail is not None:
+            result["detail"] = detail
+    except Exception as e:
+        result = {"ok": False, "error": str(e)}
+    result["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return result
+
+
+def _mongo():
+    import config
+
+    config.ping()
+
+
+@health_bp.route("/healthz", methods=["GET"])
+def healthz():
+    """Liveness: the worker is up and serving. No I/O."""
+    return jsonify({"status": "ok"})
+
+
+@health_bp.route("/readyz", methods=["GET"])
+def readyz():
+    """
+    Readiness: storage reachable and upstream credentials configured.
+    This is where connections get exercised, not at import time.
+    """
+    checks = {
+        "history": _check(lambda: get_history_store().ping() or HISTORY_BACKEND),
+        "tickets": _check(lambda: get_ticket_repository().ping() or TICKETS_BACKEND),
+    }
+    if "mongo" in (HISTORY_BACKEND, TICKETS_BACKEND):
+        checks["mongo"] = _check(_mongo)
+    ready = all(c["ok"] for c in checks.values())
+
+    # Informational: a worker without a VT key can still serve everything else
+    checks["virustotal_key"] = {"ok": bool(VT_API_KEY)}
+    checks["feed_scheduler"] = {
+        "ok": True, "detail": feed_ingest.role if feed_ingest.running else "idle",
+    }
+
+    return jsonify({"status": "ready" if ready else "unavailable", "checks": checks}), (
+        200 if ready else 503
+    )
@@ -0,0 +1,120 @@
+import hmac
+import os
+import time
+
+from flask import Blueprint, Response, abort, g, request
+
+from feeds.blacklist import abuseipdb_blacklist
+from feeds.live import threat_map_live
+from feeds.scheduler import FEED_INTERVALS, feed_store
+from feeds.services import _executor
+from ioc.services import vt_limiter
+from services.cache import verdict_cache
+from services.metrics import CONTENT_TYPE, http_request_seconds, registry
+from services.writer import write_behind
+
+metrics_bp = Blueprint("metrics", __name__)
+
+# Optional bearer token for /metrics; unset leaves it open for the scraper
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+# =========================
+# REQUEST LATENCY
+# =========================
+@metrics_bp.before_app_request
+def _start_timer():
+    g._request_start = time.perf_counter()
+
+
+@metrics_bp.after_app_request
+def _observe_request(response):
+    start = g.pop("_request_start", None)
+    if start is not None:
+        rule = request.url_rule
+        http_request_seconds.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            endpoint=rule.rule if rule is not None else "<unmatched>",
+            status=response.status_code,
+        )
+    return response
+
+
+# =========================
+# SCRAPE-TIME GAUGES
+# =========================
+def _cache_stat(field):
+    return lambda: {("verdict",): verdict_cache.stats()[field]}
+
+
+registry.gauge("cti_cache_hit_ratio", "Hit ratio since start.", _cache_stat("hit_ratio"), ("cache",))
+registry.gauge("cti_cache_hits_total", "Cache hits.", _cache_stat("hits"), ("cache",), kind="counter")
+registry.gauge("cti_cache_misses_total", "Cache misses.", _cache_stat("misses"), ("cache",), kind="counter")
+registry.gauge("cti_cache_entries", "Entries currently cached.", _cache_stat("size"), ("cache",))
+
+registry.gauge(
+    "cti_queue_depth",
+    "Items waiting in background worker queues.",
+    lambda: {
+        ("write_behind",): write_behind.metrics()["queue_depth"],
+        ("feed_executor",): _executor._work_queue.qsize(),
+        ("vt_limiter",): vt_limiter.remaining()["waiting"],
+    },
+    ("queue",),
+)
+registry.gauge(
+    "cti_write_behind_lag_seconds",
+    "Enqueue-to-commit delay of the last write-behind batch.",
+    lambda: write_behind.metrics()["last_lag_ms"] / 1000.0,
+)
+registry.gauge(
+    "cti_write_behind_written_total",
+    "Items committed by the write-behind writer.",
+    lambda: write_behind.metrics()["written"],
+    kind="counter",
+)
+registry.gauge(
+    "cti_write_behind_inline_total",
+    "Writes done inline because write-behind was full or disabled.",
+    lambda: write_behind.metrics()["inline"],
+    kind="counter",
+)
+registry.gauge(
+    "cti_sse_subscribers",
+    "Connected threat-map stream clients.",
+    lambda: len(threat_map_live.broadcaster),
+)
+registry.gauge(
+    "cti_vt_quota_remaining",
+    "VirusTotal request budget left in the current window.",
+    lambda: {
+        ("minute",): vt_limiter.remaining()["minute"],
+        ("day",): vt_limiter.remaining()["day"],
+    },
+    ("window",),
+)
+registry.gauge(
+    "cti_feed_snapshot_age_seconds",
+    "Seconds since each feed was last refreshed.",
+    lambda: {
+        (name,): time.time() - snap.fetched_at
+        for name, snap in ((n, feed_store.get(n)) for n in FEED_INTERVALS)
+        if snap is not None
+    },
+    ("feed",),
+)
+registry.gauge(
+    "cti_abuseipdb_blacklist_entries",
+    "IPs in the locally synced AbuseIPDB blacklist.",
+    lambda: len(abuseipdb_blacklist.current()),
+)
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics():
+    if METRICS_TOKEN:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(supplied, METRICS_TOKEN):
+            abort(401)
+    return Response(registry.render(), content_type=CONTENT_TYPE)
@@ -1,49 +1,84 @@
-from flask import Blueprint, jsonify
-import requests
+import json
 import os
-from dotenv import load_dotenv
+import queue
+import threading
+import time
 
-# LOAD ENV
-load_dotenv()
+from flask import Blueprint, Response, jsonify, stream_with_context
+from flask_login import login_required
+
+from feeds.services import fetch_threat_map
+from feeds.scheduler import feed_ingest
+from feeds.live import points_json, threat_map_live
 
 threat_map = Blueprint("threat_map", __name__)
 
-ABUSEIPDB_API_KEY = os.getenv("ABUSEIPDB_API_KEY")
+# Keep-alive comment interval, and how long one stream lives before the
+# browser is asked to reconnect (keeps threaded workers from being pinned)
+SSE_KEEPALIVE = int(os.getenv("SSE_KEEPALIVE", 15))
+SSE_MAX_SECONDS = int(os.getenv("SSE_MAX_SECONDS", 300))
+# Open streams per worker. Each one holds a gthread thread for its whole
+# life, so keep this below the worker's --threads (8 in the Procfile) or
+# streams alone can leave no thread for ordinary requests. Past the limit
+# the stream answers 503 and the map polls /api/threat-map instead.
+SSE_MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", 4))
+
+_stream_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
 
 
 @threat_map.route("/threat-map", methods=["GET"])
 def threat_map_data():
-    if not ABUSEIPDB_API_KEY:
-        return jsonify([])
-
-    headers = {
-        "Key": ABUSEIPDB_API_KEY,
-        "Accept": "application/json"
-    }
-
-    response = requests.get(
-        "https://api.abuseipdb.com/api/v2/blacklist",
-        headers=headers,
-        params={
-            "confidenceMinimum": 85,
-            "limit": 20
-        },
-        timeout=20
-    )
+    # Served from the background snapshot; only fetch inline when the
+    # feed ingestion is not running in this process. Feed points only:
+    # looked-up IPs are for logged-in users on the stream.
+    if not feed_ingest.running:
+        threat_map_live.set_feed(fetch_threat_map(limit=20))
+    return jsonify(points_json(threat_map_live.feed_points()))
 
-    if response.status_code != 200:
-        return jsonify([])
 
-    data = response.json().get("data", [])
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
-    threats = []
-    for ip in data:
-        threats.append({
-            "ip": ip.get("ipAddress"),
-            "country": ip.get("countryCode"),
-            "risk": "malicious",
-            "lat": ip.get("latitude"),
-            "lon": ip.get("longitude")
-        })
 
-    return jsonify(threats)
+@threat_map.route("/threat-map/stream", methods=["GET"])
+@login_required
+def threat_map_stream():
+    """
+    Server-Sent Events: one `snapshot` event with the full threat set,
+    then `delta` events ({added, removed}) as feeds refresh or IP
+    lookups are recorded. At most SSE_MAX_STREAMS per worker.
+    """
+    if not _stream_slots.acquire(blocking=False):
+        return Response(
+            "Too many live streams, poll /api/threat-map instead\n",
+            status=503,
+            mimetype="text/plain",
+            headers={"Retry-After": "60"},
+        )
+    q = threat_map_live.broadcaster.subscribe()
+
+    def generate():
+        try:
+            yield "retry: 5000\n"
+            yield _sse("snapshot", points_json(threat_map_live.points()))
+            deadline = time.monotonic() + SSE_MAX_SECONDS
+            while time.monotonic() < deadline:
+                try:
+                    event = q.get(timeout=SSE_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield _sse("delta", {"added": points_json(event["added"]), "removed": event["removed"]})
+        finally:
+            threat_map_live.broadcaster.unsubscribe(q)
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Runs even if the client leaves before the generator starts
+    response.call_on_close(_stream_slots.release)
+    return response
@@ -0,0 +1,127 @@
+# services/cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from ioc.normalize import canonical_key
+
+# How long a verdict stays fresh, per IOC type (seconds).
+# File hashes almost never change verdict; IPs churn the fastest.
+DEFAULT_TTLS = {
+    "ip": int(os.getenv("VT_CACHE_TTL_IP", 3600)),
+    "domain": int(os.getenv("VT_CACHE_TTL_DOMAIN", 6 * 3600)),
+    "url": int(os.getenv("VT_CACHE_TTL_URL", 3600)),
+    "hash": int(os.getenv("VT_CACHE_TTL_HASH", 24 * 3600)),
+}
+
+# 404 "not found in VT" answers are cached for a shorter time
+NEGATIVE_TTL = int(os.getenv("VT_CACHE_NEGATIVE_TTL", 600))
+
+MAX_ENTRIES = int(os.getenv("VT_CACHE_MAX_ENTRIES", 10000))
+
+# Sentinel stored for negative (404) entries
+NOT_FOUND = object()
+
+
+def normalize_key(ioc_type: str, value: str):
+    """
+    Build the cache key for an indicator: the same canonical key
+    history and tickets use, so "HXXP://Example[.]com" and
+    "http://example.com/" share one entry.
+    """
+    return canonical_key(ioc_type, value)
+
+
+class VerdictCache:
+    """
+    Size-bounded LRU cache with a per-IOC-type TTL.
+    Values are raw VT JSON payloads, or NOT_FOUND for negative entries.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttls=None, negative_ttl=NEGATIVE_TTL):
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.negative_ttl = negative_ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, ioc_type: str, value: str):
+        """
+        Returns (hit, payload). payload is None for a cached 404.
+        """
+        key = normalize_key(ioc_type, value)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            expires_at, payload = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+        if payload is NOT_FOUND:
+            return True, None
+        return True, payload
+
+    def peek(self, ioc_type: str, value: str):
+        """
+        Like get() but leaves counters and LRU order untouched.
+        """
+        entry = self._data.get(normalize_key(ioc_type, value))
+        if entry is None or entry[0] <= time.monotonic():
+            return False, None
+        if entry[1] is NOT_FOUND:
+            return True, None
+        return True, entry[1]
+
+    def put(self, ioc_type: str, value: str, payload):
+        ttl = self.ttls.get(ioc_type, 3600)
+        self._store(normalize_key(ioc_type, value), payload, ttl)
+
+    def put_negative(self, ioc_type: str, value: str):
+        self._store(normalize_key(ioc_type, value), NOT_FOUND, self.negative_ttl)
+
+    def _store(self, key, payload, ttl):
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, payload)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, ioc_type: str, value: str):
+        with self._lock:
+            self._data.pop(normalize_key(ioc_type, value), None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+# Shared by every VirusTotal lookup (ioc/services.py) and the bulk runner
+verdict_cache = VerdictCache()
@@ -0,0 +1,193 @@
+# services/geoip.py
+import csv
+import ipaddress
+import os
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+# CSV with a header row and either a `network` (CIDR) column or
+# `start_ip`/`end_ip` columns, plus country, city, latitude, longitude
+# and asn. GeoLite2-City/ASN exports joined on network, or DB-IP lite,
+# both fit. Without the file every lookup falls back to COUNTRY_COORDS.
+GEOIP_DB = os.getenv("GEOIP_DB", os.path.join(BASE_DIR, "data", "geoip.csv"))
+
+# Simple country → approximate lat/lon mapping so the maps always work
+COUNTRY_COORDS = {
+    "IN": (20.5937, 78.9629),
+    "US": (37.0902, -95.7129),
+    "GB": (55.3781, -3.4360),
+    "DE": (51.1657, 10.4515),
+    "FR": (46.2276, 2.2137),
+    "JP": (36.2048, 138.2529),
+    "CN": (35.8617, 104.1954),
+    "BR": (-14.2350, -51.9253),
+    "RU": (61.5240, 105.3188),
+    "AU": (-25.2744, 133.7751),
+    "CA": (56.1304, -106.3468),
+    "SG": (1.3521, 103.8198),
+    "NL": (52.1326, 5.2913),
+    "ES": (40.4637, -3.7492),
+    "IT": (41.8719, 12.5674),
+    "ZA": (-30.5595, 22.9375),
+}
+
+
+class _RangeIndex:
+    """
+    Sorted, non-overlapping [start, end] integer ranges searched with
+    bisect. IPv4 bounds live in compact unsigned arrays; IPv6 bounds
+    need 128 bits so they stay Python ints.
+    """
+
+    def __init__(self, typecode=None):
+        self.starts = array(typecode) if typecode else []
+        self.ends = array(typecode) if typecode else []
+        self.records = []  # index into GeoIndex.records
+
+    def find(self, n):
+        i = bisect_right(self.starts, n) - 1
+        if i >= 0 and n <= self.ends[i]:
+            return self.records[i]
+        return None
+
+
+class GeoIndex:
+    """
+    In-memory CIDR → (country, city, lat, lon, asn) index.
+    """
+
+    def __init__(self):
+        self.v4 = _RangeIndex("I" if array("I").itemsize >= 4 else "L")
+        self.v6 = _RangeIndex()
+        self.records = []
+        self.country_centroids = {}
+
+    @classmethod
+    def from_csv(cls, path):
+        index = cls()
+        rows4, rows6 = [], []
+        records = {}
+        centroid_sums = {}
+
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    if row.get("network"):
+                        net = ipaddress.ip_network(row["network"].strip(), strict=False)
+                        start, end = int(net.network_address), int(net.broadcast_address)
+                        version = net.version
+                    else:
+                        first = ipaddress.ip_address(row["start_ip"].strip())
+                        start = int(first)
+                        end = int(ipaddress.ip_address(row["end_ip"].strip()))
+                        version = first.version
+                    lat = float(row["latitude"]) if row.get("latitude") else None
+                    lon = float(row["longitude"]) if row.get("longitude") else None
+                except (KeyError, ValueError):
+                    continue
+
+                country = sys.intern((row.get("country") or "").upper())
+                city = sys.intern(row.get("city") or "")
+                asn = sys.intern(row.get("asn") or "")
+                rec = (country or None, city or None, lat, lon, asn or None)
+
+                # Many ranges share the same location; store each once
+                rec_id = records.get(rec)
+                if rec_id is None:
+                    rec_id = len(index.records)
+                    records[rec] = rec_id
+                    index.records.append(rec)
+
+                (rows4 if version == 4 else rows6).append((start, end, rec_id))
+
+                if country and lat is not None and lon is not None:
+                    s = centroid_sums.setdefault(country, [0.0, 0.0, 0])
+                    s[0] += lat
+                    s[1] += lon
+                    s[2] += 1
+
+        for rows, target in ((rows4, index.v4), (rows6, index.v6)):
+            rows.sort()
+            for start, end, rec_id in rows:
+                target.starts.append(start)
+                target.ends.append(end)
+                target.records.append(rec_id)
+
+        index.country_centroids = {
+            c: (s[0] / s[2], s[1] / s[2]) for c, s in centroid_sums.items()
+        }
+        return index
+
+    def lookup(self, ip):
+        try:
+            addr = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        target = self.v4 if addr.version == 4 else self.v6
+        rec_id = target.find(int(addr))
+        if rec_id is None:
+            return None
+        country, city, lat, lon, asn = self.records[rec_id]
+        return {"country": country, "city": city, "lat": lat, "lon": lon, "asn": asn}
+
+    def __len__(self):
+        return len(self.v4.starts) + len(self.v6.starts)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Load the dataset on first use. A missing or unreadable file gives
+    an empty index so callers just fall back to country coordinates.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                if os.path.exists(GEOIP_DB):
+                    try:
+                        _index = GeoIndex.from_csv(GEOIP_DB)
+                    except Exception as e:
+                        print("GeoIP load failed:", e)
+                        _index = GeoIndex()
+                else:
+                    _index = GeoIndex()
+    return _index
+
+
+def lookup_ip(ip):
+    """
+    {country, city, lat, lon, asn} for an IP, or None. No network call.
+    """
+    if not ip:
+        return None
+    return get_index().lookup(ip)
+
+
+def country_coords(code):
+    if not code:
+        return None, None
+    code = code.upper()
+    if code in COUNTRY_COORDS:
+        return COUNTRY_COORDS[code]
+    return get_index().country_centroids.get(code, (None, None))
+
+
+def locate(ip, country=None):
+    """
+    Best-effort (lat, lon, city, country) for an IP: exact dataset hit
+    first, then the centroid of `country`.
+    """
+    geo = lookup_ip(ip)
+    if geo and geo["lat"] is not None and geo["lon"] is not None:
+        return geo["lat"], geo["lon"], geo["city"], geo["country"] or country
+    country = (country or (geo and geo["country"]) or "").upper() or None
+    lat, lon = country_coords(country)
+    return lat, lon, None, country
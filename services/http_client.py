@@ -0,0 +1,127 @@
+# services/http_client.py
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from services.metrics import upstream_errors, upstream_request_seconds
+
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 10))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 3))
+BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", 0.5))
+DEFAULT_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 20))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# For providers with a hard request quota (VirusTotal, AbuseIPDB) a 429
+# means the budget is spent: retrying only burns more of it, so it goes
+# straight back to the caller and the RateLimiter does the pacing
+QUOTA_RETRY_STATUSES = (500, 502, 503, 504)
+# Longest single sleep between retries, Retry-After included (seconds).
+# urllib3 would otherwise honour a Retry-After of up to 6 hours.
+RETRY_MAX_SLEEP = float(os.getenv("HTTP_RETRY_MAX_SLEEP", 5))
+
+
+class _CappedRetry(Retry):
+    """Retry whose backoff and Retry-After sleeps never exceed RETRY_MAX_SLEEP."""
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        # urllib3 retries any 429 carrying Retry-After, even when 429 is
+        # not in status_forcelist
+        if status_code == 429 and 429 not in (self.status_forcelist or ()):
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+    def get_backoff_time(self):
+        return min(super().get_backoff_time(), RETRY_MAX_SLEEP)
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, RETRY_MAX_SLEEP)
+
+
+class ProviderClient:
+    """
+    Keep-alive HTTP client for one upstream provider.
+    Wraps a requests.Session with a sized connection pool, retry with
+    exponential backoff on `retry_statuses` (honouring Retry-After, capped
+    at RETRY_MAX_SLEEP) and the provider's default headers and timeout.
+    """
+
+    def __init__(self, name, headers=None, timeout=DEFAULT_TIMEOUT,
+                 pool_size=POOL_SIZE, retries=MAX_RETRIES, backoff=BACKOFF_FACTOR,
+                 retry_statuses=RETRY_STATUSES):
+        self.name = name
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+
+        retry = _CappedRetry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=retry_statuses,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        try:
+            resp = self.session.get(url, **kwargs)
+        except Exception as e:
+            upstream_request_seconds.observe(
+                time.perf_counter() - start, provider=self.name, status="error"
+            )
+            upstream_errors.inc(provider=self.name, reason=type(e).__name__)
+            raise
+        upstream_request_seconds.observe(
+            time.perf_counter() - start, provider=self.name, status=resp.status_code
+        )
+        if resp.status_code >= 400 and resp.status_code != 404:
+            upstream_errors.inc(provider=self.name, reason=f"http_{resp.status_code}")
+        return resp
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def register_provider(name, **options):
+    """
+    Create the shared client for `name`, or return the existing one.
+    The first registration's options win.
+    """
+    with _lock:
+        client = _clients.get(name)
+        if client is None:
+            client = ProviderClient(name, **options)
+            _clients[name] = client
+        return client
+
+
+def get_client(name):
+    client = _clients.get(name)
+    if client is None:
+        return register_provider(name)
+    return client
+
+
+def close_all():
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
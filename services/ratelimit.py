@@ -0,0 +1,292 @@
+# services/ratelimit.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from services.writer import sqlite_synchronous
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+# VirusTotal public API: 4 requests/minute, 500/day
+VT_RATE_PER_MINUTE = int(os.getenv("VT_RATE_PER_MINUTE", 4))
+VT_RATE_PER_DAY = int(os.getenv("VT_RATE_PER_DAY", 500))
+# At most this many requests may queue for a token, each for at most
+# VT_RATE_MAX_WAIT seconds, so a burst can't pin every worker thread.
+VT_RATE_MAX_WAITERS = int(os.getenv("VT_RATE_MAX_WAITERS", 8))
+VT_RATE_MAX_WAIT = float(os.getenv("VT_RATE_MAX_WAIT", 15))
+# Bucket state shared by all worker processes on this host. Set it to ""
+# to keep a separate bucket per process (the budget then multiplies by
+# the number of workers).
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", os.path.join(BASE_DIR, "ratelimit.db"))
+
+
+class MemoryBucket:
+    """
+    Token-bucket state for one process: a per-minute refill rate plus a
+    fixed per-day budget (reset at 00:00 UTC).
+    """
+
+    def __init__(self, per_minute, per_day):
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self._rate = per_minute / 60.0
+        self._lock = threading.Lock()
+        self._state = (float(per_minute), time.time(), _today(), 0)
+
+    def _refill(self, state, now):
+        tokens, last, day, day_used = state
+        tokens = min(self.per_minute, tokens + max(now - last, 0) * self._rate)
+        if day != _today():
+            day, day_used = _today(), 0
+        return tokens, now, day, day_used
+
+    def _load(self):
+        return self._state
+
+    def _save(self, state):
+        self._state = state
+
+    def _transaction(self):
+        return self._lock
+
+    def take(self):
+        """
+        Try to take one token: (True, 0) on success, (False, None) when
+        the day's budget is spent, else (False, seconds until a token).
+        """
+        with self._transaction():
+            tokens, last, day, day_used = self._refill(self._load(), time.time())
+            if day_used >= self.per_day:
+                result = False, None
+            elif tokens >= 1:
+                tokens, day_used = tokens - 1, day_used + 1
+                result = True, 0
+            else:
+                result = False, (1 - tokens) / self._rate
+            self._save((tokens, last, day, day_used))
+        return result
+
+    def drain(self):
+        with self._transaction():
+            _, last, day, day_used = self._refill(self._load(), time.time())
+            self._save((0.0, last, day, day_used))
+
+    def peek(self):
+        """(tokens, day_used) without taking anything."""
+        with self._transaction():
+            tokens, _, _, day_used = self._refill(self._load(), time.time())
+        return tokens, day_used
+
+
+class SQLiteBucket(MemoryBucket):
+    """
+    The same bucket kept in a SQLite file, so every gunicorn worker on
+    the host draws from one budget. Each take() is a BEGIN IMMEDIATE
+    read-modify-write, serialised across processes by SQLite's lock.
+    """
+
+    def __init__(self, per_minute, per_day, path, key):
+        super().__init__(per_minute, per_day)
+        self.path = path
+        self.key = key
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(
+                self.path, check_same_thread=False, timeout=10, isolation_level=None
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(f"PRAGMA synchronous={sqlite_synchronous()}")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY,"
+                " tokens REAL NOT NULL, last REAL NOT NULL, day TEXT NOT NULL,"
+                " day_used INTEGER NOT NULL)"
+            )
+        return self._conn
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _load(self):
+        row = self._conn.execute(
+            "SELECT tokens, last, day, day_used FROM rate_buckets WHERE key = ?", (self.key,)
+        ).fetchone()
+        return tuple(row) if row else (float(self.per_minute), time.time(), _today(), 0)
+
+    def _save(self, state):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO rate_buckets (key, tokens, last, day, day_used)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (self.key,) + tuple(state),
+        )
+
+    def _after_fork(self):
+        # The connection belongs to the parent; reopen on first use
+        self._conn = None
+        self._lock = threading.Lock()
+
+
+def _today():
+    return datetime.utcnow().date().isoformat()
+
+
+class RateLimiter:
+    """
+    Token bucket with a per-minute refill rate plus a fixed per-day
+    budget. Callers wait in a bounded per-process queue until a token
+    is free, the wait would exceed `max_wait`, or the queue is full.
+    The bucket itself is a MemoryBucket or, to share one budget between
+    worker processes, a SQLiteBucket.
+    """
+
+    def __init__(self, per_minute, per_day, max_waiters=VT_RATE_MAX_WAITERS,
+                 max_wait=VT_RATE_MAX_WAIT, bucket=None):
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.max_waiters = max_waiters
+        self.max_wait = max_wait
+        self.bucket = bucket or MemoryBucket(per_minute, per_day)
+        self._waiters = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _reject(self):
+        with self._lock:
+            self.rejected += 1
+        return False
+
+    def acquire(self, timeout=None):
+        """
+        Take one token. Returns False if the request should not go upstream.
+        """
+        timeout = self.max_wait if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            if self._waiters >= self.max_waiters:
+                self.rejected += 1
+                return False
+            self._waiters += 1
+        try:
+            while True:
+                ok, wait = self.bucket.take()
+                if ok:
+                    return True
+                if wait is None or time.monotonic() + wait > deadline:
+                    return self._reject()
+                time.sleep(wait)
+        finally:
+            with self._lock:
+                self._waiters -= 1
+
+    def drain(self):
+        """Upstream answered 429: spend this minute's tokens so callers back off."""
+        self.bucket.drain()
+
+    def remaining(self):
+        tokens, day_used = self.bucket.peek()
+        return {
+            "minute": int(tokens),
+            "per_minute": self.per_minute,
+            "day": max(self.per_day - day_used, 0),
+            "per_day": self.per_day,
+            "waiting": self._waiters,
+            "rejected": self.rejected,
+        }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(api_key, per_minute=VT_RATE_PER_MINUTE, per_day=VT_RATE_PER_DAY):
+    """
+    One limiter per API key, shared by every module that uses that key
+    and, through RATE_LIMIT_DB, by every worker process.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(api_key)
+        if limiter is None:
+            bucket = None
+            if RATE_LIMIT_DB:
+                # Keyed on a digest so the key itself isn't written to disk
+                key = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+                bucket = SQLiteBucket(per_minute, per_day, RATE_LIMIT_DB, key)
+            limiter = RateLimiter(per_minute, per_day, bucket=bucket)
+            _limiters[api_key] = limiter
+        return limiter
+
+
+def _reset_after_fork():
+    for limiter in _limiters.values():
+        limiter._lock = threading.Lock()
+        if isinstance(limiter.bucket, SQLiteBucket):
+            limiter.bucket._after_fork()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key: the first caller runs
+    fn(), everyone else waits and gets the same result.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result
+
+
+# Shared by every VT client so identical in-flight lookups share one call
+vt_single_flight = SingleFlight()
@@ -0,0 +1,199 @@
+# services/writer.py
+import atexit
+import os
+import queue
+import threading
+import time
+
+# "batch" (default): one fsync per group commit, off the request path.
+# "always": no write-behind, every write is flushed to disk before the
+# request returns. "off": never fsync, the OS decides when data hits disk.
+FSYNC_POLICY = os.getenv("WRITE_FSYNC", "batch").lower()
+WRITE_QUEUE_SIZE = int(os.getenv("WRITE_QUEUE_SIZE", 10000))
+# A group commit takes up to this many items, waiting at most this long
+# for more to arrive after the first one
+WRITE_BATCH_MAX = int(os.getenv("WRITE_BATCH_MAX", 500))
+WRITE_BATCH_WAIT_MS = float(os.getenv("WRITE_BATCH_WAIT_MS", 20))
+# How long submit() waits for room before writing inline instead
+WRITE_SUBMIT_TIMEOUT = float(os.getenv("WRITE_SUBMIT_TIMEOUT", 0.05))
+
+
+def should_fsync():
+    return FSYNC_POLICY != "off"
+
+
+def sqlite_synchronous():
+    """
+    PRAGMA synchronous value matching the policy. Under WAL, NORMAL only
+    fsyncs at checkpoints, so commits stay off the disk-flush path.
+    """
+    return "FULL" if FSYNC_POLICY == "always" else "NORMAL"
+
+
+class WriteBehind:
+    """
+    Bounded queue drained by one background thread that hands each
+    registered sink its pending items as a single batch (group commit).
+
+    Ordering is preserved per sink. When the queue is full, submit()
+    applies backpressure by writing inline rather than dropping.
+    """
+
+    def __init__(self, maxsize=WRITE_QUEUE_SIZE, batch_max=WRITE_BATCH_MAX,
+                 batch_wait=WRITE_BATCH_WAIT_MS / 1000.0, enabled=None):
+        self.batch_max = batch_max
+        self.batch_wait = batch_wait
+        self.enabled = FSYNC_POLICY != "always" if enabled is None else enabled
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._sinks = {}
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopping = False
+
+        self._idle = threading.Condition()
+        self._pending = 0
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "written": 0,
+            "batches": 0,
+            "inline": 0,
+            "errors": 0,
+            "last_batch_size": 0,
+            "last_lag_ms": 0.0,
+            "max_lag_ms": 0.0,
+        }
+
+    def register(self, kind, sink):
+        """sink(items) persists a list of payloads in one go."""
+        self._sinks[kind] = sink
+
+    # =========================
+    # PRODUCERS
+    # =========================
+    def submit(self, kind, payload):
+        if not self.enabled or self._stopping:
+            self._write_inline(kind, payload)
+            return
+        self._ensure_started()
+
+        with self._idle:
+            self._pending += 1
+        try:
+            self._queue.put((kind, payload, time.monotonic()), timeout=WRITE_SUBMIT_TIMEOUT)
+        except queue.Full:
+            self._done(1)
+            self._write_inline(kind, payload)
+            return
+        with self._stats_lock:
+            self._stats["submitted"] += 1
+
+    def _write_inline(self, kind, payload):
+        with self._stats_lock:
+            self._stats["inline"] += 1
+        self._sinks[kind]([payload])
+
+    # =========================
+    # WRITER THREAD
+    # =========================
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="write-behind", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._done(1)  # the stop marker counted by stop()
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_max:
+                try:
+                    nxt = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    # Stop marker: commit what we have, then exit
+                    self._commit(batch)
+                    self._done(1)
+                    return
+                batch.append(nxt)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        lag_ms = (time.monotonic() - batch[0][2]) * 1000
+        grouped = {}
+        for kind, payload, _ in batch:
+            grouped.setdefault(kind, []).append(payload)
+        for kind, payloads in grouped.items():
+            try:
+                self._sinks[kind](payloads)
+            except Exception as e:
+                with self._stats_lock:
+                    self._stats["errors"] += 1
+                print(f"Write-behind {kind} error:", e)
+        with self._stats_lock:
+            s = self._stats
+            s["written"] += len(batch)
+            s["batches"] += 1
+            s["last_batch_size"] = len(batch)
+            s["last_lag_ms"] = round(lag_ms, 2)
+            s["max_lag_ms"] = round(max(s["max_lag_ms"], lag_ms), 2)
+        self._done(len(batch))
+
+    def _done(self, n):
+        with self._idle:
+            self._pending -= n
+            if self._pending <= 0:
+                self._idle.notify_all()
+
+    # =========================
+    # LIFECYCLE
+    # =========================
+    def flush(self, timeout=5.0):
+        """Block until everything submitted so far is written."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending <= 0, timeout)
+
+    def stop(self, timeout=5.0):
+        """Drain the queue and stop the thread; later writes go inline."""
+        self._stopping = True
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self.flush(timeout)
+        with self._idle:
+            self._pending += 1
+        self._queue.put(None)
+        thread.join(timeout)
+
+    def _after_fork(self):
+        # The writer thread and any queued items belong to the parent
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._idle = threading.Condition()
+        self._pending = 0
+        self._stats_lock = threading.Lock()
+
+    def metrics(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["queue_capacity"] = self._queue.maxsize
+        stats["fsync_policy"] = FSYNC_POLICY
+        stats["enabled"] = self.enabled
+        return stats
+
+
+write_behind = WriteBehind()
+atexit.register(write_behind.stop)
+os.register_at_fork(after_in_child=write_behind._after_fork)
@@ -0,0 +1,98 @@
+document.addEventListener("DOMContentLoaded", () => {
+  const form = document.getElementById("bulk-form");
+  if (!form) return;
+
+  const textEl = document.getElementById("bulk-text");
+  const submitBtn = document.getElementById("bulk-submit");
+  const progressEl = document.getElementById("bulk-progress");
+  const errorEl = document.getElementById("bulk-error");
+  const tbody = document.getElementById("bulk-results");
+
+  function cell(text, cls) {
+    const td = document.createElement("td");
+    td.textContent = text === null || text === undefined ? "-" : text;
+    if (cls) td.className = cls;
+    return td;
+  }
+
+  function addRow(res) {
+    const p = res.parsed || {};
+    const tr = document.createElement("tr");
+    tr.appendChild(cell(res.ioc_type.toUpperCase()));
+    tr.appendChild(cell(res.value));
+    tr.appendChild(cell(res.status + (res.cached ? " (cached)" : "")));
+    tr.appendChild(cell(p.malicious, p.malicious > 0 ? "text-danger" : ""));
+    tr.appendChild(cell(p.suspicious, p.suspicious > 0 ? "text-warning" : ""));
+    tr.appendChild(cell(p.harmless));
+    tr.appendChild(cell(p.country));
+    tr.appendChild(res.blacklist
+      ? cell(`listed (${res.blacklist.score})`, "text-danger")
+      : cell(null));
+    tbody.appendChild(tr);
+  }
+
+  function showError(msg) {
+    errorEl.textContent = msg;
+    errorEl.classList.remove("d-none");
+  }
+
+  form.addEventListener("submit", async (e) => {
+    e.preventDefault();
+    tbody.innerHTML = "";
+    errorEl.classList.add("d-none");
+    submitBtn.disabled = true;
+
+    let total = 0;
+    let done = 0;
+
+    try {
+      const resp = await fetch("/ioc/api/bulk", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ text: textEl.value })
+      });
+
+      if (!resp.ok) {
+        const data = await resp.json().catch(() => ({}));
+        showError(data.error || "Bulk lookup failed.");
+        return;
+      }
+
+      // Read NDJSON line by line as results stream in
+      const reader = resp.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let first = true;
+
+      while (true) {
+        const { value, done: finished } = await reader.read();
+        if (finished) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let idx;
+        while ((idx = buffer.indexOf("\n")) >= 0) {
+          const line = buffer.slice(0, idx).trim();
+          buffer = buffer.slice(idx + 1);
+          if (!line) continue;
+          const msg = JSON.parse(line);
+
+          if (first) {
+            first = false;
+            total = msg.accepted;
+            if (msg.rejected && msg.rejected.length) {
+              showError(`Skipped ${msg.rejected.length} value(s) that are not IOCs.`);
+            }
+          } else {
+            done += 1;
+            addRow(msg);
+          }
+          progressEl.textContent = `${done} / ${total}`;
+        }
+      }
+    } catch (err) {
+      showError("Bulk lookup failed.");
+    } finally {
+      submitBtn.disabled = false;
+    }
+  });
+});
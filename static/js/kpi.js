@@ -33,19 +33,47 @@ document.addEventListener("DOMContentLoaded", () => {
   const goodEl  = document.getElementById("kpi-good");
   const suspEl  = document.getElementById("kpi-susp");
 
-  // ===== DEMO VALUES (SAFE DEFAULTS) =====
-  // Later these can come from backend/API
-  const values = {
-    total: 248,
-    malicious: 63,
-    harmless: 141,
-    suspicious: 44
-  };
-
-  // ===== ANIMATE =====
-  animateValue(totalEl, 0, values.total, 900);
-  animateValue(malEl, 0, values.malicious, 800);
-  animateValue(goodEl, 0, values.harmless, 1000);
-  animateValue(suspEl, 0, values.suspicious, 850);
+  if (!totalEl) return;
+
+  function current(el) {
+    return parseInt(el && el.textContent, 10) || 0;
+  }
+
+  function render(stats, first) {
+    animateValue(totalEl, first ? 0 : current(totalEl), stats.total_iocs, 900);
+    animateValue(malEl, first ? 0 : current(malEl), stats.malicious, 800);
+    animateValue(goodEl, first ? 0 : current(goodEl), stats.harmless, 1000);
+    animateValue(suspEl, first ? 0 : current(suspEl), stats.suspicious, 850);
+  }
+
+  // ===== INITIAL VALUES (SERVER RENDERED) =====
+  render({
+    total_iocs: current(totalEl),
+    malicious: current(malEl),
+    harmless: current(goodEl),
+    suspicious: current(suspEl)
+  }, true);
+
+  // ===== LIVE REFRESH =====
+  // Conditional GET: the server answers 304 while the version is unchanged
+  const POLL_MS = 15000;
+  let etag = null;
+
+  function refresh() {
+    const headers = etag ? { "If-None-Match": etag } : {};
+
+    fetch("/api/stats", { headers, cache: "no-store" })
+      .then(res => {
+        if (res.status === 304 || !res.ok) return null;
+        etag = res.headers.get("ETag");
+        return res.json();
+      })
+      .then(data => {
+        if (data) render(data.stats, false);
+      })
+      .catch(() => {});
+  }
+
+  setInterval(refresh, POLL_MS);
 
 });
@@ -64,16 +64,80 @@ document.addEventListener("DOMContentLoaded", () => {
 
       svg.append("g").attr("id", "threat-layer");
 
-      fetchThreats();
-      setInterval(fetchThreats, 60000);
+      if (window.EventSource) {
+        connectStream();
+      } else {
+        fetchThreats();
+        setInterval(fetchThreats, 60000);
+      }
+    });
+
+  // ===== LIVE STREAM (SSE) =====
+  // Server sends the full set once, then only added/removed IPs
+  const liveThreats = new Map();
+
+  function renderLive() {
+    if (useDemo) return;
+    const data = Array.from(liveThreats.values());
+    updateThreats(data.length ? data : demoThreats());
+  }
+
+  function connectStream() {
+    const source = new EventSource("/api/threat-map/stream");
+
+    source.addEventListener("snapshot", (e) => {
+      stopPolling();
+      liveThreats.clear();
+      JSON.parse(e.data).forEach(t => liveThreats.set(t.ip, t));
+      renderLive();
     });
 
+    source.addEventListener("delta", (e) => {
+      const delta = JSON.parse(e.data);
+      (delta.removed || []).forEach(ip => liveThreats.delete(ip));
+      (delta.added || []).forEach(t => liveThreats.set(t.ip, t));
+      renderLive();
+    });
+
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED) {
+        // Refused (every stream slot busy, 503): poll until a retry works
+        liveThreats.clear();
+        startPolling();
+        setTimeout(connectStream, STREAM_RETRY_MS);
+        return;
+      }
+      // EventSource reconnects on its own; show something meanwhile
+      if (liveThreats.size === 0) renderLive();
+    };
+  }
+
+  // ===== POLLING FALLBACK =====
+  const STREAM_RETRY_MS = 60000;
+  let pollTimer = null;
+
+  function startPolling() {
+    if (pollTimer) return;
+    fetchThreats();
+    pollTimer = setInterval(fetchThreats, 60000);
+  }
+
+  function stopPolling() {
+    clearInterval(pollTimer);
+    pollTimer = null;
+  }
+
   function fetchThreats() {
     if (useDemo) {
       updateThreats(demoThreats());
       return;
     }
 
+    if (window.EventSource && liveThreats.size) {
+      renderLive();
+      return;
+    }
+
     fetch("/api/threat-map")
       .then(res => res.json())
       .then(data => {
@@ -0,0 +1,116 @@
+document.addEventListener("DOMContentLoaded", () => {
+
+  const trendEl = document.getElementById("trend-chart");
+  const countryEl = document.getElementById("country-chart");
+  if (!trendEl || !window.d3) return;
+
+  const VERDICTS = ["malicious", "suspicious", "harmless"];
+  const COLORS = { malicious: "#ef4444", suspicious: "#f59e0b", harmless: "#22c55e" };
+  const POLL_MS = 60000;
+
+  function empty(el, text) {
+    el.innerHTML = "";
+    d3.select(el).append("div").attr("class", "empty-state").text(text);
+  }
+
+  // ===== LOOKUP TREND (stacked bars per hour) =====
+  // The rollups count harmless as "not malicious" and suspicious as "any
+  // suspicious engine", so split the non-malicious part of each total
+  function renderTrend(buckets) {
+    if (!buckets.length) return empty(trendEl, "No lookups in the last 24 hours.");
+    trendEl.innerHTML = "";
+
+    const width = trendEl.clientWidth;
+    const height = trendEl.clientHeight;
+    const margin = { top: 8, right: 8, bottom: 20, left: 30 };
+
+    const rows = buckets.map(b => {
+      const rest = b.total - b.malicious;
+      const suspicious = Math.min(b.suspicious, rest);
+      return {
+        time: new Date(b.bucket.replace(" UTC", "Z").replace(" ", "T")),
+        malicious: b.malicious,
+        suspicious: suspicious,
+        harmless: rest - suspicious,
+      };
+    });
+
+    const x = d3.scaleBand()
+      .domain(rows.map(r => r.time))
+      .range([margin.left, width - margin.right])
+      .padding(0.2);
+    const y = d3.scaleLinear()
+      .domain([0, d3.max(rows, r => r.malicious + r.suspicious + r.harmless) || 1])
+      .nice()
+      .range([height - margin.bottom, margin.top]);
+
+    const svg = d3.select(trendEl).append("svg").attr("width", width).attr("height", height);
+
+    svg.append("g")
+      .selectAll("g")
+      .data(d3.stack().keys(VERDICTS)(rows))
+      .join("g")
+      .attr("fill", d => COLORS[d.key])
+      .selectAll("rect")
+      .data(d => d)
+      .join("rect")
+      .attr("x", d => x(d.data.time))
+      .attr("y", d => y(d[1]))
+      .attr("height", d => y(d[0]) - y(d[1]))
+      .attr("width", x.bandwidth())
+      .append("title")
+      .text(d => `${d.data.time.toUTCString()}: ${d[1] - d[0]}`);
+
+    svg.append("g")
+      .attr("transform", `translate(0,${height - margin.bottom})`)
+      .call(d3.axisBottom(x)
+        .tickValues(x.domain().filter((_, i, all) => i % Math.ceil(all.length / 6) === 0))
+        .tickFormat(d3.utcFormat("%H:%M")))
+      .attr("color", "#94a3b8");
+    svg.append("g")
+      .attr("transform", `translate(${margin.left},0)`)
+      .call(d3.axisLeft(y).ticks(4))
+      .attr("color", "#94a3b8");
+  }
+
+  // ===== COUNTRIES (top 10, split by verdict) =====
+  function renderCountries(countries) {
+    if (!countryEl) return;
+    if (!countries.length) return empty(countryEl, "No IP lookups yet.");
+    countryEl.innerHTML = "";
+
+    const top = countries.slice(0, 10);
+    const max = top[0].total;
+    const rows = d3.select(countryEl)
+      .selectAll("div.country-row")
+      .data(top)
+      .join("div")
+      .attr("class", "country-row d-flex align-items-center small mb-1");
+
+    rows.append("span").style("width", "3em").text(c => c.country);
+    const bar = rows.append("div").attr("class", "d-flex flex-grow-1").style("height", "10px");
+    VERDICTS.forEach(v => {
+      bar.append("div")
+        .style("width", c => `${100 * (c[v] || 0) / max}%`)
+        .style("background", COLORS[v])
+        .attr("title", c => `${v}: ${c[v] || 0}`);
+    });
+    rows.append("span").attr("class", "text-muted ms-2").text(c => c.total);
+  }
+
+  function refresh() {
+    fetch("/api/trend?granularity=hour&hours=24", { cache: "no-store" })
+      .then(res => res.ok ? res.json() : null)
+      .then(data => { if (data) renderTrend(data.buckets); })
+      .catch(() => {});
+
+    fetch("/api/country-histogram", { cache: "no-store" })
+      .then(res => res.ok ? res.json() : null)
+      .then(data => { if (data) renderCountries(data.countries); })
+      .catch(() => {});
+  }
+
+  refresh();
+  setInterval(refresh, POLL_MS);
+
+});
@@ -0,0 +1,40 @@
+from feeds.blacklist import Blacklist, diff
+
+
+def _blacklist(*ips):
+    return Blacklist((ip, 100, "US") for ip in ips)
+
+
+def test_diff():
+    old = _blacklist("1.1.1.1", "2.2.2.2", "2001:db8::1")
+    new = _blacklist("2.2.2.2", "3.3.3.3", "2001:db8::2")
+    added, removed = diff(old, new)
+    assert added == ["3.3.3.3", "2001:db8::2"]
+    assert removed == ["1.1.1.1", "2001:db8::1"]
+
+
+def test_diff_identical_and_empty():
+    same = _blacklist("1.1.1.1", "10.0.0.1")
+    assert diff(same, _blacklist("10.0.0.1", "1.1.1.1")) == ([], [])
+    assert diff(Blacklist(), Blacklist()) == ([], [])
+
+
+def test_diff_from_and_to_empty():
+    full = _blacklist("9.9.9.9", "1.1.1.1")
+    assert diff(Blacklist(), full) == (["1.1.1.1", "9.9.9.9"], [])
+    assert diff(full, Blacklist()) == ([], ["1.1.1.1", "9.9.9.9"])
+
+
+def test_diff_compares_numerically():
+    # "10.0.0.1" sorts before "9.0.0.1" as a string but not as an address
+    added, removed = diff(_blacklist("9.0.0.1"), _blacklist("9.0.0.1", "10.0.0.1"))
+    assert added == ["10.0.0.1"] and removed == []
+
+
+def test_lookup_ignores_invalid_entries():
+    blacklist = Blacklist([("1.2.3.4", 90, "de"), ("bogus", 100, "US"), ("2001:db8::1", 80, None)])
+    assert len(blacklist) == 2
+    assert blacklist.get("1.2.3.4") == {"ip": "1.2.3.4", "score": 90, "country": "DE"}
+    assert "::ffff:1.2.3.4" in blacklist
+    assert blacklist.get("2001:db8::1")["score"] == 80
+    assert "bogus" not in blacklist
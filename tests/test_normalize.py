@@ -0,0 +1,61 @@
+import pytest
+
+from ioc.normalize import InvalidIOC, canonical_key, detect, normalize, refang
+
+
+def test_refang():
+    assert refang("hxxps://evil[.]com/path") == "https://evil.com/path"
+    assert refang("'1.2.3[.]4'") == "1.2.3.4"
+    assert refang("evil(dot)com") == "evil.com"
+
+
+@pytest.mark.parametrize("ioc_type, raw, expected", [
+    ("ip", "1.2.3[.]4", "1.2.3.4"),
+    ("ip", "::ffff:1.2.3.4", "1.2.3.4"),
+    ("ip", "[2001:DB8::1]", "2001:db8::1"),
+    ("domain", "Evil.COM.", "evil.com"),
+    ("domain", "bücher.de", "xn--bcher-kva.de"),
+    ("hash", "D41D8CD98F00B204E9800998ECF8427E", "d41d8cd98f00b204e9800998ecf8427e"),
+    ("url", "HXXP://Evil[.]Com:80", "http://evil.com/"),
+    ("url", "https://evil.com:8443/A?b=C#frag", "https://evil.com:8443/A?b=C"),
+])
+def test_normalize(ioc_type, raw, expected):
+    assert normalize(ioc_type, raw) == expected
+
+
+@pytest.mark.parametrize("ioc_type, raw", [
+    ("ip", "1.2.3.256"),
+    ("domain", "localhost"),
+    ("domain", "-bad.com"),
+    ("hash", "abc123"),
+    ("url", "evil.com/path"),
+    ("url", "javascript://evil.com"),
+    ("ip", "   "),
+    ("email", "a@b.com"),
+])
+def test_normalize_rejects(ioc_type, raw):
+    with pytest.raises(InvalidIOC):
+        normalize(ioc_type, raw)
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("8.8.8[.]8", ("ip", "8.8.8.8")),
+    ("evil[.]com", ("domain", "evil.com")),
+    ("archive.zip", ("domain", "archive.zip")),
+    ("hxxp://evil.com/x", ("url", "http://evil.com/x")),
+    ("e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855",
+     ("hash", "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855")),
+])
+def test_detect(raw, expected):
+    assert detect(raw) == expected
+
+
+@pytest.mark.parametrize("raw", ["svchost.exe", "report.pdf", "invoice.docx", "hello", ""])
+def test_detect_rejects_filenames_and_words(raw):
+    assert detect(raw) is None
+
+
+def test_canonical_key_falls_back_for_invalid_values():
+    assert canonical_key("domain", " Evil[.]COM ") == ("domain", "evil.com")
+    assert canonical_key("domain", " Not A Domain ") == ("domain", "not a domain")
+    assert canonical_key("url", " /Relative/Path ") == ("url", "/Relative/Path")
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from services.ratelimit import MemoryBucket, RateLimiter, SingleFlight, SQLiteBucket
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_bucket(request, tmp_path):
+    def make(per_minute, per_day):
+        if request.param == "memory":
+            return MemoryBucket(per_minute, per_day)
+        return SQLiteBucket(per_minute, per_day, str(tmp_path / "ratelimit.db"), "test")
+    return make
+
+
+def test_bucket_spends_minute_tokens(make_bucket):
+    bucket = make_bucket(per_minute=3, per_day=100)
+    assert [bucket.take()[0] for _ in range(3)] == [True, True, True]
+    ok, wait = bucket.take()
+    assert not ok and 0 < wait <= 20
+
+
+def test_bucket_day_budget(make_bucket):
+    bucket = make_bucket(per_minute=10, per_day=2)
+    assert bucket.take() == (True, 0)
+    assert bucket.take() == (True, 0)
+    assert bucket.take() == (False, None)
+
+
+def test_bucket_drain_and_peek(make_bucket):
+    bucket = make_bucket(per_minute=4, per_day=100)
+    bucket.take()
+    tokens, day_used = bucket.peek()
+    assert int(tokens) == 3 and day_used == 1
+    bucket.drain()
+    assert int(bucket.peek()[0]) == 0
+    assert not bucket.take()[0]
+
+
+def test_sqlite_buckets_share_state(tmp_path):
+    path = str(tmp_path / "ratelimit.db")
+    a = SQLiteBucket(2, 100, path, "key")
+    b = SQLiteBucket(2, 100, path, "key")
+    other = SQLiteBucket(2, 100, path, "other")
+    assert a.take()[0] and b.take()[0]
+    assert not a.take()[0]
+    assert other.take()[0]
+
+
+def test_limiter_rejects_instead_of_waiting_past_timeout():
+    limiter = RateLimiter(per_minute=1, per_day=100, max_wait=0)
+    assert limiter.acquire() is True
+    started = time.monotonic()
+    assert limiter.acquire() is False
+    assert time.monotonic() - started < 1
+    assert limiter.rejected == 1
+
+
+def test_limiter_waits_for_refill():
+    limiter = RateLimiter(per_minute=600, per_day=100)
+    limiter.drain()
+    assert limiter.acquire(timeout=1) is True
+
+
+def test_limiter_rejects_when_queue_is_full():
+    limiter = RateLimiter(per_minute=1, per_day=100, max_waiters=0)
+    assert limiter.acquire() is False
+    assert limiter.rejected == 1
+
+
+def test_limiter_remaining():
+    limiter = RateLimiter(per_minute=4, per_day=10)
+    limiter.acquire()
+    assert limiter.remaining() == {
+        "minute": 3, "per_minute": 4, "day": 9, "per_day": 10, "waiting": 0, "rejected": 0,
+    }
+
+
+def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls, results = [], []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return "verdict"
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", fetch)))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    while flight.coalesced < 4:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+    assert calls == [1]
+    assert results == ["verdict"] * 5
@@ -0,0 +1,80 @@
+import pytest
+
+from tickets.repository import SQLiteTicketRepository, decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def repo():
+    repo = SQLiteTicketRepository(":memory:")
+    yield repo
+    repo.close()
+
+
+def _create(repo, n, **overrides):
+    fields = {"title": "Ticket", "description": "", "severity": "low",
+              "ioc_value": None, "created_by": "alice"}
+    fields.update(overrides)
+    return [repo.create(**fields) for _ in range(n)]
+
+
+def _pages(repo, **filters):
+    pages, cursor = [], None
+    while True:
+        tickets, cursor = repo.query(cursor=cursor, **filters)
+        pages.append(tickets)
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    ticket = {"id": "42", "created_at": "2026-01-01 00:00:00 UTC"}
+    assert decode_cursor(encode_cursor(ticket)) == ("2026-01-01 00:00:00 UTC", 42)
+    assert decode_cursor(None) is None
+    assert decode_cursor("not-a-cursor") is None
+
+
+def test_pages_cover_every_ticket_once_newest_first(repo):
+    # Created within the same second, so the id breaks created_at ties
+    created = _create(repo, 60)
+    pages = _pages(repo, limit=25)
+
+    assert [len(p) for p in pages] == [25, 25, 10]
+    ids = [t["id"] for page in pages for t in page]
+    assert ids == [t["id"] for t in reversed(created)]
+
+
+def test_exact_multiple_has_no_empty_last_page(repo):
+    _create(repo, 50)
+    assert [len(p) for p in _pages(repo, limit=25)] == [25, 25]
+
+
+def test_empty_repository(repo):
+    assert repo.query() == ([], None)
+
+
+def test_filters_apply_on_every_page(repo):
+    _create(repo, 30, severity="high")
+    _create(repo, 30, severity="low")
+    pages = _pages(repo, severity="high", limit=7)
+
+    tickets = [t for page in pages for t in page]
+    assert len(tickets) == 30
+    assert {t["severity"] for t in tickets} == {"high"}
+
+
+def test_closed_ticket_stays_on_its_page(repo):
+    _create(repo, 10)
+    first, cursor = repo.query(limit=5)
+    repo.update_status(first[0]["id"], "closed")
+    second, _ = repo.query(cursor=cursor, limit=5)
+    assert {t["id"] for t in first}.isdisjoint(t["id"] for t in second)
+    assert len(second) == 5
+
+
+def test_text_search(repo):
+    _create(repo, 3, title="Phishing campaign", description="mail from evil.com")
+    _create(repo, 3, title="Port scan")
+    tickets, cursor = repo.query(q="phish")
+    assert len(tickets) == 3 and cursor is None
+    assert repo.query(q="evil")[0] == tickets
+    assert repo.query(q="ransomware") == ([], None)
@@ -0,0 +1,22 @@
+"""
+Import the legacy tickets.json into the configured ticket repository.
+
+    python -m tickets.migrate [path/to/tickets.json]
+
+Safe to re-run: tickets are upserted by id. The app already does this
+on first use when the repository is empty; run it by hand to import
+another file or to re-import into a non-empty repository.
+"""
+import sys
+
+from tickets.repository import TICKETS_FILE, get_ticket_repository, import_legacy_tickets
+
+
+def migrate(path=TICKETS_FILE, repo=None):
+    return import_legacy_tickets(repo or get_ticket_repository(), path)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else TICKETS_FILE
+    count = migrate(path)
+    print(f"Imported {count} ticket(s) from {path}")
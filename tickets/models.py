@@ -1,46 +1,52 @@
-import json
-import os
-from datetime import datetime
-
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))
-TICKETS_FILE = os.path.join(BASE_DIR, "tickets.json")
+from ioc.normalize import canonical_value
+from tickets.repository import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, get_ticket_repository
 
 
 def load_tickets():
-    if not os.path.exists(TICKETS_FILE):
-        return {}
-    with open(TICKETS_FILE, "r") as f:
-        return json.load(f)
+    """
+    All tickets as {id: ticket}. Prefer get_ticket() for single reads.
+    """
+    return {t["id"]: t for t in get_ticket_repository().list_all()}
 
 
-def save_tickets(data):
-    with open(TICKETS_FILE, "w") as f:
-        json.dump(data, f, indent=4, default=str)
+def get_ticket(ticket_id):
+    return get_ticket_repository().get(ticket_id)
 
 
 def create_ticket(title, description, severity, ioc_value, created_by):
-    tickets = load_tickets()
-    ticket_id = str(len(tickets) + 1)
-    tickets[ticket_id] = {
-        "id": ticket_id,
-        "title": title,
-        "description": description,
-        "severity": severity,
-        "ioc_value": ioc_value,
-        "status": "open",
-        "created_by": created_by,
-        "created_at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC"),
-        "updated_at": None
-    }
-    save_tickets(tickets)
-    return tickets[ticket_id]
+    # Same canonical form as history and the verdict cache, so a ticket
+    # for "hxxp://Evil[.]com" matches lookups of "http://evil.com/"
+    if ioc_value:
+        ioc_value = canonical_value(ioc_value)
+    return get_ticket_repository().create(
+        title, description, severity, ioc_value, created_by
+    )
+
+
+def open_tickets_by_ioc(ioc_values):
+    """
+    {canonical ioc_value: [open ticket id, ...]} for a batch of canonical
+    values, so callers can cross-reference many IOCs with one query.
+    """
+    return get_ticket_repository().open_by_ioc(ioc_values)
 
 
 def update_ticket_status(ticket_id, status):
-    tickets = load_tickets()
-    if ticket_id in tickets:
-        tickets[ticket_id]["status"] = status
-        tickets[ticket_id]["updated_at"] = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
-        save_tickets(tickets)
-        return tickets[ticket_id]
-    return None
+    return get_ticket_repository().update_status(ticket_id, status)
+
+
+def query_tickets(status=None, severity=None, created_by=None, ioc_value=None,
+                  q=None, cursor=None, limit=None):
+    """
+    Filtered, keyset-paginated listing. Returns (tickets, next_cursor).
+    """
+    limit = min(max(int(limit or DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    return get_ticket_repository().query(
+        status=status,
+        severity=severity,
+        created_by=created_by,
+        ioc_value=canonical_value(ioc_value) if ioc_value else ioc_value,
+        q=q,
+        cursor=cursor,
+        limit=limit,
+    )
@@ -0,0 +1,489 @@
+import base64
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+from services.writer import sqlite_synchronous
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+# "sqlite" (default) or "mongo"
+TICKETS_BACKEND = os.getenv("TICKETS_BACKEND", "sqlite")
+TICKETS_DB = os.getenv("TICKETS_DB", os.path.join(BASE_DIR, "tickets.db"))
+# Legacy whole-file store, imported into an empty repository on first
+# use (and by tickets/migrate.py on demand)
+TICKETS_FILE = os.getenv("TICKETS_FILE", os.path.join(BASE_DIR, "tickets.json"))
+
+TICKET_FIELDS = (
+    "id",
+    "title",
+    "description",
+    "severity",
+    "ioc_value",
+    "status",
+    "created_by",
+    "created_at",
+    "updated_at",
+)
+
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 200
+# Values per "IN (...)" query, under SQLite's bound-parameter limit
+IN_CHUNK = 500
+
+
+def encode_cursor(ticket):
+    """
+    Opaque keyset cursor pointing just after `ticket` in
+    (created_at DESC, id DESC) order.
+    """
+    raw = f"{ticket['created_at']}|{ticket['id']}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """
+    Returns (created_at, id) or None for a missing/garbled cursor.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, ticket_id = raw.rsplit("|", 1)
+        return created_at, int(ticket_id)
+    except Exception:
+        return None
+
+
+def _now():
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
+
+
+class SQLiteTicketRepository:
+    """
+    Tickets in SQLite. IDs come from the INTEGER PRIMARY KEY sequence and
+    every write touches only its own row, so concurrent gunicorn workers
+    neither collide on IDs nor lose each other's updates.
+    """
+
+    def __init__(self, path=TICKETS_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(f"PRAGMA synchronous={sqlite_synchronous()}")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS tickets (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    severity TEXT NOT NULL,
+                    ioc_value TEXT,
+                    status TEXT NOT NULL,
+                    created_by TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets (status, created_at, id);
+                CREATE INDEX IF NOT EXISTS idx_tickets_severity ON tickets (severity, created_at, id);
+                CREATE INDEX IF NOT EXISTS idx_tickets_ioc_value ON tickets (ioc_value, created_at, id);
+                CREATE INDEX IF NOT EXISTS idx_tickets_created_by ON tickets (created_by, created_at, id);
+                CREATE INDEX IF NOT EXISTS idx_tickets_created_at ON tickets (created_at, id);
+                """
+            )
+            self._fts = self._init_fts()
+
+    def _init_fts(self):
+        """
+        Full-text index over title/description kept in sync by triggers.
+        Returns False when this SQLite build has no FTS5 (LIKE fallback).
+        """
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'tickets_fts'"
+        ).fetchone()
+        if exists:
+            return True
+        try:
+            self._conn.executescript(
+                """
+                CREATE VIRTUAL TABLE tickets_fts USING fts5(
+                    title, description, content='tickets', content_rowid='id'
+                );
+                CREATE TRIGGER tickets_fts_ai AFTER INSERT ON tickets BEGIN
+                    INSERT INTO tickets_fts (rowid, title, description)
+                    VALUES (new.id, new.title, new.description);
+                END;
+                CREATE TRIGGER tickets_fts_ad AFTER DELETE ON tickets BEGIN
+                    INSERT INTO tickets_fts (tickets_fts, rowid, title, description)
+                    VALUES ('delete', old.id, old.title, old.description);
+                END;
+                CREATE TRIGGER tickets_fts_au AFTER UPDATE OF title, description ON tickets BEGIN
+                    INSERT INTO tickets_fts (tickets_fts, rowid, title, description)
+                    VALUES ('delete', old.id, old.title, old.description);
+                    INSERT INTO tickets_fts (rowid, title, description)
+                    VALUES (new.id, new.title, new.description);
+                END;
+                INSERT INTO tickets_fts (tickets_fts) VALUES ('rebuild');
+                """
+            )
+            return True
+        except sqlite3.OperationalError:
+            return False
+
+    def create(self, title, description, severity, ioc_value, created_by):
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO tickets (title, description, severity, ioc_value, status,"
+                " created_by, created_at, updated_at) VALUES (?, ?, ?, ?, 'open', ?, ?, NULL)",
+                (title, description, severity, ioc_value, created_by, _now()),
+            )
+            ticket_id = cur.lastrowid
+        return self.get(ticket_id)
+
+    def get(self, ticket_id):
+        try:
+            ticket_id = int(ticket_id)
+        except (TypeError, ValueError):
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM tickets WHERE id = ?", (ticket_id,)).fetchone()
+        return _row_to_ticket(row) if row else None
+
+    def update_status(self, ticket_id, status):
+        try:
+            ticket_id = int(ticket_id)
+        except (TypeError, ValueError):
+            return None
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE tickets SET status = ?, updated_at = ? WHERE id = ?",
+                (status, _now(), ticket_id),
+            )
+            if cur.rowcount == 0:
+                return None
+        return self.get(ticket_id)
+
+    def upsert(self, ticket):
+        """
+        Insert or replace one ticket by id (used by the migration tool).
+        """
+        values = [ticket.get(f) for f in TICKET_FIELDS]
+        values[0] = int(values[0])
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO tickets (id, title, description, severity, ioc_value, status,"
+                " created_by, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (id) DO UPDATE SET title = excluded.title,"
+                " description = excluded.description, severity = excluded.severity,"
+                " ioc_value = excluded.ioc_value, status = excluded.status,"
+                " created_by = excluded.created_by, created_at = excluded.created_at,"
+                " updated_at = excluded.updated_at",
+                values,
+            )
+
+    def list_all(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM tickets ORDER BY id DESC").fetchall()
+        return [_row_to_ticket(r) for r in rows]
+
+    def query(self, status=None, severity=None, created_by=None, ioc_value=None,
+              q=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        One page of tickets, newest first, plus the cursor for the next
+        page (None on the last page). Seeks on the (created_at, id)
+        index instead of OFFSET, so every page costs the same.
+        """
+        where, params = [], []
+        for column, value in (("status", status), ("severity", severity),
+                              ("created_by", created_by), ("ioc_value", ioc_value)):
+            if value:
+                where.append(f"t.{column} = ?")
+                params.append(value)
+
+        sql = "SELECT t.* FROM tickets t"
+        if q:
+            if self._fts:
+                sql += " JOIN tickets_fts f ON f.rowid = t.id"
+                where.append("tickets_fts MATCH ?")
+                params.append(_fts_query(q))
+            else:
+                where.append("(t.title LIKE ? OR t.description LIKE ?)")
+                params.extend([f"%{q}%", f"%{q}%"])
+
+        after = decode_cursor(cursor)
+        if after:
+            where.append("(t.created_at, t.id) < (?, ?)")
+            params.extend(after)
+
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY t.created_at DESC, t.id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        tickets = [_row_to_ticket(r) for r in rows[:limit]]
+        next_cursor = encode_cursor(tickets[-1]) if len(rows) > limit else None
+        return tickets, next_cursor
+
+    def open_by_ioc(self, ioc_values):
+        """
+        {ioc_value: [ticket id, ...]} of the not-closed tickets for the
+        given values, oldest first. One indexed lookup per chunk.
+        """
+        values = list(dict.fromkeys(v for v in ioc_values if v))
+        found = {}
+        for start in range(0, len(values), IN_CHUNK):
+            chunk = values[start:start + IN_CHUNK]
+            marks = ", ".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, ioc_value FROM tickets WHERE ioc_value IN ({marks})"
+                    " AND status != 'closed' ORDER BY id",
+                    chunk,
+                ).fetchall()
+            for ticket_id, ioc_value in rows:
+                found.setdefault(ioc_value, []).append(str(ticket_id))
+        return found
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+
+    def ping(self):
+        with self._lock:
+            self._conn.execute("SELECT 1").fetchone()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class MongoTicketRepository:
+    """
+    Same API on the `tickets` collection of the Atlas database from
+    config.py. IDs are allocated from a counter document with an atomic
+    $inc, and each write is a single-document update.
+    """
+
+    def __init__(self, db=None):
+        if db is None:
+            import config  # connects on first use only
+            db = config.db
+        self.col = db["tickets"]
+        self.counters = db["counters"]
+        self.col.create_index([("status", 1), ("created_at", -1)])
+        self.col.create_index([("severity", 1), ("created_at", -1)])
+        self.col.create_index([("ioc_value", 1), ("created_at", -1)])
+        self.col.create_index([("created_by", 1), ("created_at", -1)])
+        self.col.create_index([("created_at", -1), ("seq", -1)])
+        self.col.create_index([("title", "text"), ("description", "text")])
+
+    def _next_id(self):
+        from pymongo import ReturnDocument
+
+        doc = self.counters.find_one_and_update(
+            {"_id": "ticket_id"},
+            {"$inc": {"seq": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc["seq"]
+
+    def create(self, title, description, severity, ioc_value, created_by):
+        seq = self._next_id()
+        ticket = {
+            "id": str(seq),
+            "title": title,
+            "description": description,
+            "severity": severity,
+            "ioc_value": ioc_value,
+            "status": "open",
+            "created_by": created_by,
+            "created_at": _now(),
+            "updated_at": None,
+        }
+        self.col.insert_one(dict(ticket, _id=seq, seq=seq))
+        return ticket
+
+    def get(self, ticket_id):
+        try:
+            seq = int(ticket_id)
+        except (TypeError, ValueError):
+            return None
+        return self.col.find_one({"_id": seq}, {"_id": 0, "seq": 0})
+
+    def update_status(self, ticket_id, status):
+        from pymongo import ReturnDocument
+
+        try:
+            seq = int(ticket_id)
+        except (TypeError, ValueError):
+            return None
+        return self.col.find_one_and_update(
+            {"_id": seq},
+            {"$set": {"status": status, "updated_at": _now()}},
+            projection={"_id": 0, "seq": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def upsert(self, ticket):
+        seq = int(ticket["id"])
+        doc = {f: ticket.get(f) for f in TICKET_FIELDS}
+        doc["id"] = str(seq)
+        doc["seq"] = seq
+        self.col.replace_one({"_id": seq}, doc, upsert=True)
+        # Keep the sequence ahead of imported ids
+        self.counters.update_one({"_id": "ticket_id"}, {"$max": {"seq": seq}}, upsert=True)
+
+    def list_all(self):
+        return list(self.col.find({}, {"_id": 0, "seq": 0}).sort("_id", -1))
+
+    def query(self, status=None, severity=None, created_by=None, ioc_value=None,
+              q=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        query = {}
+        for field, value in (("status", status), ("severity", severity),
+                             ("created_by", created_by), ("ioc_value", ioc_value)):
+            if value:
+                query[field] = value
+        if q:
+            query["$text"] = {"$search": q}
+        after = decode_cursor(cursor)
+        if after:
+            created_at, seq = after
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "seq": {"$lt": seq}},
+            ]
+        docs = list(
+            self.col.find(query, {"_id": 0, "seq": 0})
+            .sort([("created_at", -1), ("seq", -1)])
+            .limit(limit + 1)
+        )
+        tickets = docs[:limit]
+        next_cursor = encode_cursor(tickets[-1]) if len(docs) > limit else None
+        return tickets, next_cursor
+
+    def open_by_ioc(self, ioc_values):
+        values = list(dict.fromkeys(v for v in ioc_values if v))
+        found = {}
+        docs = self.col.find(
+            {"ioc_value": {"$in": values}, "status": {"$ne": "closed"}},
+            {"_id": 0, "id": 1, "ioc_value": 1},
+        ).sort("seq", 1)
+        for d in docs:
+            found.setdefault(d["ioc_value"], []).append(d["id"])
+        return found
+
+    def count(self):
+        return self.col.estimated_document_count()
+
+    def ping(self):
+        self.col.database.command("ping")
+
+    def close(self):
+        pass
+
+
+def _fts_query(q):
+    """
+    Turn free text into an FTS5 query: every word must prefix-match,
+    with FTS syntax characters stripped.
+    """
+    words = re.findall(r"\w+", q)
+    if not words:
+        return '""'
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def _row_to_ticket(row):
+    ticket = {f: row[f] for f in TICKET_FIELDS}
+    ticket["id"] = str(ticket["id"])
+    return ticket
+
+
+def load_legacy_tickets(path=TICKETS_FILE):
+    """
+    Read the old whole-file tickets.json ({id: ticket}).
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def import_legacy_tickets(repo, path=TICKETS_FILE):
+    """
+    Upsert every ticket of the legacy tickets.json into `repo`.
+    Safe to re-run: tickets keep their ids. Returns the count imported.
+    """
+    imported = 0
+    for ticket_id, ticket in load_legacy_tickets(path).items():
+        ticket = dict(ticket)
+        ticket.setdefault("id", ticket_id)
+        ticket.setdefault("status", "open")
+        try:
+            repo.upsert(ticket)
+            imported += 1
+        except Exception as e:
+            print(f"Skipping ticket {ticket_id}:", e)
+    return imported
+
+
+def _import_on_first_use(repo):
+    # Tickets saved before the repository existed only live in
+    # tickets.json; bring them over once, while the repository is empty.
+    # Workers racing here upsert the same ids, so it stays idempotent.
+    try:
+        if repo.count() or not load_legacy_tickets():
+            return
+        imported = import_legacy_tickets(repo)
+        print(f"Imported {imported} legacy ticket(s) from {TICKETS_FILE}")
+    except Exception as e:
+        print(f"Legacy tickets in {TICKETS_FILE} were not imported:", e)
+
+
+_repo = None
+_repo_lock = threading.Lock()
+
+
+def get_ticket_repository():
+    """
+    Process-wide ticket repository, opened on first use.
+    """
+    global _repo
+    if _repo is None:
+        with _repo_lock:
+            if _repo is None:
+                if TICKETS_BACKEND == "mongo":
+                    repo = MongoTicketRepository()
+                else:
+                    repo = SQLiteTicketRepository()
+                _import_on_first_use(repo)
+                _repo = repo
+    return _repo
+
+
+def set_ticket_repository(repo):
+    """Swap the backend, e.g. SQLiteTicketRepository(":memory:") in tests."""
+    global _repo
+    _repo = repo
+
+
+def _reset_after_fork():
+    # A SQLite connection must not be shared across fork (gunicorn
+    # --preload); each worker reopens its own on first use
+    global _repo, _repo_lock
+    _repo = None
+    _repo_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
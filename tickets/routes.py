@@ -1,10 +1,34 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 
-from tickets.models import load_tickets, create_ticket, update_ticket_status
+from ioc.services import get_risk
+from tickets.models import get_ticket, create_ticket, update_ticket_status, query_tickets
 
 tickets_bp = Blueprint("tickets", __name__)
 
+FILTER_ARGS = ("status", "severity", "created_by", "ioc", "q")
+
+
+def _filters_from_request():
+    filters = {k: request.args.get(k, "").strip() for k in FILTER_ARGS}
+    return {k: v for k, v in filters.items() if v}
+
+
+def _query_from_request(filters):
+    try:
+        limit = int(request.args.get("limit", 0)) or None
+    except ValueError:
+        limit = None
+    return query_tickets(
+        status=filters.get("status"),
+        severity=filters.get("severity"),
+        created_by=filters.get("created_by"),
+        ioc_value=filters.get("ioc"),
+        q=filters.get("q"),
+        cursor=request.args.get("cursor"),
+        limit=limit,
+    )
+
 
 @tickets_bp.route("/", methods=["GET", "POST"])
 @login_required
@@ -22,16 +46,29 @@ def list_tickets():
             flash("Ticket created", "success")
             return redirect(url_for("tickets.list_tickets"))
 
-    tickets = load_tickets()
-    tickets_list = sorted(tickets.values(), key=lambda x: x["id"], reverse=True)
-    return render_template("tickets.html", tickets=tickets_list)
+    filters = _filters_from_request()
+    tickets_list, next_cursor = _query_from_request(filters)
+    return render_template(
+        "tickets.html",
+        tickets=tickets_list,
+        filters=filters,
+        next_cursor=next_cursor,
+        paged=bool(request.args.get("cursor")),
+    )
+
+
+@tickets_bp.route("/api", methods=["GET"])
+@login_required
+def list_tickets_api():
+    filters = _filters_from_request()
+    tickets_list, next_cursor = _query_from_request(filters)
+    return jsonify({"tickets": tickets_list, "next_cursor": next_cursor})
 
 
 @tickets_bp.route("/<ticket_id>", methods=["GET", "POST"])
 @login_required
 def ticket_detail(ticket_id):
-    tickets = load_tickets()
-    ticket = tickets.get(ticket_id)
+    ticket = get_ticket(ticket_id)
     if not ticket:
         flash("Ticket not found", "danger")
         return redirect(url_for("tickets.list_tickets"))
@@ -43,4 +80,5 @@ def ticket_detail(ticket_id):
             flash("Status updated", "success")
             return redirect(url_for("tickets.ticket_detail", ticket_id=ticket_id))
 
-    return render_template("ticket_detail.html", ticket=ticket)
+    risk = get_risk(ticket.get("ioc_value"))
+    return render_template("ticket_detail.html", ticket=ticket, risk=risk)